@@ -0,0 +1,67 @@
+"""
+Structured, leveled and sampled logging for the MentorAI application.
+"""
+
+import json
+import logging
+import random
+import sys
+import time
+from app.config.settings import LOG_LEVEL, LOG_FORMAT, LOG_SAMPLE_RATE
+
+# Attributes every LogRecord has; anything else was passed via `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line, including fields passed via `extra`."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a fraction of routine records.
+
+    Records below WARNING are kept with probability `rate`; warnings and
+    errors are always kept.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or random.random() < self.rate
+
+def configure_logging() -> None:
+    """
+    Set up the "app" logger from the LOG_* settings.
+
+    Safe to call more than once; the handler is only installed the first time.
+    """
+    logger = logging.getLogger("app")
+    logger.setLevel(LOG_LEVEL.upper())
+    if any(getattr(handler, "_mentorai", False) for handler in logger.handlers):
+        return
+
+    handler = logging.StreamHandler(sys.stdout)
+    handler._mentorai = True
+    if LOG_FORMAT == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    if LOG_SAMPLE_RATE < 1:
+        handler.addFilter(SamplingFilter(LOG_SAMPLE_RATE))
+    logger.addHandler(handler)
+    logger.propagate = False
@@ -36,13 +36,158 @@ CORS_ALLOW_CREDENTIALS = True
 CORS_ALLOW_METHODS = ["*"]
 CORS_ALLOW_HEADERS = ["*"]
 
-# Google Gemini API
+# Google Gemini API (checked when the Gemini backend is created at startup,
+# so tools and the fake backend work without a key)
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-if not GOOGLE_API_KEY:
-    raise ValueError("GOOGLE_API_KEY environment variable not set")
+
+# Several Gemini API keys (e.g. of different projects) to spread calls over, to
+# go beyond one project's quota; comma-separated "key" or "key:rpm" entries,
+# rpm being the key's requests-per-minute quota. Used instead of GOOGLE_API_KEY
+GOOGLE_API_KEYS = os.getenv("GOOGLE_API_KEYS", "")
+AI_KEY_RPM = float(os.getenv("AI_KEY_RPM", "0"))  # Quota of keys listed without one (0: unknown, not tracked)
+AI_KEY_COOLDOWN = float(os.getenv("AI_KEY_COOLDOWN", "10"))  # Seconds a key rests after a rate limit; doubles on repeats
+AI_KEY_MAX_COOLDOWN = float(os.getenv("AI_KEY_MAX_COOLDOWN", "120"))  # Seconds
 
 # AI model settings
 AI_MODEL = "gemini-1.5-flash"
+AI_BACKEND = os.getenv("AI_BACKEND", "gemini")  # "gemini" or "fake" (deterministic local backend)
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "256"))  # In-flight model calls per worker
+AI_EXECUTOR_WORKERS = int(os.getenv("AI_EXECUTOR_WORKERS", "32"))  # Threads for backends without native async
+AI_WARM_UP = os.getenv("AI_WARM_UP", "false").lower() in ("1", "true", "yes")  # Open the upstream connection at startup
+
+# Model tiers, as comma-separated "name:model:max_output_tokens:min_score" entries;
+# each question goes to the highest tier whose min_score its complexity reaches.
+# A cheaper tier for simple questions is opt-in, e.g. prepend
+# "fast:gemini-1.5-flash-8b:1024:0" and raise the standard tier's min_score to 2
+AI_MODEL_TIERS = os.getenv(
+    "AI_MODEL_TIERS",
+    f"standard:{AI_MODEL}:2048:0,deep:gemini-1.5-pro:4096:5"
+)
+# Subjects whose questions count as more demanding when routing
+AI_ROUTING_COMPLEX_SUBJECTS = os.getenv(
+    "AI_ROUTING_COMPLEX_SUBJECTS",
+    "calculus,algebra,statistics,probability,trigonometry,physics,chemistry,quantum,thermodynamics,"
+    "genetics,algorithm,data structure,programming,proof,theorem,equation,philosophy,economics"
+)
+AI_ROUTING_LOAD_SHIFT = float(os.getenv("AI_ROUTING_LOAD_SHIFT", "0.8"))  # Load (0-1) above which requests drop a tier (0 disables)
+
+# Resilience of upstream model calls
+AI_MAX_RETRIES = int(os.getenv("AI_MAX_RETRIES", "2"))
+AI_RETRY_BASE_DELAY = float(os.getenv("AI_RETRY_BASE_DELAY", "0.5"))  # Seconds; full-jitter exponential backoff
+AI_RETRY_MAX_DELAY = float(os.getenv("AI_RETRY_MAX_DELAY", "8"))  # Seconds
+AI_RETRYABLE_ERRORS = os.getenv("AI_RETRYABLE_ERRORS", "ModelConnectionError,ConnectionError,TimeoutError")
+AI_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("AI_CIRCUIT_FAILURE_THRESHOLD", "5"))  # Consecutive failures (0 disables)
+AI_CIRCUIT_RECOVERY_TIME = float(os.getenv("AI_CIRCUIT_RECOVERY_TIME", "30"))  # Seconds before a recovery probe
+AI_HEDGE_PERCENTILE = float(os.getenv("AI_HEDGE_PERCENTILE", "0"))  # e.g. 95 to hedge slow calls (0 disables)
+AI_HEDGE_MIN_SAMPLES = int(os.getenv("AI_HEDGE_MIN_SAMPLES", "20"))  # Latency samples needed before hedging
+
+# Per-request deadline for answering, covering model calls and retry backoff;
+# clients may ask for less (or more, up to the maximum) with the header
+AI_REQUEST_TIMEOUT = float(os.getenv("AI_REQUEST_TIMEOUT", "60"))  # Seconds
+AI_REQUEST_MAX_TIMEOUT = float(os.getenv("AI_REQUEST_MAX_TIMEOUT", "120"))  # Seconds
+AI_REQUEST_TIMEOUT_HEADER = os.getenv("AI_REQUEST_TIMEOUT_HEADER", "X-Request-Timeout")  # Value in seconds
+
+# Conversation store: "memory" (per process) or "sqlite" (shared by all workers on the host)
+CONVERSATION_STORE = os.getenv("CONVERSATION_STORE", "memory")
+CONVERSATION_IDLE_TTL = float(os.getenv("CONVERSATION_IDLE_TTL", "7200"))  # Seconds without a new message before deletion (0 disables)
+
+# In-memory conversation store limits (0 disables a limit)
+CONVERSATION_MAX_COUNT = int(os.getenv("CONVERSATION_MAX_COUNT", "10000"))
+CONVERSATION_MAX_BYTES = int(os.getenv("CONVERSATION_MAX_BYTES", str(64 * 1024 * 1024)))
+CONVERSATION_COMPRESS_AFTER = float(os.getenv("CONVERSATION_COMPRESS_AFTER", "300"))  # Idle seconds before compressing (0 disables)
+
+# Conversation history API
+CONVERSATION_PAGE_SIZE = int(os.getenv("CONVERSATION_PAGE_SIZE", "50"))  # Default messages per page
+CONVERSATION_MAX_PAGE_SIZE = int(os.getenv("CONVERSATION_MAX_PAGE_SIZE", "200"))
+CONVERSATION_EXPORT_TOKEN = os.getenv("CONVERSATION_EXPORT_TOKEN", "")  # Bearer token for the bulk export (empty disables it)
+
+# Turns of one conversation run one at a time; more than this many waiting
+# behind the running one are rejected with 429 (0 disables the limit)
+CONVERSATION_MAX_QUEUED_TURNS = int(os.getenv("CONVERSATION_MAX_QUEUED_TURNS", "4"))
+
+# SQLite conversation store
+CONVERSATION_DB_PATH = os.getenv("CONVERSATION_DB_PATH", "conversations.db")
+CONVERSATION_DB_FLUSH_INTERVAL = float(os.getenv("CONVERSATION_DB_FLUSH_INTERVAL", "0.05"))  # Seconds
+CONVERSATION_DB_BATCH_SIZE = int(os.getenv("CONVERSATION_DB_BATCH_SIZE", "256"))
+CONVERSATION_DB_BUSY_TIMEOUT = float(os.getenv("CONVERSATION_DB_BUSY_TIMEOUT", "0.25"))  # Seconds a write waits for other workers before retrying
+
+# Context window sent to the model (estimated tokens)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "4000"))  # Whole history, including the summary
+CONTEXT_SUMMARY_TOKEN_BUDGET = int(os.getenv("CONTEXT_SUMMARY_TOKEN_BUDGET", "500"))  # Summary of older turns
+
+# Cache of answers to opening questions (0 entries disables the cache)
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "5000"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))  # Seconds
+
+# Index of answered opening questions: a differently worded question similar
+# enough to one of them gets its stored answer (0 entries disables the index)
+SIMILAR_QUESTIONS_MAX_ENTRIES = int(os.getenv("SIMILAR_QUESTIONS_MAX_ENTRIES", "0"))  # Off by default; e.g. 5000 once the threshold is tuned
+SIMILAR_QUESTIONS_THRESHOLD = float(os.getenv("SIMILAR_QUESTIONS_THRESHOLD", "0.85"))  # Cosine similarity, 0-1
+SIMILAR_QUESTIONS_DIMENSIONS = int(os.getenv("SIMILAR_QUESTIONS_DIMENSIONS", "1024"))  # Hashed feature space
+SIMILAR_QUESTIONS_AUDIT_RATE = float(os.getenv("SIMILAR_QUESTIONS_AUDIT_RATE", "0.02"))  # Hits also asked to the model
+SIMILAR_QUESTIONS_AUDIT_THRESHOLD = float(os.getenv("SIMILAR_QUESTIONS_AUDIT_THRESHOLD", "0.3"))  # Answer similarity below which a hit was a false match
+SIMILAR_QUESTIONS_PATH = os.getenv("SIMILAR_QUESTIONS_PATH", "")  # Base path of the saved index (empty: not saved)
+
+# Suggested follow-up questions on answers; the first few can be answered ahead
+# of time in the background while the worker is lightly loaded. Prefetching is
+# off by default, since unused prefetches can nearly double model calls
+FOLLOW_UP_SUGGESTIONS = int(os.getenv("FOLLOW_UP_SUGGESTIONS", "3"))  # Per answer (0 disables suggestions)
+PREFETCH_MAX_PER_CONVERSATION = int(os.getenv("PREFETCH_MAX_PER_CONVERSATION", "0"))  # Suggestions answered ahead (0 disables prefetch), e.g. 2
+PREFETCH_MAX_CONVERSATIONS = int(os.getenv("PREFETCH_MAX_CONVERSATIONS", "1000"))  # Conversations holding prefetched answers per worker
+PREFETCH_MAX_IN_FLIGHT = int(os.getenv("PREFETCH_MAX_IN_FLIGHT", "4"))  # Prefetch model calls at once per worker
+PREFETCH_MAX_UTILIZATION = float(os.getenv("PREFETCH_MAX_UTILIZATION", "0.5"))  # Admission utilization from which prefetch is skipped
+
+# Idempotency-Key support on /education/ask (0 keys disables it)
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))  # Stored responses per worker
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "3600"))  # Seconds a response can be replayed
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+# Local topic filter: questions whose off-topic phrases outnumber academic ones
+# by at least this much get a canned redirect without a model call (0 disables)
+TOPIC_FILTER_THRESHOLD = int(os.getenv("TOPIC_FILTER_THRESHOLD", "2"))
+
+# Batch question endpoint
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "50"))  # Questions per batch request
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))  # Questions answered at once per batch
+
+# Admission control in front of the AI model (per worker)
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "64"))  # Adaptive limit starts here
+ADMISSION_MIN_IN_FLIGHT = int(os.getenv("ADMISSION_MIN_IN_FLIGHT", "4"))  # Floor after upstream rate limits
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "128"))  # Requests waiting for a slot
+ADMISSION_MAX_QUEUE_TIME = float(os.getenv("ADMISSION_MAX_QUEUE_TIME", "10"))  # Seconds before a waiting request is shed
+# Per-client rate limit, off by default: behind a proxy or router every client
+# has the proxy's address, so set ADMISSION_CLIENT_ID_HEADER before enabling it
+ADMISSION_CLIENT_RATE = float(os.getenv("ADMISSION_CLIENT_RATE", "0"))  # Requests per second per client (0 disables), e.g. 2
+ADMISSION_CLIENT_BURST = float(os.getenv("ADMISSION_CLIENT_BURST", "20"))
+ADMISSION_CLIENT_ID_HEADER = os.getenv("ADMISSION_CLIENT_ID_HEADER", "")  # e.g. "X-Forwarded-For" behind a trusted proxy
+
+# Production server (python -m app.server); the development server in run.py ignores these
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", os.getenv("WEB_CONCURRENCY", "1")))  # Processes; use CONVERSATION_STORE=sqlite with more than one
+SERVER_LOOP = os.getenv("SERVER_LOOP", "auto")  # "auto" (uvloop when installed), "uvloop" or "asyncio"
+SERVER_HTTP = os.getenv("SERVER_HTTP", "auto")  # "auto" (httptools when installed), "httptools" or "h11"
+SERVER_KEEP_ALIVE = int(os.getenv("SERVER_KEEP_ALIVE", "75"))  # Idle seconds; longer than the usual 60 s of load balancers
+SERVER_BACKLOG = int(os.getenv("SERVER_BACKLOG", "2048"))  # Pending connections the kernel queues per worker
+SERVER_GRACEFUL_TIMEOUT = float(os.getenv("SERVER_GRACEFUL_TIMEOUT", "30"))  # Seconds to finish in-flight requests on shutdown
+SERVER_ACCESS_LOG = os.getenv("SERVER_ACCESS_LOG", "false").lower() in ("1", "true", "yes")  # /metrics and app logs cover requests
+
+# Readiness (/ready): background checks, and the limits past which a worker
+# reports not ready so the load balancer sends its traffic elsewhere (0 disables a limit)
+READY_PROBE_INTERVAL = float(os.getenv("READY_PROBE_INTERVAL", "30"))  # Seconds between upstream probes (0 disables probing)
+READY_PROBE_TIMEOUT = float(os.getenv("READY_PROBE_TIMEOUT", "5"))  # Seconds
+READY_PROBE_FAILURES = int(os.getenv("READY_PROBE_FAILURES", "2"))  # Consecutive failed probes
+READY_LAG_INTERVAL = float(os.getenv("READY_LAG_INTERVAL", "0.25"))  # Seconds between event loop lag samples
+READY_LAG_WINDOW = int(os.getenv("READY_LAG_WINDOW", "20"))  # Samples; the worst of them is compared to the limit
+READY_MAX_LOOP_LAG = float(os.getenv("READY_MAX_LOOP_LAG", "0.5"))  # Seconds
+READY_MAX_IN_FLIGHT = int(os.getenv("READY_MAX_IN_FLIGHT", "0"))  # Admitted requests (admission control already caps them)
+READY_MAX_QUEUED = int(os.getenv("READY_MAX_QUEUED", "64"))  # Requests waiting for admission
+READY_MAX_STORE_OCCUPANCY = float(os.getenv("READY_MAX_STORE_OCCUPANCY", "0"))  # Fraction of the store's limits; a full store evicts, so off by default
+
+# Logging (question text is never logged, only its length)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # "json" (one object per line) or "text"
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1"))  # Fraction of INFO/DEBUG records kept; warnings always are
 
 # System prompt for the AI
 SYSTEM_PROMPT = """
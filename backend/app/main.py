@@ -2,9 +2,17 @@
 Main FastAPI application initialization.
 """
 
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from app.config.logging_config import configure_logging
+from app.middleware.metrics import MetricsMiddleware
 from app.routes.api import api_router
+from app.services.admission import admission_controller
+from app.services.ai_service import AIService
+from app.services.conversation_service import ConversationService
+from app.services.readiness import readiness_monitor
 from app.config.settings import (
     API_TITLE,
     API_DESCRIPTION,
@@ -14,9 +22,14 @@ from app.config.settings import (
     CORS_ORIGINS,
     CORS_ALLOW_CREDENTIALS,
     CORS_ALLOW_METHODS,
-    CORS_ALLOW_HEADERS
+    CORS_ALLOW_HEADERS,
+    AI_WARM_UP,
+    SERVER_GRACEFUL_TIMEOUT,
+    SIMILAR_QUESTIONS_PATH
 )
 
+logger = logging.getLogger(__name__)
+
 # Define tags metadata for Swagger UI
 tags_metadata = [
     {
@@ -27,8 +40,57 @@ tags_metadata = [
         "name": "health",
         "description": "Health check endpoints for monitoring service status",
     },
+    {
+        "name": "metrics",
+        "description": "Prometheus-style metrics for monitoring performance",
+    },
 ]
 
+@asynccontextmanager
+async def lifespan(application: FastAPI):
+    """
+    Prepare the model client before the first request is served, and drain
+    model calls on shutdown.
+    
+    Creating the backend imports the model SDK, and creating the conversation
+    store may open its database; both are kept out of module import so the
+    app (and any tooling) imports quickly. With AI_WARM_UP the
+    upstream connection is opened here as well; a failed warm-up is logged
+    and the first request connects instead.
+    
+    The readiness monitor's event loop watchdog and upstream prober run
+    for as long as the app does. With SIMILAR_QUESTIONS_PATH, the index of
+    answered questions is loaded here and saved again on shutdown.
+    
+    On shutdown the server has already stopped accepting connections; any
+    model call still admitted (e.g. one whose client went away) gets up to
+    SERVER_GRACEFUL_TIMEOUT seconds to finish while new ones are refused.
+    
+    Args:
+        application: The FastAPI application being started
+    """
+    backend = AIService.get_backend()
+    # Open the conversation store (e.g. the SQLite database) before the first request
+    ConversationService.get_store()
+    admission_controller.draining = False
+    if AI_WARM_UP:
+        try:
+            await backend.warm_up()
+        except Exception as e:
+            logger.warning("Model warm-up failed: %s", e)
+    if SIMILAR_QUESTIONS_PATH:
+        # Load the saved index now rather than in the first opening question
+        AIService.get_similar_questions()
+    readiness_monitor.start(AIService.get_backend)
+    yield
+    if not await admission_controller.drain(SERVER_GRACEFUL_TIMEOUT):
+        logger.warning(
+            "Shutting down with model calls still in flight",
+            extra={"in_flight": admission_controller.in_flight, "queue_depth": admission_controller.queue_depth}
+        )
+    await readiness_monitor.stop()
+    AIService.save_similar_questions()
+
 def create_application() -> FastAPI:
     """
     Create and configure the FastAPI application.
@@ -36,6 +98,9 @@ def create_application() -> FastAPI:
     Returns:
         FastAPI: The configured FastAPI application
     """
+    # Structured, sampled logging for the app.* loggers
+    configure_logging()
+    
     # Initialize FastAPI app with metadata
     application = FastAPI(
         title=API_TITLE,
@@ -43,7 +108,8 @@ def create_application() -> FastAPI:
         version=API_VERSION,
         docs_url=API_DOCS_URL,
         redoc_url=API_REDOC_URL,
-        openapi_tags=tags_metadata
+        openapi_tags=tags_metadata,
+        lifespan=lifespan
     )
     
     # Setup CORS middleware
@@ -53,8 +119,12 @@ def create_application() -> FastAPI:
         allow_credentials=CORS_ALLOW_CREDENTIALS,
         allow_methods=CORS_ALLOW_METHODS,
         allow_headers=CORS_ALLOW_HEADERS,
+        expose_headers=["Server-Timing"],
     )
     
+    # Outermost, so request timing covers everything below it
+    application.add_middleware(MetricsMiddleware)
+    
     # Include API router
     application.include_router(api_router)
     
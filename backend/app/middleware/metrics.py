@@ -0,0 +1,51 @@
+"""
+Middleware recording request latency and the Server-Timing header.
+"""
+
+import time
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.services.metrics import REQUEST_LATENCY, REQUESTS, request_timings, server_timing_header
+
+class MetricsMiddleware:
+    """
+    Times every HTTP request and reports the stage breakdown to the client.
+
+    Stages recorded while handling the request (see app.services.metrics.stage)
+    are sent in a Server-Timing header together with the total time. Requests
+    are labelled by route template rather than path, so conversation IDs and
+    unknown URLs do not create new series.
+
+    Written as plain ASGI middleware so streaming responses pass through
+    untouched.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        timings = {}
+        token = request_timings.set(timings)
+        status_code = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", server_timing_header(timings, time.perf_counter() - started))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_timings.reset(token)
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            REQUEST_LATENCY.observe(time.perf_counter() - started, route=route_path, method=scope["method"])
+            REQUESTS.inc(route=route_path, method=scope["method"], status=str(status_code))
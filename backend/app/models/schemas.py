@@ -5,6 +5,7 @@ Pydantic models for request and response validation.
 from pydantic import BaseModel, Field, validator
 from typing import Optional, List
 import uuid
+from app.config.settings import BATCH_MAX_ITEMS
 
 class QuestionRequest(BaseModel):
     """Request model for asking a question."""
@@ -19,6 +20,12 @@ class QuestionRequest(BaseModel):
         None,
         description="Optional conversation ID to maintain context between messages"
     )
+    model_tier: Optional[str] = Field(
+        None,
+        description="Optional hint naming the model tier to answer with (e.g. 'standard' or 'deep'); "
+                    "by default the tier is chosen from the question's complexity",
+        example="deep"
+    )
     
     @validator('question')
     def validate_question_content(cls, v):
@@ -39,6 +46,16 @@ class ConversationHistory(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()), description="Unique conversation ID")
     messages: List[Message] = Field(default_factory=list, description="List of messages in the conversation")
 
+class ConversationMessagesPage(BaseModel):
+    """Response model for a page of a conversation's messages."""
+    conversation_id: str = Field(..., description="The conversation the messages belong to")
+    messages: List[Message] = Field(..., description="Messages of this page, oldest first")
+    total: int = Field(..., description="Number of messages in the whole conversation")
+    next_cursor: Optional[str] = Field(
+        None,
+        description="Cursor for the next page, or null if this is the last page"
+    )
+
 class AnswerResponse(BaseModel):
     """Response model for an answered question."""
     answer: str = Field(
@@ -50,7 +67,40 @@ class AnswerResponse(BaseModel):
         ...,
         description="Conversation ID to use for future messages in this conversation"
     )
+    suggested_follow_ups: Optional[List[str]] = Field(
+        None,
+        description="Follow-up questions to offer the student, most likely first; ask one "
+                    "in this conversation to continue it, often without waiting for the model",
+        example=["Can you give an example?", "How could this be shown in an experiment?"]
+    )
     error: Optional[str] = Field(
         None,
         description="Error message in case of processing issues"
-    ) 
\ No newline at end of file
+    )
+
+class BatchQuestionRequest(BaseModel):
+    """Request model for asking several questions at once."""
+    questions: List[QuestionRequest] = Field(
+        ...,
+        description="The questions to answer; questions sharing a conversation_id are answered in order"
+    )
+    
+    @validator('questions')
+    def validate_batch_size(cls, v):
+        if not v:
+            raise ValueError("At least one question is required")
+        if len(v) > BATCH_MAX_ITEMS:
+            raise ValueError(f"A batch can contain at most {BATCH_MAX_ITEMS} questions")
+        return v
+
+class BatchAnswerItem(BaseModel):
+    """Result for a single question in a batch."""
+    index: int = Field(..., description="Position of the question in the request")
+    answer: Optional[str] = Field(None, description="The AI-generated answer, if successful")
+    conversation_id: Optional[str] = Field(None, description="Conversation ID to use for future messages")
+    status_code: int = Field(200, description="HTTP status code the question would have received on its own")
+    error: Optional[str] = Field(None, description="Error message if this question failed")
+
+class BatchAnswerResponse(BaseModel):
+    """Response model for a batch of answered questions."""
+    results: List[BatchAnswerItem] = Field(..., description="One result per question, in request order")
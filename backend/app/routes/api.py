@@ -4,7 +4,7 @@ Main API router that includes all route modules.
 
 from fastapi import APIRouter, status
 from pydantic import BaseModel
-from app.routes import education, health
+from app.routes import education, health, metrics
 
 class RootResponse(BaseModel):
     """Response model for the root endpoint."""
@@ -16,6 +16,7 @@ api_router = APIRouter()
 # Include all routers
 api_router.include_router(health.router)
 api_router.include_router(education.router)
+api_router.include_router(metrics.router)
 
 # Root endpoint
 @api_router.get(
@@ -2,10 +2,54 @@
 Routes for educational services.
 """
 
-from fastapi import APIRouter, HTTPException, status
-from fastapi.responses import JSONResponse
-from app.models.schemas import QuestionRequest, AnswerResponse
-from app.services.ai_service import AIService, ModelConnectionError, ModelResponseError, AIServiceError
+import asyncio
+import base64
+import binascii
+import hashlib
+import json
+import logging
+import secrets
+from typing import Awaitable, Callable, Optional, TypeVar
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from app.config.settings import (
+    ADMISSION_CLIENT_ID_HEADER,
+    AI_REQUEST_TIMEOUT,
+    AI_REQUEST_MAX_TIMEOUT,
+    AI_REQUEST_TIMEOUT_HEADER,
+    BATCH_MAX_CONCURRENCY,
+    CONVERSATION_PAGE_SIZE,
+    CONVERSATION_MAX_PAGE_SIZE,
+    CONVERSATION_EXPORT_TOKEN,
+    IDEMPOTENCY_MAX_KEYS,
+    IDEMPOTENCY_KEY_MAX_LENGTH
+)
+from app.models.schemas import (
+    QuestionRequest,
+    AnswerResponse,
+    BatchQuestionRequest,
+    BatchAnswerItem,
+    BatchAnswerResponse,
+    ConversationMessagesPage,
+    Message
+)
+from app.services.admission import AdmissionRejected, admission_controller, retry_after_header
+from app.services.ai_service import AIService, ModelConnectionError, ModelResponseError, AIServiceError, RateLimitError
+from app.services.batch_service import BatchResult, BatchService
+from app.services.conversation_service import ConversationService
+from app.services.conversation_store import MessagePage
+from app.services.deadline import set_deadline
+from app.services.exceptions import DeadlineExceededError
+from app.services.idempotency import IdempotencyKeyReused, idempotency_store, request_fingerprint
+from app.services.metrics import AI_ERRORS, CANCELLED_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Non-standard status (from nginx) recorded when the client went away before the answer
+CLIENT_CLOSED_REQUEST = 499
 
 # Initialize router
 router = APIRouter(
@@ -14,11 +58,218 @@ router = APIRouter(
     responses={
         status.HTTP_400_BAD_REQUEST: {"description": "Bad request"},
         status.HTTP_422_UNPROCESSABLE_ENTITY: {"description": "Invalid input data"},
+        status.HTTP_429_TOO_MANY_REQUESTS: {"description": "Client rate limit exceeded; see Retry-After"},
         status.HTTP_500_INTERNAL_SERVER_ERROR: {"description": "Internal server error"},
-        status.HTTP_503_SERVICE_UNAVAILABLE: {"description": "AI service unavailable"}
+        status.HTTP_503_SERVICE_UNAVAILABLE: {"description": "AI service unavailable or at capacity; see Retry-After"}
     }
 )
 
+def _client_id(http_request: Request) -> str:
+    """
+    Identify the client, for per-client rate limiting and idempotency keys.
+    
+    Uses the header named by ADMISSION_CLIENT_ID_HEADER when configured (e.g.
+    X-Forwarded-For set by a trusted proxy), otherwise the peer address. Of a
+    comma-separated list, the last entry is used: it is the one appended by
+    the proxy in front of the app, while earlier ones come from the client
+    and can be forged to get a fresh rate limit on every request.
+    
+    Args:
+        http_request: The incoming HTTP request
+        
+    Returns:
+        The client identifier
+    """
+    if ADMISSION_CLIENT_ID_HEADER:
+        value = http_request.headers.get(ADMISSION_CLIENT_ID_HEADER)
+        if value:
+            return value.rsplit(",", 1)[-1].strip()
+    return http_request.client.host if http_request.client else "unknown"
+
+def _apply_deadline(http_request: Request) -> None:
+    """
+    Set the deadline of the current request from its timeout header or the default.
+    
+    Args:
+        http_request: The incoming HTTP request
+        
+    Raises:
+        HTTPException: 400 if the header is not a positive number of seconds
+    """
+    timeout = AI_REQUEST_TIMEOUT
+    value = http_request.headers.get(AI_REQUEST_TIMEOUT_HEADER)
+    if value is not None:
+        try:
+            timeout = float(value)
+        except ValueError:
+            timeout = 0
+        if not timeout > 0:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"{AI_REQUEST_TIMEOUT_HEADER} must be a positive number of seconds"
+            )
+    set_deadline(min(timeout, AI_REQUEST_MAX_TIMEOUT))
+
+async def _cancel_on_disconnect(http_request: Request, awaitable: Awaitable[T]) -> T:
+    """
+    Run the work of a request, cancelling it if the client disconnects first.
+    
+    The request body has already been read, so the next ASGI message the
+    client side can produce is the disconnect.
+    
+    Args:
+        http_request: The incoming HTTP request
+        awaitable: The work producing the response
+        
+    Returns:
+        The result of the work
+        
+    Raises:
+        HTTPException: 499 if the client disconnected and the work was cancelled
+    """
+    async def disconnected() -> None:
+        while (await http_request.receive())["type"] != "http.disconnect":
+            pass
+    
+    work = asyncio.ensure_future(awaitable)
+    watcher = asyncio.ensure_future(disconnected())
+    try:
+        await asyncio.wait({work, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    except asyncio.CancelledError:
+        work.cancel()
+        raise
+    finally:
+        watcher.cancel()
+    
+    if not work.done():
+        work.cancel()
+        # Let the cancellation finish, so the question is rolled back before responding
+        await asyncio.gather(work, return_exceptions=True)
+        CANCELLED_REQUESTS.inc(reason="client_disconnect")
+        logger.info("Client disconnected; cancelled its model call")
+        raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client closed the request")
+    return work.result()
+
+def _to_http_exception(error: Exception) -> HTTPException:
+    """
+    Map an error raised while answering a question to an HTTP error response.
+    
+    Args:
+        error: The exception raised by the AI service
+        
+    Returns:
+        HTTPException: The HTTP error to return to the client
+    """
+    if isinstance(error, AdmissionRejected):
+        # Shed by admission control before reaching the AI model
+        return HTTPException(
+            status_code=error.status_code,
+            detail=error.detail,
+            headers=retry_after_header(error.retry_after)
+        )
+    
+    if isinstance(error, ValueError):
+        # Input validation errors (already handled by Pydantic but as a fallback)
+        return HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(error)
+        )
+    
+    if isinstance(error, AIServiceError):
+        AI_ERRORS.inc(type=type(error).__name__)
+    
+    if isinstance(error, DeadlineExceededError):
+        # Out of time for this request; no retry was left to make
+        CANCELLED_REQUESTS.inc(reason="deadline")
+        logger.warning("Request deadline exceeded: %s", error, extra={"error_type": type(error).__name__})
+        return HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="The AI service did not answer in time. Please try again."
+        )
+    
+    if isinstance(error, ModelConnectionError):
+        # Connection issues with the AI model
+        logger.warning("AI service connection error: %s", error, extra={"error_type": type(error).__name__})
+        retry_after = getattr(error, "retry_after", None)
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"AI service is currently unavailable. Please try again later.",
+            headers=retry_after_header(retry_after) if retry_after else None
+        )
+    
+    if isinstance(error, ModelResponseError):
+        # Issues with the AI model's response
+        logger.error("AI model response error: %s", error, extra={"error_type": type(error).__name__})
+        return HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error with AI model response: {str(error)}"
+        )
+    
+    if isinstance(error, RateLimitError):
+        # The AI model is rate limiting us; admission control is backing off
+        logger.warning("AI service rate limit: %s", error, extra={"error_type": type(error).__name__})
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="AI service is busy. Please try again later.",
+            headers=retry_after_header(admission_controller.retry_after())
+        )
+    
+    if isinstance(error, AIServiceError):
+        # General AI service errors
+        logger.error("AI service error: %s", error, extra={"error_type": type(error).__name__})
+        return HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"AI service error: {str(error)}"
+        )
+    
+    # Unexpected errors
+    logger.error(
+        "Unexpected error processing request: %s", error,
+        exc_info=(type(error), error, error.__traceback__),
+        extra={"error_type": type(error).__name__}
+    )
+    return HTTPException(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, 
+        detail=f"Failed to process request: {str(error)}"
+    )
+
+def _release_once(admitted_at: float) -> Callable[[], None]:
+    """
+    Build a callback that releases an admission slot at most once.
+    
+    Streaming responses release their slot both when the stream ends and in a
+    background task, since either may be skipped if the client disconnects.
+    
+    Args:
+        admitted_at: The value returned by admission_controller.acquire()
+        
+    Returns:
+        A callable that releases the slot on its first call only
+    """
+    released = False
+    
+    def release() -> None:
+        nonlocal released
+        if not released:
+            released = True
+            admission_controller.release(admitted_at)
+    
+    return release
+
+def _sse_event(data: dict, event: str = None) -> str:
+    """
+    Format a server-sent event with a JSON payload.
+    
+    Args:
+        data: The payload to send
+        event: Optional event name (clients receive unnamed events as 'message')
+        
+    Returns:
+        The encoded event, terminated by a blank line
+    """
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
 @router.post(
     "/ask", 
     response_model=AnswerResponse,
@@ -32,7 +283,12 @@ router = APIRouter(
                 "application/json": {
                     "example": {
                         "answer": "Photosynthesis is the process by which green plants and some other organisms convert light energy into chemical energy. During photosynthesis, plants capture light energy and use it to convert water, carbon dioxide, and minerals into oxygen and energy-rich organic compounds.",
-                        "conversation_id": "12345678-1234-5678-1234-567812345678"
+                        "conversation_id": "12345678-1234-5678-1234-567812345678",
+                        "suggested_follow_ups": [
+                            "Can you give an example?",
+                            "How could this be shown in an experiment?",
+                            "Can you explain that more simply?"
+                        ]
                     }
                 }
             }
@@ -63,7 +319,7 @@ router = APIRouter(
         }
     }
 )
-async def ask_question(request: QuestionRequest):
+async def ask_question(request: QuestionRequest, http_request: Request, response: Response):
     """
     Process an educational question and return an answer.
     
@@ -75,64 +331,468 @@ async def ask_question(request: QuestionRequest):
     If a conversation_id is provided, the question is interpreted in the context of the previous conversation.
     If no conversation_id is provided, a new conversation is started.
     
+    The answer must be ready within the request's deadline: the
+    X-Request-Timeout header in seconds, or AI_REQUEST_TIMEOUT. Past it the
+    model call is abandoned and the request fails with 504; if the client
+    disconnects first the call is cancelled. Either way the question is not
+    kept in the conversation.
+    
+    The response suggests follow-up questions. The first of them are
+    answered in the background while the server is lightly loaded, so
+    asking one in the same conversation is usually answered at once.
+    
+    Clients that may retry should send an Idempotency-Key header (e.g. a
+    UUID per question). A request repeating a key gets the original answer,
+    waiting for it if it is still being computed, without another model
+    call or duplicate messages in the conversation; such responses carry
+    Idempotent-Replayed: true. Keys are scoped to the client (see
+    _client_id), so clients cannot see each other's answers by reusing a key.
+    
     Args:
         request: The question request object containing the question and optional conversation_id
+        http_request: The underlying HTTP request, used to identify the client
+        response: The response, used to mark replayed answers
         
     Returns:
         AnswerResponse: The AI's response to the question and the conversation ID for future messages
         
     Raises:
-        HTTPException: If there is an error processing the request
+        HTTPException: If there is an error processing the request, 400 for an
+            invalid X-Request-Timeout, 422 if the Idempotency-Key was used for a
+            different request, 429/503 with Retry-After if the request is shed
+            by admission control, or 504 if the deadline passed
     """
-    try:
-        # Log the question (in a production environment, use a proper logging system)
-        print(f"Processing question: {request.question}")
+    _apply_deadline(http_request)
+    
+    async def answer() -> AnswerResponse:
+        admitted_at = None
+        try:
+            admitted_at = await admission_controller.acquire(_client_id(http_request))
+            
+            # Get answer from AI service
+            answer, conversation_id = await AIService.get_answer(
+                question=request.question, 
+                conversation_id=request.conversation_id,
+                model_tier=request.model_tier
+            )
+            
+            # The question itself is never logged, only its size
+            logger.info(
+                "Answered question",
+                extra={
+                    "conversation_id": conversation_id,
+                    "continued": bool(request.conversation_id),
+                    "question_chars": len(request.question),
+                    "answer_chars": len(answer),
+                }
+            )
+            
+            # Return the response with conversation ID and follow-ups to offer
+            return AnswerResponse(
+                answer=answer,
+                conversation_id=conversation_id,
+                suggested_follow_ups=AIService.follow_ups(request.question, answer, conversation_id) or None
+            )
         
-        # Get answer from AI service
-        answer, conversation_id = await AIService.get_answer(
-            question=request.question, 
-            conversation_id=request.conversation_id
-        )
+        except Exception as e:
+            raise _to_http_exception(e)
         
-        # Return the response with conversation ID
-        return AnswerResponse(answer=answer, conversation_id=conversation_id)
+        finally:
+            if admitted_at is not None:
+                admission_controller.release(admitted_at)
     
-    except ValueError as e:
-        # Input validation errors (already handled by Pydantic but as a fallback)
+    idempotency_key = http_request.headers.get("idempotency-key")
+    if not idempotency_key or not IDEMPOTENCY_MAX_KEYS:
+        return await _cancel_on_disconnect(http_request, answer())
+    
+    # Not cancelled on disconnect: the client's retry picks up this answer
+    
+    if len(idempotency_key) > IDEMPOTENCY_KEY_MAX_LENGTH:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=str(e)
+            detail=f"Idempotency-Key must be at most {IDEMPOTENCY_KEY_MAX_LENGTH} characters"
         )
+    fingerprint = request_fingerprint(request.question, request.conversation_id, request.model_tier)
+    # Keys are chosen by clients, so one client's key never replays another client's answer
+    store_key = request_fingerprint(_client_id(http_request), idempotency_key)
+    try:
+        result, replayed = await idempotency_store.run(store_key, fingerprint, answer)
+    except IdempotencyKeyReused as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+@router.post(
+    "/ask/stream",
+    status_code=status.HTTP_200_OK,
+    summary="Ask an educational question and stream the answer",
+    description="Send an educational question to the AI and receive the answer as server-sent events while it is generated.",
+    responses={
+        status.HTTP_200_OK: {
+            "description": "Stream of server-sent events",
+            "content": {
+                "text/event-stream": {
+                    "example": (
+                        'data: {"text": "Photosynthesis is"}\n\n'
+                        'data: {"text": " the process by which..."}\n\n'
+                        'event: done\ndata: {"conversation_id": "12345678-1234-5678-1234-567812345678", '
+                        '"suggested_follow_ups": ["Can you give an example?"]}\n\n'
+                    )
+                }
+            }
+        }
+    }
+)
+async def ask_question_stream(request: QuestionRequest, http_request: Request):
+    """
+    Process an educational question and stream the answer as server-sent events.
     
-    except ModelConnectionError as e:
-        # Connection issues with the AI model
-        # Log the error (in a production environment, use a proper logging system)
-        print(f"AI service connection error: {str(e)}")
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail=f"AI service is currently unavailable. Please try again later."
-        )
+    Each unnamed event carries a chunk of the answer as {"text": ...}. The stream
+    ends with a 'done' event carrying the conversation_id and suggested
+    follow-up questions (as on /ask), or an 'error' event carrying a 'detail'
+    message if the answer fails part-way through. The question and answer are
+    only added to the conversation once the stream completes successfully.
     
-    except ModelResponseError as e:
-        # Issues with the AI model's response
-        print(f"AI model response error: {str(e)}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error with AI model response: {str(e)}"
+    Args:
+        request: The question request object containing the question and optional conversation_id
+        http_request: The underlying HTTP request, used to identify the client
+        
+    Returns:
+        StreamingResponse: The answer as a text/event-stream
+        
+    Raises:
+        HTTPException: If the answer fails before the first chunk is produced,
+            400 for an invalid X-Request-Timeout, or 429/503 with Retry-After if
+            the request is shed by admission control
+    """
+    _apply_deadline(http_request)
+    try:
+        admitted_at = await admission_controller.acquire(_client_id(http_request))
+    except AdmissionRejected as e:
+        raise _to_http_exception(e)
+    
+    # The slot is held until the stream ends, whether it finishes, fails,
+    # or the client goes away
+    release = _release_once(admitted_at)
+    
+    try:
+        chunks, conversation_id = await AIService.stream_answer(
+            question=request.question,
+            conversation_id=request.conversation_id,
+            model_tier=request.model_tier
         )
+        
+        # Wait for the first chunk so errors before streaming starts still
+        # get a proper HTTP status code
+        first_chunk = await chunks.__anext__()
+    except StopAsyncIteration:
+        first_chunk = None
+    except Exception as e:
+        release()
+        raise _to_http_exception(e)
     
-    except AIServiceError as e:
-        # General AI service errors
-        print(f"AI service error: {str(e)}")
+    async def events():
+        parts = []
+        try:
+            if first_chunk is not None:
+                parts.append(first_chunk)
+                yield _sse_event({"text": first_chunk})
+                async for chunk in chunks:
+                    parts.append(chunk)
+                    yield _sse_event({"text": chunk})
+        except Exception as e:
+            yield _sse_event({"detail": _to_http_exception(e).detail}, event="error")
+            return
+        except (asyncio.CancelledError, GeneratorExit):
+            # The client went away mid-stream; closing the stream cancels the model call
+            CANCELLED_REQUESTS.inc(reason="client_disconnect")
+            raise
+        finally:
+            release()
+        suggestions = AIService.follow_ups(request.question, "".join(parts), conversation_id)
+        yield _sse_event({"conversation_id": conversation_id, "suggested_follow_ups": suggestions}, event="done")
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(release)
+    )
+
+def _batch_item(result: BatchResult) -> BatchAnswerItem:
+    """
+    Convert a batch result into its response item, mapping errors like /ask does.
+    
+    Args:
+        result: The outcome of one question in the batch
+        
+    Returns:
+        BatchAnswerItem: The answer, or the status code and detail of the error
+    """
+    if result.error is not None:
+        error = _to_http_exception(result.error)
+        return BatchAnswerItem(index=result.index, status_code=error.status_code, error=error.detail)
+    return BatchAnswerItem(index=result.index, answer=result.answer, conversation_id=result.conversation_id)
+
+@router.post(
+    "/ask/batch",
+    response_model=BatchAnswerResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Ask several educational questions at once",
+    description="Answer a batch of questions concurrently, returning one result per question.",
+    responses={
+        status.HTTP_200_OK: {
+            "description": "One result per question; failed questions carry their own status code and error",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "results": [
+                            {
+                                "index": 0,
+                                "answer": "A noun is a word that names a person, place, thing or idea.",
+                                "conversation_id": "12345678-1234-5678-1234-567812345678",
+                                "status_code": 200,
+                                "error": None
+                            },
+                            {
+                                "index": 1,
+                                "answer": None,
+                                "conversation_id": None,
+                                "status_code": 503,
+                                "error": "AI service is currently unavailable. Please try again later."
+                            }
+                        ]
+                    }
+                },
+                "application/x-ndjson": {
+                    "example": '{"index": 1, "answer": "...", "conversation_id": "...", "status_code": 200, "error": null}\n'
+                }
+            }
+        }
+    }
+)
+async def ask_batch(
+    request: BatchQuestionRequest,
+    http_request: Request,
+    stream: bool = Query(False, description="Stream results as NDJSON in completion order")
+):
+    """
+    Answer a batch of educational questions.
+    
+    Questions are answered concurrently, up to BATCH_MAX_CONCURRENCY at a time.
+    Questions sharing a conversation_id are answered in request order, so each
+    one sees the previous answers. Each question is admitted like one sent to
+    /education/ask, so it counts against the client's rate limit and the
+    in-flight limit. A failing or shed question does not fail the batch: its
+    result carries the status code and error it would have received from
+    /education/ask (including 429 or 503).
+    
+    Args:
+        request: The batch of questions
+        http_request: The underlying HTTP request, used to identify the client
+        stream: If true, return results as newline-delimited JSON as they complete
+        
+    Returns:
+        BatchAnswerResponse with results in request order, or a StreamingResponse
+        of NDJSON lines in completion order when streaming
+        
+    Raises:
+        HTTPException: 400 for an invalid X-Request-Timeout
+    """
+    # One deadline covers the whole batch
+    _apply_deadline(http_request)
+    client_id = _client_id(http_request)
+    
+    if stream:
+        async def lines():
+            async for result in BatchService.answer_as_completed(request.questions, BATCH_MAX_CONCURRENCY, client_id):
+                yield _batch_item(result).json() + "\n"
+        
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+    
+    results = await _cancel_on_disconnect(
+        http_request, BatchService.answer_all(request.questions, BATCH_MAX_CONCURRENCY, client_id)
+    )
+    return BatchAnswerResponse(results=[_batch_item(result) for result in results])
+
+def _encode_cursor(offset: int) -> str:
+    """Encode a message offset as an opaque pagination cursor."""
+    return base64.urlsafe_b64encode(str(offset).encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: Optional[str]) -> int:
+    """
+    Decode a pagination cursor into a message offset.
+    
+    Args:
+        cursor: The cursor from a previous page, or None for the first page
+        
+    Returns:
+        The offset of the first message of the page
+        
+    Raises:
+        HTTPException: 400 if the cursor is malformed
+    """
+    if not cursor:
+        return 0
+    try:
+        offset = int(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        offset = -1
+    if offset < 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return offset
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check an If-None-Match header against an entity tag (weak comparison).
+    
+    Args:
+        if_none_match: The If-None-Match header value, if any
+        etag: The current entity tag, quoted
+        
+    Returns:
+        True if the client's copy is current
+    """
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+def _page_etag(page: MessagePage) -> str:
+    """
+    Compute the entity tag of a page of messages from its content.
+    
+    Args:
+        page: The page of messages and the conversation's message count
+        
+    Returns:
+        The quoted entity tag
+    """
+    content = json.dumps([page.total, [[message.role, message.content] for message in page.messages]])
+    return '"' + hashlib.sha256(content.encode("utf-8")).hexdigest()[:32] + '"'
+
+@router.get(
+    "/conversations/{conversation_id}/messages",
+    response_model=ConversationMessagesPage,
+    status_code=status.HTTP_200_OK,
+    summary="Read a conversation's messages",
+    description="Page through the messages of a conversation, oldest first.",
+    responses={
+        status.HTTP_200_OK: {
+            "description": "A page of messages; pass next_cursor as cursor to get the next one",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "conversation_id": "12345678-1234-5678-1234-567812345678",
+                        "messages": [
+                            {"role": "user", "content": "What is a noun?"},
+                            {"role": "model", "content": "A noun is a word that names a person, place, thing or idea."}
+                        ],
+                        "total": 2,
+                        "next_cursor": None
+                    }
+                }
+            }
+        },
+        status.HTTP_304_NOT_MODIFIED: {"description": "The conversation has not changed since the ETag in If-None-Match"},
+        status.HTTP_404_NOT_FOUND: {"description": "Conversation not found or expired"}
+    }
+)
+async def get_conversation_messages(
+    conversation_id: str,
+    http_request: Request,
+    response: Response,
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page; omit for the first page"),
+    limit: int = Query(CONVERSATION_PAGE_SIZE, ge=1, le=CONVERSATION_MAX_PAGE_SIZE, description="Messages per page")
+):
+    """
+    Get one page of the messages in a conversation.
+    
+    The ETag is a hash of the page and the message count: a client polling
+    with If-None-Match gets 304 Not Modified, without a body, until the
+    conversation changes. A count alone is not enough, since a question
+    whose answer failed is removed again and the next one reuses its count.
+    
+    Args:
+        conversation_id: The ID of the conversation
+        http_request: The underlying HTTP request, used for If-None-Match
+        response: The response, used to set caching headers
+        cursor: Opaque cursor from the previous page's next_cursor
+        limit: Maximum number of messages to return
+        
+    Returns:
+        ConversationMessagesPage with the messages and the cursor of the next page
+        
+    Raises:
+        HTTPException: 400 for an invalid cursor, 404 if the conversation is not found
+    """
+    start = _decode_cursor(cursor)
+    try:
+        page = ConversationService.get_message_page(conversation_id, start, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    
+    headers = {"ETag": _page_etag(page), "Cache-Control": "no-cache"}
+    if _etag_matches(http_request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    response.headers.update(headers)
+    end = start + len(page.messages)
+    return ConversationMessagesPage(
+        conversation_id=conversation_id,
+        messages=[Message(role=message.role, content=message.content) for message in page.messages],
+        total=page.total,
+        next_cursor=_encode_cursor(end) if end < page.total else None
+    )
+
+@router.get(
+    "/conversations/export",
+    status_code=status.HTTP_200_OK,
+    summary="Export all conversations",
+    description="Stream every stored conversation as newline-delimited JSON. Requires the export token.",
+    responses={
+        status.HTTP_200_OK: {
+            "description": "One conversation per line",
+            "content": {
+                "application/x-ndjson": {
+                    "example": '{"id": "12345678-1234-5678-1234-567812345678", "messages": [{"role": "user", "content": "..."}]}\n'
+                }
+            }
+        },
+        status.HTTP_401_UNAUTHORIZED: {"description": "Missing or wrong export token"},
+        status.HTTP_403_FORBIDDEN: {"description": "Export is disabled (CONVERSATION_EXPORT_TOKEN is not set)"}
+    }
+)
+async def export_conversations(http_request: Request):
+    """
+    Stream all stored conversations as NDJSON, one ConversationHistory per line.
+    
+    Conversations are read from the store one at a time while the response
+    is sent, so memory use stays flat however many are stored. Reading runs
+    in the thread pool, so a long export does not block other requests.
+    Exported conversations are not counted as used and still expire.
+    
+    Args:
+        http_request: The underlying HTTP request, carrying the bearer token
+        
+    Returns:
+        StreamingResponse: The conversations as application/x-ndjson
+        
+    Raises:
+        HTTPException: 403 if export is disabled, 401 if the token is wrong
+    """
+    if not CONVERSATION_EXPORT_TOKEN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Conversation export is disabled")
+    
+    scheme, _, token = http_request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token.encode(), CONVERSATION_EXPORT_TOKEN.encode()):
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"AI service error: {str(e)}"
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid export token",
+            headers={"WWW-Authenticate": "Bearer"}
         )
     
-    except Exception as e:
-        # Unexpected errors
-        print(f"Unexpected error processing request: {str(e)}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, 
-            detail=f"Failed to process request: {str(e)}"
-        ) 
\ No newline at end of file
+    # A plain generator: StreamingResponse iterates it in the thread pool
+    lines = (conversation.json() + "\n" for conversation in ConversationService.export_conversations())
+    return StreamingResponse(lines, media_type="application/x-ndjson")
@@ -2,8 +2,10 @@
 Health check routes for the API.
 """
 
-from fastapi import APIRouter, status
+from typing import Dict, Optional
+from fastapi import APIRouter, Response, status
 from pydantic import BaseModel
+from app.services.readiness import readiness_monitor
 
 
 class HealthResponse(BaseModel):
@@ -11,6 +13,20 @@ class HealthResponse(BaseModel):
     status: str
 
 
+class ReadinessCheckResult(BaseModel):
+    """Result of one readiness check."""
+    ok: bool
+    value: float
+    limit: float
+    detail: Optional[str] = None
+
+
+class ReadinessResponse(BaseModel):
+    """Response model for readiness check."""
+    status: str
+    checks: Dict[str, ReadinessCheckResult]
+
+
 # Initialize router
 router = APIRouter(tags=["health"])
 
@@ -39,4 +55,58 @@ async def health_check():
     Returns:
         HealthResponse: A simple status response indicating the API is healthy
     """
-    return HealthResponse(status="ok") 
\ No newline at end of file
+    return HealthResponse(status="ok")
+
+
+@router.get(
+    "/ready",
+    response_model=ReadinessResponse,
+    summary="Readiness Check",
+    description="Checks if this worker should receive traffic: upstream reachable, event loop responsive, load and store within limits.",
+    status_code=status.HTTP_200_OK,
+    responses={
+        status.HTTP_200_OK: {
+            "description": "Worker is ready",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "status": "ready",
+                        "checks": {
+                            "upstream": {"ok": True, "value": 0, "limit": 2, "detail": None},
+                            "event_loop_lag": {"ok": True, "value": 0.002, "limit": 0.5, "detail": None},
+                            "in_flight": {"ok": True, "value": 3, "limit": 0, "detail": None},
+                            "queued": {"ok": True, "value": 0, "limit": 64, "detail": None},
+                            "store_occupancy": {"ok": True, "value": 0.12, "limit": 0, "detail": None},
+                            "draining": {"ok": True, "value": 0, "limit": 0, "detail": None}
+                        }
+                    }
+                }
+            }
+        },
+        status.HTTP_503_SERVICE_UNAVAILABLE: {"description": "Worker is not ready; the failing checks have ok: false"}
+    }
+)
+async def readiness_check(response: Response):
+    """
+    Reports whether this worker is ready for traffic.
+    
+    Unlike /health, this fails (503) when the upstream probe keeps failing,
+    the event loop has been blocked, too many requests are running or
+    queued, the conversation store is too full or the worker is shutting
+    down. It only reads state measured in the background, so it never
+    calls the model. A limit of 0 means the check is disabled.
+    
+    Args:
+        response: The response, used to set the 503 status
+        
+    Returns:
+        ReadinessResponse: The overall status and the result of each check
+    """
+    checks = readiness_monitor.checks()
+    ready = all(check.ok for check in checks.values())
+    if not ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return ReadinessResponse(
+        status="ready" if ready else "not_ready",
+        checks={name: ReadinessCheckResult(**check._asdict()) for name, check in checks.items()}
+    )
@@ -0,0 +1,96 @@
+"""
+Metrics routes for the API.
+"""
+
+from fastapi import APIRouter, status
+from fastapi.responses import PlainTextResponse
+from app.services.admission import admission_controller
+from app.services.ai_service import AIService
+from app.services.conversation_service import ConversationService
+from app.services.follow_ups import follow_up_prefetcher
+from app.services.idempotency import idempotency_store
+from app.services.metrics import registry
+from app.services.readiness import readiness_monitor
+from app.services.turn_scheduler import turn_scheduler
+
+# Component stats read at scrape time
+registry.register_stats(
+    "mentorai_conversation_store",
+    "Conversation store occupancy and eviction counters.",
+    ConversationService.stats
+)
+registry.register_stats(
+    "mentorai_context",
+    "Estimated tokens saved by summarizing older turns.",
+    ConversationService.context_stats
+)
+registry.register_stats(
+    "mentorai_answer_cache",
+    "Answer cache occupancy and hit counters.",
+    AIService.cache_stats
+)
+registry.register_stats(
+    "mentorai_similar_questions",
+    "Near-duplicate question index occupancy, hit rate and false matches found by audits.",
+    AIService.similar_question_stats
+)
+registry.register_stats(
+    "mentorai_prefetch",
+    "Follow-up prefetch budget and usage; hit_rate is the share of suggested follow-ups asked that were answered from a prefetch.",
+    follow_up_prefetcher.stats
+)
+registry.register_stats(
+    "mentorai_admission",
+    "Admission control occupancy and shedding counters.",
+    admission_controller.stats
+)
+registry.register_stats(
+    "mentorai_idempotency",
+    "Idempotency-Key store occupancy and replay counters.",
+    idempotency_store.stats
+)
+registry.register_stats(
+    "mentorai_readiness",
+    "Event loop lag (worst recent sample) and upstream probe counters.",
+    readiness_monitor.stats
+)
+registry.register_stats(
+    "mentorai_turns",
+    "Per-conversation turn scheduling: busy conversations, queued turns and counters.",
+    turn_scheduler.stats
+)
+registry.register_stats(
+    "mentorai_model_backend",
+    "Model backend retry, hedging and circuit breaker counters.",
+    AIService.backend_stats
+)
+registry.register_stats(
+    "mentorai_key_pool",
+    "API key pool size, failovers and calls rejected with every key out of quota.",
+    AIService.pool_stats
+)
+registry.register_labeled_stats(
+    "mentorai_api_key",
+    "Calls, rate limits, quota headroom and cooldown per API key.",
+    "key",
+    AIService.key_stats
+)
+
+# Initialize router
+router = APIRouter(tags=["metrics"])
+
+@router.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    summary="Metrics",
+    description="Metrics of this worker process in the Prometheus text exposition format.",
+    status_code=status.HTTP_200_OK
+)
+async def metrics():
+    """
+    Expose request, pipeline stage, token, error and component metrics.
+    
+    Returns:
+        PlainTextResponse: The metrics in the Prometheus text format
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,102 @@
+"""
+Production server entry point.
+
+Runs the app under uvicorn with several worker processes, the fastest
+available event loop and HTTP parser, tuned keep-alive and a graceful
+shutdown. Settings come from app.config.settings (and so the environment);
+command-line options override them.
+
+Usage:
+    python -m app.server [--host H] [--port P] [--workers N] [--loop L] [--http H]
+"""
+
+import argparse
+import importlib.util
+import logging
+import uvicorn
+from app.config.logging_config import configure_logging
+from app.config.settings import (
+    CONVERSATION_STORE,
+    LOG_LEVEL,
+    SERVER_HOST,
+    SERVER_PORT,
+    SERVER_WORKERS,
+    SERVER_LOOP,
+    SERVER_HTTP,
+    SERVER_KEEP_ALIVE,
+    SERVER_BACKLOG,
+    SERVER_GRACEFUL_TIMEOUT,
+    SERVER_ACCESS_LOG
+)
+
+logger = logging.getLogger("app.server")
+
+def resolve_implementation(requested: str, fast: str, fallback: str) -> str:
+    """
+    Pick the event loop or HTTP parser implementation to run with.
+
+    Args:
+        requested: The configured value ("auto" or an implementation name)
+        fast: The optional faster implementation (e.g. "uvloop")
+        fallback: The pure-Python implementation used without it (e.g. "asyncio")
+
+    Returns:
+        The implementation name to pass to uvicorn
+    """
+    if requested != "auto":
+        return requested
+    return fast if importlib.util.find_spec(fast) else fallback
+
+def server_options(args: argparse.Namespace) -> dict:
+    """
+    Build the uvicorn options for a production run.
+
+    Args:
+        args: Parsed command-line options
+
+    Returns:
+        Keyword arguments for uvicorn.run()
+    """
+    return {
+        "host": args.host,
+        "port": args.port,
+        "workers": args.workers,
+        "loop": resolve_implementation(args.loop, "uvloop", "asyncio"),
+        "http": resolve_implementation(args.http, "httptools", "h11"),
+        "timeout_keep_alive": SERVER_KEEP_ALIVE,
+        "backlog": SERVER_BACKLOG,
+        # uvicorn stops accepting connections, lets in-flight requests finish
+        # up to this deadline and then runs the lifespan shutdown, which
+        # drains admitted model calls (see app.main.lifespan)
+        "timeout_graceful_shutdown": SERVER_GRACEFUL_TIMEOUT,
+        "access_log": SERVER_ACCESS_LOG,
+        "log_level": LOG_LEVEL.lower(),
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS)
+    parser.add_argument("--loop", default=SERVER_LOOP, choices=("auto", "uvloop", "asyncio"))
+    parser.add_argument("--http", default=SERVER_HTTP, choices=("auto", "httptools", "h11"))
+    args = parser.parse_args()
+
+    configure_logging()
+    options = server_options(args)
+    if options["workers"] > 1 and CONVERSATION_STORE == "memory":
+        # Each worker would keep its own conversations, and a follow-up
+        # question routed to another worker would start a new one
+        logger.warning(
+            "Running %d workers with the in-memory conversation store; "
+            "set CONVERSATION_STORE=sqlite to share conversations between them",
+            options["workers"]
+        )
+    logger.info(
+        "Starting production server",
+        extra={key: options[key] for key in ("host", "port", "workers", "loop", "http")}
+    )
+    uvicorn.run("app.main:app", **options)
+
+if __name__ == "__main__":
+    main()
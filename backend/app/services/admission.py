@@ -0,0 +1,348 @@
+"""
+Admission control and load shedding for requests that call the AI model.
+"""
+
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, Optional
+from app.config.settings import (
+    ADMISSION_MAX_IN_FLIGHT,
+    ADMISSION_MIN_IN_FLIGHT,
+    ADMISSION_MAX_QUEUE,
+    ADMISSION_MAX_QUEUE_TIME,
+    ADMISSION_CLIENT_RATE,
+    ADMISSION_CLIENT_BURST
+)
+
+# Number of per-client buckets kept before the least recently seen are dropped
+MAX_TRACKED_CLIENTS = 10000
+
+class AdmissionRejected(Exception):
+    """Exception raised when a request is shed instead of admitted."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """Token bucket allowing `rate` requests per second with bursts up to `capacity`."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def available(self, now: float) -> float:
+        """
+        Refill the bucket and get the tokens in it.
+
+        Args:
+            now: The current time
+
+        Returns:
+            The number of tokens available, possibly fractional
+        """
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return self.tokens
+
+    def take(self, now: float) -> float:
+        """
+        Take one token if available.
+
+        Args:
+            now: The current time
+
+        Returns:
+            0 if a token was taken, otherwise the seconds until one is available
+        """
+        if self.available(now) >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+class AdmissionController:
+    """
+    Limits how many requests reach the AI model at once.
+
+    Each client has a token bucket; a client over its rate is shed with 429.
+    Admitted requests run while fewer than `limit` are in flight, and the
+    rest wait in a bounded FIFO queue for at most `max_queue_time` seconds.
+    Requests that find the queue full or time out waiting are shed with 503.
+    Shed requests carry a Retry-After based on the queue depth and the recent
+    service time. Once draining for shutdown, every new request is shed.
+
+    The in-flight limit adapts to the upstream (AIMD): it is halved each time
+    the model reports a rate limit and grows back by about one per limit's
+    worth of successful requests, up to `max_in_flight`.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int,
+        min_in_flight: int,
+        max_queue: int,
+        max_queue_time: float,
+        client_rate: float,
+        client_burst: float,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            max_in_flight: Upper bound for concurrently admitted requests
+            min_in_flight: Lower bound the adaptive limit never goes below
+            max_queue: Maximum number of requests waiting for a slot
+            max_queue_time: Seconds a request may wait for a slot before being shed
+            client_rate: Requests per second allowed per client (0 for no per-client limit)
+            client_burst: Burst size allowed per client
+            clock: Monotonic time source, replaceable in tests
+        """
+        self.max_in_flight = max_in_flight
+        self.min_in_flight = min(min_in_flight, max_in_flight)
+        self.max_queue = max_queue
+        self.max_queue_time = max_queue_time
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self._clock = clock
+
+        self.limit = float(max_in_flight)
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._service_time = 1.0  # Moving average of seconds per admitted request
+
+        self.draining = False
+
+        self.admitted = 0
+        self.admitted_background = 0
+        self.shed_draining = 0
+        self.shed_client_rate = 0
+        self.shed_queue_full = 0
+        self.shed_queue_timeout = 0
+        self.upstream_rate_limits = 0
+
+    @classmethod
+    def from_settings(cls) -> "AdmissionController":
+        """
+        Create a controller configured from application settings.
+
+        Returns:
+            A new AdmissionController
+        """
+        return cls(
+            max_in_flight=ADMISSION_MAX_IN_FLIGHT,
+            min_in_flight=ADMISSION_MIN_IN_FLIGHT,
+            max_queue=ADMISSION_MAX_QUEUE,
+            max_queue_time=ADMISSION_MAX_QUEUE_TIME,
+            client_rate=ADMISSION_CLIENT_RATE,
+            client_burst=ADMISSION_CLIENT_BURST
+        )
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of requests waiting for a slot."""
+        return len(self._waiters)
+
+    async def acquire(self, client_id: str) -> float:
+        """
+        Admit a request, waiting in the queue if necessary.
+
+        Args:
+            client_id: Identifier of the client making the request
+
+        Returns:
+            The admission time, to pass to release()
+
+        Raises:
+            AdmissionRejected: If the request is shed
+        """
+        if self.draining:
+            self.shed_draining += 1
+            raise AdmissionRejected(503, "Server is restarting. Please try again shortly.", 1.0)
+
+        now = self._clock()
+        self._check_client_rate(client_id, now)
+
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return now
+
+        if len(self._waiters) >= self.max_queue:
+            self.shed_queue_full += 1
+            raise AdmissionRejected(503, "Server is at capacity. Please try again later.", self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.max_queue_time)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted a slot just as the wait timed out; give it back
+                self.release(self._clock(), record=False)
+            self.shed_queue_timeout += 1
+            raise AdmissionRejected(503, "Server is busy. Please try again later.", self.retry_after())
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release(self._clock(), record=False)
+            raise
+        finally:
+            if not waiter.done():
+                waiter.cancel()
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+
+        self.admitted += 1
+        return self._clock()
+
+    def try_acquire(self) -> Optional[float]:
+        """
+        Take a free slot for background work, without waiting or rate limiting.
+
+        Background work never queues, so it cannot delay requests: it only
+        gets a slot when no request is waiting for one.
+
+        Returns:
+            The admission time, to pass to release(), or None if no slot is free
+        """
+        if self.draining or self._waiters or self.in_flight >= int(self.limit):
+            return None
+        self.in_flight += 1
+        self.admitted_background += 1
+        return self._clock()
+
+    def release(self, admitted_at: float, record: bool = True) -> None:
+        """
+        Release the slot of a finished request and admit waiting ones.
+
+        Args:
+            admitted_at: The value returned by acquire()
+            record: Whether to count the request towards the service time average
+        """
+        self.in_flight -= 1
+        if record:
+            elapsed = self._clock() - admitted_at
+            self._service_time = 0.9 * self._service_time + 0.1 * elapsed
+        self._wake_waiters()
+
+    def observe_success(self) -> None:
+        """Grow the in-flight limit after a request the upstream accepted."""
+        if self.limit < self.max_in_flight:
+            self.limit = min(float(self.max_in_flight), self.limit + 1.0 / self.limit)
+            self._wake_waiters()
+
+    def observe_rate_limit(self) -> None:
+        """Halve the in-flight limit after the upstream reported a rate limit."""
+        self.upstream_rate_limits += 1
+        self.limit = max(float(self.min_in_flight), self.limit / 2)
+
+    async def drain(self, timeout: float, poll_interval: float = 0.05) -> bool:
+        """
+        Stop admitting requests and wait for admitted and queued ones to finish.
+
+        New requests are shed with 503 from now on; requests already queued
+        are still served.
+
+        Args:
+            timeout: Maximum seconds to wait
+            poll_interval: Seconds between checks
+
+        Returns:
+            True if every request finished, False if some were still running at the deadline
+        """
+        self.draining = True
+        deadline = self._clock() + timeout
+        while (self.in_flight or self._waiters) and self._clock() < deadline:
+            await asyncio.sleep(poll_interval)
+        return not (self.in_flight or self._waiters)
+
+    def utilization(self) -> float:
+        """
+        Get the current load relative to the in-flight limit.
+        
+        Returns:
+            In-flight plus queued requests divided by the limit; above 1 means requests are queueing
+        """
+        return (self.in_flight + len(self._waiters)) / max(1.0, self.limit)
+
+    def retry_after(self) -> float:
+        """
+        Estimate how long a shed request should wait before retrying.
+
+        Returns:
+            Seconds until the current queue is expected to drain
+        """
+        slots = max(1, int(self.limit))
+        return max(1.0, (len(self._waiters) + 1) * self._service_time / slots)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get admission counters and current occupancy.
+
+        Returns:
+            A dictionary of counter names to values
+        """
+        return {
+            "in_flight": self.in_flight,
+            "in_flight_limit": int(self.limit),
+            "queue_depth": len(self._waiters),
+            "admitted": self.admitted,
+            "admitted_background": self.admitted_background,
+            "draining": self.draining,
+            "shed_draining": self.shed_draining,
+            "shed_client_rate": self.shed_client_rate,
+            "shed_queue_full": self.shed_queue_full,
+            "shed_queue_timeout": self.shed_queue_timeout,
+            "upstream_rate_limits": self.upstream_rate_limits,
+        }
+
+    def _check_client_rate(self, client_id: str, now: float) -> None:
+        """Take a token from the client's bucket or shed the request with 429."""
+        if not self.client_rate:
+            return
+        bucket = self._buckets.get(client_id)
+        if bucket is None:
+            bucket = TokenBucket(self.client_rate, self.client_burst, now)
+            self._buckets[client_id] = bucket
+            if len(self._buckets) > MAX_TRACKED_CLIENTS:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client_id)
+
+        wait = bucket.take(now)
+        if wait:
+            self.shed_client_rate += 1
+            raise AdmissionRejected(429, "Too many requests. Please slow down.", wait)
+
+    def _wake_waiters(self) -> None:
+        """Hand free slots to waiting requests in arrival order."""
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            self.in_flight += 1
+            waiter.set_result(None)
+
+def retry_after_header(seconds: float) -> Dict[str, str]:
+    """
+    Build a Retry-After header for a delay in seconds.
+
+    Args:
+        seconds: The suggested delay
+
+    Returns:
+        Headers to attach to the response
+    """
+    return {"Retry-After": str(max(1, math.ceil(seconds)))}
+
+# Shared controller for this worker process
+admission_controller = AdmissionController.from_settings()
@@ -2,27 +2,53 @@
 Service for interacting with the Google Gemini AI model.
 """
 
-import google.generativeai as genai
-import time
+import asyncio
+import contextvars
+import logging
 import re
-from app.config.settings import GOOGLE_API_KEY, AI_MODEL, SYSTEM_PROMPT
+import time
+from app.config.settings import (
+    AI_MAX_CONCURRENCY,
+    AI_MODEL_TIERS,
+    AI_ROUTING_COMPLEX_SUBJECTS,
+    AI_ROUTING_LOAD_SHIFT,
+    ANSWER_CACHE_MAX_ENTRIES,
+    ANSWER_CACHE_TTL,
+    FOLLOW_UP_SUGGESTIONS,
+    SIMILAR_QUESTIONS_MAX_ENTRIES,
+    TOPIC_FILTER_THRESHOLD,
+    SYSTEM_PROMPT
+)
+from app.services.admission import admission_controller
+from app.services.answer_cache import AnswerCache, prompt_version
+from app.services.context_builder import ContextWindow
 from app.services.conversation_service import ConversationService
-from typing import Dict, Any, Optional, Tuple, Union, List
+from app.services.follow_ups import PrefetchedAnswer, follow_up_prefetcher, suggest_follow_ups
+from app.services.exceptions import AIServiceError, ModelConnectionError, ModelResponseError, RateLimitError
+from app.services.deadline import within_deadline
+from app.services.key_pool import KeyPoolBackend
+from app.services.metrics import (
+    MODEL_CALL_LATENCY,
+    MODEL_ROUTES,
+    MODEL_TOKENS,
+    ROLLED_BACK_MESSAGES,
+    SIMILAR_QUESTION_LOOKUP_LATENCY,
+    stage
+)
+from app.services.model_backend import GenerationOptions, ModelBackend, create_backend
+from app.services.model_router import ModelRouter, RouteDecision, parse_tiers
+from app.services.resilience import ResilientBackend
+from app.services.topic_classifier import TopicClassifier
+from app.services.turn_scheduler import turn_scheduler
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Any, Optional, Set, Tuple, Union, List
 
-# Configure Gemini
-genai.configure(api_key=GOOGLE_API_KEY)
+if TYPE_CHECKING:
+    from app.services.similar_questions import SimilarMatch, SimilarQuestionIndex
 
-class AIServiceError(Exception):
-    """Base exception for AI service errors."""
-    pass
+logger = logging.getLogger(__name__)
 
-class ModelConnectionError(AIServiceError):
-    """Exception raised when there's an issue connecting to the AI model."""
-    pass
-
-class ModelResponseError(AIServiceError):
-    """Exception raised when there's an issue with the AI model's response."""
-    pass
+# Changes whenever the system prompt does, so cached answers never outlive it
+SYSTEM_PROMPT_VERSION = prompt_version(SYSTEM_PROMPT)
 
 class AIService:
     """Service for handling AI interactions with Google Gemini."""
@@ -51,35 +77,225 @@ class AIService:
         'proof', 'evidence', 'experiment', 'observation', 'hypothesis'
     ]
     
+    # Words and phrases typical of the topics the system prompt excludes. Only
+    # unambiguous ones: words like "game", "score", "team" or "dating" also
+    # appear in maths and science questions, which must reach the model
+    NON_EDUCATIONAL_TOPICS = [
+        'football', 'soccer', 'basketball', 'baseball', 'nba', 'nfl', 'premier league', 'who won',
+        'celebrity', 'celebrities', 'influencer', 'gossip', 'instagram', 'tiktok', 'youtuber',
+        'tv show', 'netflix', 'video game', 'fortnite', 'minecraft', 'roblox', 'gaming',
+        'makeup', 'hairstyle', 'outfit', 'girlfriend', 'boyfriend', 'relationship advice',
+        'horoscope', 'zodiac'
+    ]
+    
+    # Reply to clearly non-academic questions, sent without calling the model
+    OFF_TOPIC_REPLY = (
+        "I focus exclusively on academic subjects, so I can't help with that topic. "
+        "I'd be glad to help with mathematics, the sciences, computer science, history, "
+        "geography, literature, languages or the arts. Which subject would you like to explore?"
+    )
+    
+    # Compiled matcher over both topic lists
+    _topic_classifier = TopicClassifier(EDUCATIONAL_TOPICS, NON_EDUCATIONAL_TOPICS)
+    
+    # Model backend used for all requests (created from settings on first use,
+    # wrapped with retries, circuit breaking and hedging)
+    _backend: Optional[ModelBackend] = None
+    
+    # Caps concurrent upstream calls per worker (created on first use)
+    _semaphore: Optional[asyncio.Semaphore] = None
+    
+    # Answers to opening questions (those without a conversation_id)
+    _answer_cache = AnswerCache(max_entries=ANSWER_CACHE_MAX_ENTRIES, ttl=ANSWER_CACHE_TTL)
+    
+    # Answered opening questions searched for near-duplicates (created on first
+    # use, which is when NumPy is imported)
+    _similar_questions: Optional["SimilarQuestionIndex"] = None
+    
+    # Audits of near-duplicate hits running in the background
+    _audits: Set[asyncio.Task] = set()
+    
+    # Picks the model tier and output budget for each question
+    _router = ModelRouter(
+        parse_tiers(AI_MODEL_TIERS),
+        complex_subjects=AI_ROUTING_COMPLEX_SUBJECTS.split(","),
+        load_shift=AI_ROUTING_LOAD_SHIFT
+    )
+    
+    @classmethod
+    def get_backend(cls) -> ModelBackend:
+        """
+        Get the model backend, creating it from settings on first use.
+        
+        Returns:
+            The active ModelBackend
+        """
+        if cls._backend is None:
+            cls._backend = ResilientBackend.from_settings(create_backend())
+        return cls._backend
+    
+    @classmethod
+    def set_backend(cls, backend: Optional[ModelBackend]) -> None:
+        """
+        Replace the model backend (e.g. with a FakeBackend in tests).
+        
+        Args:
+            backend: The backend to use, or None to recreate it from settings
+        """
+        cls._backend = backend
+    
+    @classmethod
+    def backend_stats(cls) -> Dict[str, Any]:
+        """
+        Get retry, hedging and circuit breaker counters of the model backend.
+        
+        Returns:
+            A dictionary of counter names to values (empty if the backend keeps none)
+        """
+        stats = getattr(cls.get_backend(), "stats", None)
+        return stats() if stats else {}
+    
+    @classmethod
+    def _key_pool(cls) -> Optional[KeyPoolBackend]:
+        """The key pool under the resilience layer, if the backend is one."""
+        backend = cls.get_backend()
+        inner = getattr(backend, "inner", backend)
+        return inner if isinstance(inner, KeyPoolBackend) else None
+    
+    @classmethod
+    def pool_stats(cls) -> Dict[str, int]:
+        """
+        Get failover counters of the API key pool.
+        
+        Returns:
+            A dictionary of counter names to values (empty without a key pool)
+        """
+        pool = cls._key_pool()
+        return pool.stats() if pool else {}
+    
+    @classmethod
+    def key_stats(cls) -> Dict[str, Dict[str, Any]]:
+        """
+        Get usage, quota and cooldown state per API key of the key pool.
+        
+        Returns:
+            A dictionary of key names to counters (empty without a key pool)
+        """
+        pool = cls._key_pool()
+        return pool.key_stats() if pool else {}
+    
+    @classmethod
+    def cache_stats(cls) -> Dict[str, int]:
+        """
+        Get occupancy and hit counters of the answer cache.
+        
+        Returns:
+            A dictionary of counter names to values
+        """
+        return cls._answer_cache.stats()
+    
+    @classmethod
+    def get_similar_questions(cls) -> Optional["SimilarQuestionIndex"]:
+        """
+        Get the index of answered opening questions, creating it from settings on first use.
+        
+        A saved index is loaded when it is created.
+        
+        Returns:
+            The index, or None if SIMILAR_QUESTIONS_MAX_ENTRIES disables it
+        """
+        if cls._similar_questions is None and SIMILAR_QUESTIONS_MAX_ENTRIES:
+            from app.services.similar_questions import SimilarQuestionIndex
+            cls._similar_questions = SimilarQuestionIndex.from_settings()
+        return cls._similar_questions
+    
+    @classmethod
+    def save_similar_questions(cls) -> None:
+        """Save the index of answered opening questions to its path, if it has one."""
+        if cls._similar_questions is None:
+            return
+        try:
+            cls._similar_questions.save()
+        except OSError as e:
+            logger.warning("Could not save similar questions: %s", e)
+    
+    @classmethod
+    def similar_question_stats(cls) -> Dict[str, float]:
+        """
+        Get occupancy, hit and audit counters of the similar question index.
+        
+        Returns:
+            A dictionary of counter names to values (empty until the index is used)
+        """
+        return cls._similar_questions.stats() if cls._similar_questions else {}
+    
+    @classmethod
+    def get_semaphore(cls) -> asyncio.Semaphore:
+        """
+        Get the semaphore limiting in-flight model calls to AI_MAX_CONCURRENCY.
+        
+        Returns:
+            The shared asyncio.Semaphore
+        """
+        if cls._semaphore is None:
+            cls._semaphore = asyncio.Semaphore(AI_MAX_CONCURRENCY)
+        return cls._semaphore
+    
     @staticmethod
-    async def get_answer(question: str, conversation_id: Optional[str] = None, max_retries: int = 2) -> Tuple[str, str]:
+    def is_off_topic(question: str) -> bool:
         """
-        Get an answer to a question from the AI model.
+        Check whether a question is clearly non-academic.
+        
+        A question is off-topic when its off-topic phrases outnumber its
+        academic ones by at least TOPIC_FILTER_THRESHOLD. Ambiguous questions
+        are not off-topic and are left for the model to judge.
         
         Args:
-            question: The question to ask the AI
-            conversation_id: Optional ID of an existing conversation
-            max_retries: Maximum number of retry attempts if model fails
+            question: The question to check
             
         Returns:
-            A tuple containing (AI's response as a string, conversation ID)
+            True if the question should get the canned redirect
+        """
+        if not TOPIC_FILTER_THRESHOLD:
+            return False
+        return AIService._topic_classifier.classify(question).score <= -TOPIC_FILTER_THRESHOLD
+    
+    @staticmethod
+    def route(question: str, turns: int = 0, model_tier: Optional[str] = None) -> RouteDecision:
+        """
+        Choose the model tier for a question, shifting to faster tiers under load.
+        
+        Args:
+            question: The sanitized question
+            turns: Number of earlier turns in the conversation
+            model_tier: Optional tier requested by the client
             
-        Raises:
-            ModelConnectionError: If there is an error connecting to the AI service
-            ModelResponseError: If there is an error with the model's response
-            AIServiceError: For other AI service related errors
+        Returns:
+            The RouteDecision, counted in the routing metrics once the model is called
         """
-        # Sanitize input
-        sanitized_question = question.strip()
-        if not sanitized_question:
-            raise ValueError("Question cannot be empty")
+        return AIService._router.route(
+            question,
+            turns=turns,
+            hint=model_tier,
+            load=admission_controller.utilization()
+        )
+    
+    @staticmethod
+    def _resolve_conversation(conversation_id: Optional[str]) -> str:
+        """
+        Get the ID of an existing conversation, or create a new one.
         
-        # Get or create conversation
+        Args:
+            conversation_id: Optional ID of an existing conversation
+            
+        Returns:
+            The ID of the existing conversation, or of a new one if it was not
+            given or no longer exists
+        """
         if conversation_id:
             try:
                 # Validate that conversation exists
-                conversation = ConversationService.get_conversation(conversation_id)
-                if not conversation:
+                if not ConversationService.conversation_exists(conversation_id):
                     # If conversation doesn't exist, create a new one
                     conversation = ConversationService.create_conversation()
                     conversation_id = conversation.id
@@ -92,62 +308,412 @@ class AIService:
             conversation = ConversationService.create_conversation()
             conversation_id = conversation.id
         
+        return conversation_id
+    
+    @staticmethod
+    def _categorize_error(error: Exception) -> AIServiceError:
+        """
+        Convert an unexpected backend exception into an AIServiceError.
+        
+        Args:
+            error: The exception raised by the model backend
+            
+        Returns:
+            The AIServiceError to raise in its place
+        """
+        if isinstance(error, AIServiceError):
+            return error
+        if isinstance(error, (ConnectionError, TimeoutError)):
+            return ModelConnectionError(f"Failed to connect to AI service: {str(error)}")
+        if "api_key" in str(error).lower():
+            return AIServiceError(f"Authentication error with AI service: {str(error)}")
+        elif "rate" in str(error).lower() and "limit" in str(error).lower():
+            return RateLimitError(f"Rate limit exceeded: {str(error)}")
+        else:
+            return AIServiceError(f"Error getting answer from AI service: {str(error)}")
+    
+    @staticmethod
+    async def get_answer(
+        question: str,
+        conversation_id: Optional[str] = None,
+        model_tier: Optional[str] = None
+    ) -> Tuple[str, str]:
+        """
+        Get an answer to a question from the AI model.
+        
+        Questions in the same conversation are answered one at a time, in
+        the order they arrive, so each one sees the previous answers.
+        
+        Args:
+            question: The question to ask the AI
+            conversation_id: Optional ID of an existing conversation
+            model_tier: Optional model tier requested by the client
+            
+        Returns:
+            A tuple containing (AI's response as a string, conversation ID)
+            
+        Raises:
+            ModelConnectionError: If there is an error connecting to the AI service
+            ModelResponseError: If there is an error with the model's response
+            DeadlineExceededError: If the request's deadline passes first
+            AdmissionRejected: If too many questions are already waiting in the conversation
+            AIServiceError: For other AI service related errors
+        """
+        # Sanitize input
+        sanitized_question = question.strip()
+        if not sanitized_question:
+            raise ValueError("Question cannot be empty")
+        
+        # A new conversation has no earlier turn to wait for
+        if not conversation_id:
+            return await AIService._answer_turn(sanitized_question, None, model_tier)
+        async with turn_scheduler.turn(conversation_id):
+            return await AIService._answer_turn(sanitized_question, conversation_id, model_tier)
+    
+    @staticmethod
+    async def _answer_turn(
+        sanitized_question: str,
+        conversation_id: Optional[str],
+        model_tier: Optional[str]
+    ) -> Tuple[str, str]:
+        """
+        Answer one question, holding the conversation's turn if it has one.
+        
+        Args:
+            sanitized_question: The stripped, non-empty question
+            conversation_id: Optional ID of an existing conversation
+            model_tier: Optional model tier requested by the client
+            
+        Returns:
+            A tuple containing (AI's response as a string, conversation ID)
+        """
+        # Clearly off-topic questions are redirected without calling the model
+        if AIService.is_off_topic(sanitized_question):
+            with stage("store_lookup"):
+                conversation_id = AIService._resolve_conversation(conversation_id)
+            with stage("store_write"):
+                ConversationService.add_message(conversation_id, "user", sanitized_question)
+                ConversationService.add_message(conversation_id, "model", AIService.OFF_TOPIC_REPLY)
+            return AIService.OFF_TOPIC_REPLY, conversation_id
+        
+        # Opening questions are answered from the cache, or with the answer to
+        # a near-duplicate, when possible; a hit still starts a real
+        # conversation seeded with the exchange
+        if not conversation_id and (ANSWER_CACHE_MAX_ENTRIES or SIMILAR_QUESTIONS_MAX_ENTRIES):
+            decision = AIService.route(sanitized_question, model_tier=model_tier)
+            cache_key = AnswerCache.make_key(sanitized_question, decision.tier.model, SYSTEM_PROMPT_VERSION)
+            answer, _ = await AIService._answer_cache.get_or_compute(
+                cache_key,
+                lambda: AIService._answer_opening(sanitized_question, decision)
+            )
+            with stage("store_write"):
+                conversation_id = ConversationService.create_conversation().id
+                ConversationService.add_message(conversation_id, "user", sanitized_question)
+                ConversationService.add_message(conversation_id, "model", answer)
+            return answer, conversation_id
+        
+        # Get or create conversation
+        with stage("store_lookup"):
+            conversation_id = AIService._resolve_conversation(conversation_id)
+        
+        # Prior turns are passed to the model as native chat history, so take
+        # them before the new question is recorded
+        with stage("context_build"):
+            context = ConversationService.build_context(conversation_id)
+        history = context.history
+        turns = AIService._turns(context)
+        decision = AIService.route(sanitized_question, turns, model_tier)
+        
+        # A suggested follow-up may already have been answered in the background
+        prefetched = await follow_up_prefetcher.take(conversation_id, sanitized_question, turns, decision.tier.model)
+        
         # Add user message to history
-        ConversationService.add_message(conversation_id, "user", sanitized_question)
+        with stage("store_write"):
+            ConversationService.add_message(conversation_id, "user", sanitized_question)
+        
+        try:
+            answer = prefetched or await AIService._generate(history, sanitized_question, decision)
+        except BaseException:
+            # Failed, timed out or cancelled because the client went away:
+            # take the question back out so the history (and a retry) does
+            # not see it unanswered
+            if ConversationService.remove_message(conversation_id, "user", sanitized_question):
+                ROLLED_BACK_MESSAGES.inc()
+            raise
+        
+        # Add the AI's response to the conversation history
+        with stage("store_write"):
+            ConversationService.add_message(conversation_id, "model", answer)
+        
+        # Return the AI's response and conversation ID
+        return answer, conversation_id
+    
+    @staticmethod
+    async def _answer_opening(question: str, decision: RouteDecision) -> str:
+        """
+        Answer an opening question with the stored answer to a near-duplicate, or the model's.
+        
+        New answers from the model are added to the similar question index.
+        
+        Args:
+            question: The sanitized question
+            decision: The model tier to answer with
+            
+        Returns:
+            The answer
             
-        retry_count = 0
-        last_error = None
+        Raises:
+            ModelConnectionError: If there is an error connecting to the AI service
+            ModelResponseError: If there is an error with the model's response
+            RateLimitError: If the AI service is rate limiting requests
+            AIServiceError: For other AI service related errors
+        """
+        index = AIService.get_similar_questions()
+        if index is None:
+            return await AIService._generate([], question, decision)
+        
+        # Answers depend on the model and the system prompt as well as the question
+        scope = f"{decision.tier.model}:{SYSTEM_PROMPT_VERSION}"
+        started = time.perf_counter()
+        match = index.lookup(question, scope)
+        SIMILAR_QUESTION_LOOKUP_LATENCY.observe(time.perf_counter() - started)
+        if match is not None:
+            # Audits spend an extra model call, so only while nothing is queueing
+            if index.should_audit() and admission_controller.utilization() < 1:
+                AIService._start_audit(index, match, question, decision)
+            return match.answer
         
-        while retry_count <= max_retries:
+        answer = await AIService._generate([], question, decision)
+        index.add(question, answer, scope)
+        return answer
+    
+    @staticmethod
+    def _start_audit(
+        index: "SimilarQuestionIndex",
+        match: "SimilarMatch",
+        question: str,
+        decision: RouteDecision
+    ) -> None:
+        """
+        Ask the model a question answered from a near-duplicate, in the background,
+        and check its answer against the one served.
+        
+        Args:
+            index: The index the match came from
+            match: The match whose answer was served
+            question: The question it was served for
+            decision: The model tier the question was routed to
+        """
+        async def audit() -> None:
             try:
-                # Initialize the Gemini model
-                model = genai.GenerativeModel(AI_MODEL)
-                
-                # Get formatted conversation history
-                history = ConversationService.format_history_for_gemini(conversation_id)
-                
-                # Create chat session
-                chat = model.start_chat(history=[])
-                
-                # Always send system prompt first for consistent behavior
-                chat.send_message(SYSTEM_PROMPT)
-                
-                # Send all messages in history
-                for message in history:
-                    chat.send_message(message["parts"][0])
-                
-                # Send the user's question and get response
-                response = chat.send_message(sanitized_question)
-                
-                # Validate response
-                if not response or not response.text or len(response.text.strip()) == 0:
-                    raise ModelResponseError("Received empty response from AI model")
-                
-                # Add the AI's response to the conversation history
-                ConversationService.add_message(conversation_id, "model", response.text)
-                
-                # Return the AI's response and conversation ID
-                return response.text, conversation_id
-                
-            except (ConnectionError, TimeoutError) as e:
-                last_error = e
-                retry_count += 1
-                if retry_count <= max_retries:
-                    # Exponential backoff
-                    wait_time = 2 ** retry_count
-                    time.sleep(wait_time)
-                else:
-                    raise ModelConnectionError(f"Failed to connect to AI service after {max_retries} retries: {str(e)}")
-                    
+                fresh_answer = await AIService._generate([], question, decision)
             except Exception as e:
-                # Categorize other exceptions
-                if "api_key" in str(e).lower():
-                    raise AIServiceError(f"Authentication error with AI service: {str(e)}")
-                elif "rate" in str(e).lower() and "limit" in str(e).lower():
-                    raise AIServiceError(f"Rate limit exceeded: {str(e)}")
-                else:
-                    raise AIServiceError(f"Error getting answer from AI service: {str(e)}")
-        
-        # This should not happen due to the raise in the loop, but adding as a safeguard
-        if last_error:
-            raise AIServiceError(f"Failed to get answer after retries: {str(last_error)}") 
\ No newline at end of file
+                logger.info("Skipped a similar question audit: %s", e)
+                return
+            index.audit(match, question, fresh_answer)
+        
+        # A new context, so the audit is not bound by the request's deadline
+        task = asyncio.get_running_loop().create_task(audit(), context=contextvars.Context())
+        AIService._audits.add(task)
+        task.add_done_callback(AIService._audits.discard)
+    
+    @staticmethod
+    def follow_ups(question: str, answer: str, conversation_id: str) -> List[str]:
+        """
+        Suggest follow-up questions to an answer, and start answering them in the background.
+        
+        Prefetching is budgeted by the follow-up prefetcher: it is skipped
+        under load and capped per conversation and per worker.
+        
+        Args:
+            question: The question that was answered
+            answer: The answer it got
+            conversation_id: The conversation the answer was recorded in
+            
+        Returns:
+            The suggestions, most likely first (empty for off-topic redirects
+            or with FOLLOW_UP_SUGGESTIONS at 0)
+        """
+        if not FOLLOW_UP_SUGGESTIONS or answer == AIService.OFF_TOPIC_REPLY:
+            return []
+        suggestions = suggest_follow_ups(question, answer, FOLLOW_UP_SUGGESTIONS)
+        follow_up_prefetcher.schedule(
+            conversation_id,
+            suggestions,
+            lambda follow_up: AIService._prefetch_answer(conversation_id, follow_up)
+        )
+        return suggestions
+    
+    @staticmethod
+    async def _prefetch_answer(conversation_id: str, question: str) -> PrefetchedAnswer:
+        """
+        Answer a follow-up against the conversation's current history, without recording it.
+        
+        Args:
+            conversation_id: The ID of the conversation
+            question: The suggested follow-up
+            
+        Returns:
+            The answer, with the turn count and model it is valid for
+        """
+        context = ConversationService.build_context(conversation_id)
+        turns = AIService._turns(context)
+        decision = AIService.route(question, turns)
+        answer = await AIService._generate(context.history, question, decision)
+        return PrefetchedAnswer(turns, decision.tier.model, answer)
+    
+    @staticmethod
+    def _turns(context: ContextWindow) -> int:
+        """Number of earlier turns in a conversation, including summarized ones."""
+        return (context.summarized_messages + len(context.history)) // 2
+    
+    @staticmethod
+    async def _generate(history: List[Dict], question: str, decision: RouteDecision) -> str:
+        """
+        Get the model's reply to a question.
+        
+        Retries, backoff and circuit breaking happen in the ResilientBackend
+        wrapping the model backend.
+        
+        Args:
+            history: Prior turns in Gemini's format
+            question: The sanitized question
+            decision: The model tier to answer with
+            
+        Returns:
+            The model's reply text
+            
+        Raises:
+            ModelConnectionError: If there is an error connecting to the AI service
+            ModelResponseError: If there is an error with the model's response
+            RateLimitError: If the AI service is rate limiting requests
+            AIServiceError: For other AI service related errors
+        """
+        backend = AIService.get_backend()
+        tier = decision.tier
+        options = GenerationOptions(model=tier.model, max_output_tokens=tier.max_output_tokens)
+        MODEL_ROUTES.inc(tier=tier.name, load_shifted=str(decision.load_shifted).lower())
+        try:
+            # One upstream call per turn, regardless of conversation length.
+            # The call is awaited so the event loop keeps serving other requests.
+            async with AIService.get_semaphore():
+                # Includes any retries; backoff is also timed as "retry_backoff"
+                started = time.perf_counter()
+                with stage("model_call"):
+                    response = await backend.generate_async(history, question, options)
+                MODEL_CALL_LATENCY.observe(time.perf_counter() - started, tier=tier.name)
+        except Exception as e:
+            # Categorize other exceptions
+            error = AIService._categorize_error(e)
+            if isinstance(error, RateLimitError):
+                # Let admission control back off before more requests are rejected
+                admission_controller.observe_rate_limit()
+            raise error
+        
+        # Validate response
+        if not response or not response.text or len(response.text.strip()) == 0:
+            raise ModelResponseError("Received empty response from AI model")
+        
+        MODEL_TOKENS.inc(response.prompt_tokens, kind="prompt", tier=tier.name)
+        MODEL_TOKENS.inc(response.output_tokens, kind="output", tier=tier.name)
+        admission_controller.observe_success()
+        return response.text
+    
+    @staticmethod
+    async def stream_answer(
+        question: str,
+        conversation_id: Optional[str] = None,
+        model_tier: Optional[str] = None
+    ) -> Tuple[AsyncIterator[str], str]:
+        """
+        Start streaming an answer to a question from the AI model.
+        
+        The question and the complete answer are added to the conversation
+        only once the stream has finished, so an interrupted or failed stream
+        leaves the history unchanged, and a conversation it started is
+        deleted again. The stream holds the conversation's
+        turn from its first chunk until it ends, like get_answer().
+        
+        Args:
+            question: The question to ask the AI
+            conversation_id: Optional ID of an existing conversation
+            model_tier: Optional model tier requested by the client
+            
+        Returns:
+            A tuple containing (async iterator over answer chunks, conversation ID)
+            
+        Raises:
+            ValueError: If the question is empty
+            AdmissionRejected: While iterating, if too many questions are already
+                waiting in the conversation
+            ModelResponseError: While iterating, if the model's response is empty
+            AIServiceError: While iterating, for other AI service related errors
+        """
+        # Sanitize input
+        sanitized_question = question.strip()
+        if not sanitized_question:
+            raise ValueError("Question cannot be empty")
+        
+        with stage("store_lookup"):
+            resolved_id = AIService._resolve_conversation(conversation_id)
+        # A conversation created for this stream is deleted again if the stream
+        # does not complete, rather than left behind empty
+        created = resolved_id != conversation_id
+        conversation_id = resolved_id
+        backend = AIService.get_backend()
+        off_topic = AIService.is_off_topic(sanitized_question)
+        
+        async def chunks() -> AsyncIterator[str]:
+            try:
+                # Taken inside the generator, so closing the stream releases the turn
+                async with turn_scheduler.turn(conversation_id):
+                    parts: List[str] = []
+                    if off_topic:
+                        parts.append(AIService.OFF_TOPIC_REPLY)
+                        yield AIService.OFF_TOPIC_REPLY
+                    else:
+                        with stage("context_build"):
+                            context = ConversationService.build_context(conversation_id)
+                        turns = AIService._turns(context)
+                        decision = AIService.route(sanitized_question, turns, model_tier)
+                        tier = decision.tier
+                        options = GenerationOptions(model=tier.model, max_output_tokens=tier.max_output_tokens)
+                        # A suggested follow-up may already have been answered in the background
+                        prefetched = await follow_up_prefetcher.take(conversation_id, sanitized_question, turns, tier.model)
+                        if prefetched:
+                            parts.append(prefetched)
+                            yield prefetched
+                        else:
+                            MODEL_ROUTES.inc(tier=tier.name, load_shifted=str(decision.load_shifted).lower())
+                            try:
+                                async with AIService.get_semaphore():
+                                    with stage("model_call"):
+                                        # Each chunk must arrive before the request's deadline
+                                        stream = backend.stream_async(context.history, sanitized_question, options).__aiter__()
+                                        while True:
+                                            try:
+                                                chunk = await within_deadline(stream.__anext__())
+                                            except StopAsyncIteration:
+                                                break
+                                            parts.append(chunk)
+                                            yield chunk
+                            except Exception as e:
+                                error = AIService._categorize_error(e)
+                                if isinstance(error, RateLimitError):
+                                    admission_controller.observe_rate_limit()
+                                raise error
+                    
+                    answer = "".join(parts)
+                    if not answer.strip():
+                        raise ModelResponseError("Received empty response from AI model")
+                    
+                    # Record the turn only after the whole answer has arrived
+                    with stage("store_write"):
+                        ConversationService.add_message(conversation_id, "user", sanitized_question)
+                        ConversationService.add_message(conversation_id, "model", answer)
+            except BaseException:
+                if created:
+                    ConversationService.delete_conversation(conversation_id)
+                raise
+        
+        return chunks(), conversation_id
@@ -0,0 +1,206 @@
+"""
+Cache of answers to opening questions, shared by identical concurrent requests.
+"""
+
+import asyncio
+import contextvars
+import hashlib
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from app.services.deadline import within_deadline
+
+# Operators change what a question asks ("2+2" is not "2*2"), so they are kept as words
+_OPERATOR = re.compile(r"([+\-*/=<>^%×÷≠≤≥])")
+# Other punctuation, except a decimal point ("2.5" is not "25")
+_PUNCTUATION = re.compile(r"(?!(?<=\d)\.\d)[^\w\s+\-*/=<>^%×÷≠≤≥]")
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_question(question: str) -> str:
+    """
+    Normalize a question so trivially different phrasings share a cache entry.
+
+    Case, punctuation and repeated whitespace are ignored, so "What is
+    photosynthesis?" and "what is  photosynthesis" normalize the same way.
+    Operators and decimal points are kept, so "What is 2+2?" and "What is
+    2*2?" do not.
+
+    Args:
+        question: The question as asked
+
+    Returns:
+        The normalized question
+    """
+    text = unicodedata.normalize("NFKC", question).lower()
+    text = _PUNCTUATION.sub(" ", text)
+    text = _OPERATOR.sub(r" \1 ", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+def prompt_version(system_prompt: str) -> str:
+    """
+    Get a short version tag for a system prompt.
+
+    Args:
+        system_prompt: The system prompt text
+
+    Returns:
+        A hash that changes whenever the prompt changes
+    """
+    return hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()[:12]
+
+class AnswerCache:
+    """
+    LRU + TTL cache of answers with single-flight request coalescing.
+
+    While an answer for a key is being computed, further requests for the
+    same key wait for that computation instead of starting their own, so any
+    number of identical concurrent questions make one upstream call.
+    Failures are passed to every waiter and are never cached. The
+    computation runs in its own task and is only cancelled once every
+    caller waiting for it has gone away. It keeps the request context of
+    the caller that started it, deadline and stage timings included.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            max_entries: Maximum number of cached answers
+            ttl: Seconds a cached answer stays valid
+            clock: Monotonic time source, replaceable in tests
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(question: str, model: str, system_prompt_version: str) -> str:
+        """
+        Build the cache key for a question.
+
+        Args:
+            question: The question as asked
+            model: Name of the model that answers it
+            system_prompt_version: Version tag of the system prompt in use
+
+        Returns:
+            The cache key
+        """
+        return f"{model}:{system_prompt_version}:{normalize_question(question)}"
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Get a cached answer if present and not expired.
+
+        Args:
+            key: The cache key
+
+        Returns:
+            The cached answer, or None
+        """
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        answer, stored_at = item
+        if self._clock() - stored_at >= self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return answer
+
+    def put(self, key: str, answer: str) -> None:
+        """
+        Store an answer, evicting the least recently used entries over the cap.
+
+        Args:
+            key: The cache key
+            answer: The answer to cache
+        """
+        self._entries[key] = (answer, self._clock())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[str]]) -> Tuple[str, bool]:
+        """
+        Get a cached answer, or compute it once for all concurrent callers.
+
+        Args:
+            key: The cache key
+            compute: Coroutine function producing the answer on a miss
+
+        Returns:
+            A tuple containing (answer, whether it came from the cache or
+            another caller's computation rather than a new upstream call)
+
+        Raises:
+            DeadlineExceededError: If the caller's deadline passes before the answer is ready
+        """
+        answer = self.get(key)
+        if answer is not None:
+            self.hits += 1
+            return answer, True
+
+        task = self._in_flight.get(key)
+        coalesced = task is not None
+        if coalesced:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            # Detached, so the first caller going away does not end the
+            # computation for the others. It runs in a copy of that caller's
+            # context: its deadline still applies, and its stage timings
+            # reach that request's Server-Timing header
+            task = asyncio.get_running_loop().create_task(
+                self._compute(key, compute), context=contextvars.copy_context()
+            )
+            # Retrieve the outcome even if every waiter went away, so a failure is not reported as unhandled
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+            self._in_flight[key] = task
+            self._waiters[key] = 0
+
+        self._waiters[key] += 1
+        try:
+            # Shielded so a waiter going away does not cancel the computation;
+            # each waiter still gives up at its own deadline
+            return await within_deadline(asyncio.shield(task)), coalesced
+        finally:
+            self._waiters[key] -= 1
+            # Nobody is left to use the answer once the last waiter is gone
+            if not self._waiters[key]:
+                del self._waiters[key]
+                if not task.done():
+                    task.cancel()
+
+    async def _compute(self, key: str, compute: Callable[[], Awaitable[str]]) -> str:
+        try:
+            answer = await compute()
+        finally:
+            del self._in_flight[key]
+        self.put(key, answer)
+        return answer
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get cache occupancy and hit counters.
+
+        Returns:
+            A dictionary of counter names to values
+        """
+        return {
+            "entries": len(self._entries),
+            "in_flight": len(self._in_flight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,117 @@
+"""
+Service for answering batches of questions concurrently.
+"""
+
+import asyncio
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional, Tuple
+from app.models.schemas import QuestionRequest
+from app.services.admission import admission_controller
+from app.services.ai_service import AIService
+
+class BatchResult(NamedTuple):
+    """Outcome of one question in a batch."""
+    index: int
+    answer: Optional[str]
+    conversation_id: Optional[str]
+    error: Optional[Exception]
+
+class BatchService:
+    """Service for answering batches of questions through the AIService."""
+    
+    @staticmethod
+    def _group(questions: List[QuestionRequest]) -> List[List[int]]:
+        """
+        Group question indexes so each conversation's questions run in order.
+        
+        Args:
+            questions: The questions in the batch
+            
+        Returns:
+            Lists of indexes; questions without a conversation_id get their own group
+        """
+        groups: Dict[str, List[int]] = {}
+        independent: List[List[int]] = []
+        for index, question in enumerate(questions):
+            if question.conversation_id:
+                groups.setdefault(question.conversation_id, []).append(index)
+            else:
+                independent.append([index])
+        return list(groups.values()) + independent
+    
+    @staticmethod
+    async def answer_as_completed(
+        questions: List[QuestionRequest],
+        concurrency: int,
+        client_id: str
+    ) -> AsyncIterator[BatchResult]:
+        """
+        Answer a batch of questions, yielding each result as soon as it is ready.
+        
+        At most `concurrency` questions are answered at once. Questions that
+        share a conversation_id are answered one after another in request
+        order, while different conversations run in parallel. A failing
+        question produces a result carrying its error rather than failing
+        the batch.
+        
+        Each question goes through admission control like a question sent to
+        /ask on its own, taking a token from the client's rate limit and an
+        in-flight slot while it is answered, so a batch gets no more model
+        calls than the same questions sent one by one. A shed question's
+        result carries the AdmissionRejected error.
+        
+        Args:
+            questions: The questions to answer
+            concurrency: Maximum number of questions answered at the same time
+            client_id: Identifier of the client, for per-client rate limiting
+            
+        Yields:
+            A BatchResult per question, in completion order
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        results: asyncio.Queue = asyncio.Queue()
+        
+        async def run_group(indexes: List[int]) -> None:
+            for index in indexes:
+                question = questions[index]
+                async with semaphore:
+                    try:
+                        admitted_at = await admission_controller.acquire(client_id)
+                        try:
+                            answer, conversation_id = await AIService.get_answer(
+                                question=question.question,
+                                conversation_id=question.conversation_id,
+                                model_tier=question.model_tier
+                            )
+                        finally:
+                            admission_controller.release(admitted_at)
+                        result = BatchResult(index, answer, conversation_id, None)
+                    except Exception as e:
+                        result = BatchResult(index, None, None, e)
+                await results.put(result)
+        
+        tasks = [asyncio.create_task(run_group(group)) for group in BatchService._group(questions)]
+        try:
+            for _ in range(len(questions)):
+                yield await results.get()
+        finally:
+            # Stop outstanding work if the caller stops listening early
+            for task in tasks:
+                task.cancel()
+    
+    @staticmethod
+    async def answer_all(questions: List[QuestionRequest], concurrency: int, client_id: str) -> List[BatchResult]:
+        """
+        Answer a batch of questions and return the results in request order.
+        
+        Args:
+            questions: The questions to answer
+            concurrency: Maximum number of questions answered at the same time
+            client_id: Identifier of the client, for per-client rate limiting
+            
+        Returns:
+            One BatchResult per question, in request order
+        """
+        ordered: List[Optional[BatchResult]] = [None] * len(questions)
+        async for result in BatchService.answer_as_completed(questions, concurrency, client_id):
+            ordered[result.index] = result
+        return ordered
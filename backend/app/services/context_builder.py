@@ -0,0 +1,171 @@
+"""
+Token-budgeted context windows for conversations sent to the AI model.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Sequence
+from app.models.schemas import Message
+
+# Average characters per token for English text; close enough for budgeting
+CHARS_PER_TOKEN = 4
+
+# Longest excerpt of a single message kept in the summary
+SUMMARY_EXCERPT_CHARS = 160
+
+_FIRST_SENTENCE = re.compile(r"(.+?[.!?])(?:\s|$)")
+_MARKDOWN_NOISE = re.compile(r"[#*_`>|]+")
+_WHITESPACE = re.compile(r"\s+")
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens in a piece of text without calling the model.
+
+    Args:
+        text: The text to measure
+
+    Returns:
+        The approximate token count
+    """
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def summarize_message(message: Message) -> str:
+    """
+    Reduce a message to a one-line excerpt for the rolling summary.
+
+    Args:
+        message: The message to summarize
+
+    Returns:
+        A single line naming the speaker and the gist of the message
+    """
+    text = _WHITESPACE.sub(" ", _MARKDOWN_NOISE.sub(" ", message.content)).strip()
+    match = _FIRST_SENTENCE.match(text)
+    if match:
+        text = match.group(1)
+    if len(text) > SUMMARY_EXCERPT_CHARS:
+        text = text[:SUMMARY_EXCERPT_CHARS - 3].rstrip() + "..."
+    speaker = "Student asked" if message.role == "user" else "Tutor explained"
+    return f"- {speaker}: {text}"
+
+class ContextWindow(NamedTuple):
+    """The history to send for one request, and what building it saved."""
+    history: List[Dict]
+    summarized_messages: int
+    tokens_used: int
+    tokens_saved: int
+
+class _Summary:
+    """Summary lines for the first `folded` messages of a conversation."""
+
+    __slots__ = ("folded", "lines", "tokens")
+
+    def __init__(self):
+        self.folded = 0
+        self.lines: List[str] = []
+        self.tokens = 0
+
+class ContextBuilder:
+    """
+    Builds conversation history that fits within a token budget.
+
+    The most recent turns are kept verbatim. Older turns are folded into a
+    compact summary that is sent as the first exchange of the history. The
+    summary for each conversation is cached and only extended with the turns
+    that have aged out since the previous request.
+    """
+
+    SUMMARY_PREFIX = "Summary of our earlier conversation:\n"
+    SUMMARY_ACK = "Understood. I will continue from where we left off."
+
+    def __init__(self, token_budget: int, summary_token_budget: int, max_cached_summaries: int = 10000):
+        """
+        Args:
+            token_budget: Maximum estimated tokens of history sent per request
+            summary_token_budget: Maximum estimated tokens of the summary itself
+            max_cached_summaries: Number of conversation summaries kept in memory
+        """
+        self.token_budget = token_budget
+        self.summary_token_budget = summary_token_budget
+        self.max_cached_summaries = max_cached_summaries
+        self._summaries: "OrderedDict[str, _Summary]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.total_tokens_saved = 0
+
+    def build(self, conversation_id: str, messages: Sequence[Message]) -> ContextWindow:
+        """
+        Build the history for the next request in a conversation.
+
+        Args:
+            conversation_id: The ID of the conversation
+            messages: All messages in the conversation so far (anything with `role` and `content`)
+
+        Returns:
+            The ContextWindow to send, with token accounting
+        """
+        costs = [estimate_tokens(message.content) for message in messages]
+        full_tokens = sum(costs)
+        if full_tokens <= self.token_budget:
+            return ContextWindow(self._format(messages), 0, full_tokens, 0)
+
+        # Keep whole user/model exchanges from the end until the budget is used,
+        # leaving room for the summary; always keep at least the last exchange
+        available = self.token_budget - self.summary_token_budget
+        split = len(messages)
+        used = 0
+        while split >= 2:
+            exchange = costs[split - 2] + costs[split - 1]
+            if used + exchange > available and split < len(messages):
+                break
+            used += exchange
+            split -= 2
+
+        summary = self._summary_for(conversation_id, messages, split)
+        summary_text = self.SUMMARY_PREFIX + "\n".join(summary.lines)
+        history = [
+            {"role": "user", "parts": [summary_text]},
+            {"role": "model", "parts": [self.SUMMARY_ACK]},
+        ] + self._format(messages[split:])
+
+        tokens_used = used + estimate_tokens(summary_text) + estimate_tokens(self.SUMMARY_ACK)
+        tokens_saved = max(0, full_tokens - tokens_used)
+        self.total_tokens_saved += tokens_saved
+        return ContextWindow(history, split, tokens_used, tokens_saved)
+
+    def forget(self, conversation_id: str) -> None:
+        """
+        Drop the cached summary for a conversation.
+
+        Args:
+            conversation_id: The ID of the conversation
+        """
+        with self._lock:
+            self._summaries.pop(conversation_id, None)
+
+    def _summary_for(self, conversation_id: str, messages: Sequence[Message], split: int) -> _Summary:
+        """Get the cached summary of messages[:split], extending it incrementally."""
+        with self._lock:
+            summary = self._summaries.get(conversation_id)
+            if summary is None or summary.folded > split:
+                # New conversation, or the history was rewritten: start over
+                summary = _Summary()
+            self._summaries[conversation_id] = summary
+            self._summaries.move_to_end(conversation_id)
+            while len(self._summaries) > self.max_cached_summaries:
+                self._summaries.popitem(last=False)
+
+            for message in messages[summary.folded:split]:
+                line = summarize_message(message)
+                summary.lines.append(line)
+                summary.tokens += estimate_tokens(line) + 1
+            summary.folded = max(summary.folded, split)
+
+            # Roll the oldest lines off once the summary exceeds its own budget
+            while summary.tokens > self.summary_token_budget and len(summary.lines) > 1:
+                summary.tokens -= estimate_tokens(summary.lines.pop(0)) + 1
+            return summary
+
+    @staticmethod
+    def _format(messages: Sequence[Message]) -> List[Dict]:
+        return [{"role": message.role, "parts": [message.content]} for message in messages]
@@ -2,15 +2,98 @@
 Service for managing conversation histories.
 """
 
-import uuid
-from typing import Dict, List, Optional
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Union
+from app.config.settings import CONTEXT_TOKEN_BUDGET, CONTEXT_SUMMARY_TOKEN_BUDGET
 from app.models.schemas import ConversationHistory, Message
+from app.services.context_builder import ContextBuilder, ContextWindow
+from app.services.conversation_store import ConversationStore, MessagePage, MessageRecord, create_store
 
 class ConversationService:
     """Service for managing conversation histories."""
     
-    # In-memory store of conversation histories (in a production app, this would be a database)
-    _conversations: Dict[str, ConversationHistory] = {}
+    # Store of conversation histories, selected by the CONVERSATION_STORE
+    # setting; evicted conversations are simply not found, and callers start
+    # a new conversation instead. Created on first use, so that importing the
+    # app opens no database and starts no thread
+    _store: Optional[ConversationStore] = None
+    
+    # Fits the history sent to the model within the configured token budget
+    _context_builder = ContextBuilder(
+        token_budget=CONTEXT_TOKEN_BUDGET,
+        summary_token_budget=CONTEXT_SUMMARY_TOKEN_BUDGET
+    )
+    
+    # Called with the ID of each conversation the store drops; kept here so
+    # they follow the conversations into a replacement store. The summary
+    # cached for a conversation goes with it
+    _removal_listeners: List[Callable[[str], None]] = [_context_builder.forget]
+    
+    @classmethod
+    def get_store(cls) -> ConversationStore:
+        """
+        Get the conversation store.
+        
+        Returns:
+            The active ConversationStore, created on first use
+        """
+        if cls._store is None:
+            cls.set_store(create_store())
+        return cls._store
+    
+    @classmethod
+    def set_store(cls, store: ConversationStore) -> None:
+        """
+        Replace the conversation store.
+        
+        Args:
+            store: The store to use for all conversations
+        """
+        for listener in cls._removal_listeners:
+            store.add_removal_listener(listener)
+        cls._store = store
+    
+    @classmethod
+    def add_removal_listener(cls, listener: Callable[[str], None]) -> None:
+        """
+        Have a function called whenever a conversation is evicted, expires or is deleted.
+        
+        Args:
+            listener: Called with the ID of the removed conversation, possibly
+                from another thread; it must not use the store
+        """
+        cls._removal_listeners.append(listener)
+        if cls._store is not None:
+            cls._store.add_removal_listener(listener)
+    
+    @classmethod
+    def stats(cls) -> Dict[str, int]:
+        """
+        Get occupancy and eviction counters for the conversation store.
+        
+        Returns:
+            A dictionary of counter names to values
+        """
+        return cls.get_store().stats()
+    
+    @classmethod
+    def occupancy(cls) -> float:
+        """
+        Get the fraction of the conversation store's capacity in use.
+        
+        Returns:
+            The occupancy, 0 for an unbounded store
+        """
+        return cls.get_store().occupancy()
+    
+    @classmethod
+    def context_stats(cls) -> Dict[str, int]:
+        """
+        Get token savings of the context builder.
+        
+        Returns:
+            A dictionary of counter names to values
+        """
+        return {"tokens_saved": cls._context_builder.total_tokens_saved}
     
     @classmethod
     def create_conversation(cls) -> ConversationHistory:
@@ -20,9 +103,7 @@ class ConversationService:
         Returns:
             A new ConversationHistory object
         """
-        conversation = ConversationHistory()
-        cls._conversations[conversation.id] = conversation
-        return conversation
+        return cls.get_store().create()
     
     @classmethod
     def get_conversation(cls, conversation_id: str) -> Optional[ConversationHistory]:
@@ -35,7 +116,20 @@ class ConversationService:
         Returns:
             The conversation if found, None otherwise
         """
-        return cls._conversations.get(conversation_id)
+        return cls.get_store().get(conversation_id)
+    
+    @classmethod
+    def conversation_exists(cls, conversation_id: str) -> bool:
+        """
+        Check whether a conversation exists, without loading its messages.
+        
+        Args:
+            conversation_id: The ID of the conversation
+            
+        Returns:
+            True if the conversation exists
+        """
+        return cls.get_store().exists(conversation_id)
     
     @classmethod
     def add_message(cls, conversation_id: str, role: str, content: str) -> None:
@@ -50,11 +144,39 @@ class ConversationService:
         Raises:
             ValueError: If the conversation ID is not found
         """
-        conversation = cls.get_conversation(conversation_id)
-        if not conversation:
-            raise ValueError(f"Conversation with ID {conversation_id} not found")
+        cls.get_store().append(conversation_id, Message(role=role, content=content))
+    
+    @classmethod
+    def remove_message(cls, conversation_id: str, role: str, content: str) -> bool:
+        """
+        Remove the most recent matching message from a conversation.
+        
+        Used to roll back a question when its answer is abandoned, so the
+        history holds no question without an answer.
         
-        conversation.messages.append(Message(role=role, content=content))
+        Args:
+            conversation_id: The ID of the conversation
+            role: The role of the message sender ('user' or 'model')
+            content: The content of the message
+            
+        Returns:
+            True if a message was removed, False if none matched or the
+            conversation no longer exists
+        """
+        return cls.get_store().remove_message(conversation_id, Message(role=role, content=content))
+    
+    @classmethod
+    def delete_conversation(cls, conversation_id: str) -> bool:
+        """
+        Delete a conversation and its messages.
+        
+        Args:
+            conversation_id: The ID of the conversation
+            
+        Returns:
+            True if the conversation existed
+        """
+        return cls.get_store().delete(conversation_id)
     
     @classmethod
     def get_messages(cls, conversation_id: str) -> List[Message]:
@@ -76,6 +198,59 @@ class ConversationService:
         
         return conversation.messages
     
+    @classmethod
+    def get_message_page(cls, conversation_id: str, start: int, limit: int) -> MessagePage:
+        """
+        Get a page of the messages in a conversation.
+        
+        Args:
+            conversation_id: The ID of the conversation
+            start: Index of the first message to return
+            limit: Maximum number of messages to return
+            
+        Returns:
+            The MessagePage, with the conversation's total message count
+            
+        Raises:
+            ValueError: If the conversation ID is not found
+        """
+        page = cls.get_store().page(conversation_id, start, limit)
+        if page is None:
+            raise ValueError(f"Conversation with ID {conversation_id} not found")
+        
+        return page
+    
+    @classmethod
+    def export_conversations(cls) -> Iterator[ConversationHistory]:
+        """
+        Iterate over every stored conversation, one at a time.
+        
+        Exporting does not count as using a conversation, so it does not
+        keep conversations from expiring.
+        
+        Yields:
+            Each conversation with all of its messages
+        """
+        for conversation_id, messages in cls.get_store().iter_conversations():
+            yield ConversationHistory(
+                id=conversation_id,
+                messages=[Message(role=message.role, content=message.content) for message in messages]
+            )
+    
+    @classmethod
+    def _message_records(cls, conversation_id: str) -> Sequence[Union[Message, MessageRecord]]:
+        """
+        Get the messages of a conversation as lightweight records for read-only use.
+        
+        Raises:
+            ValueError: If the conversation ID is not found
+        """
+        messages = cls.get_store().messages(conversation_id)
+        if messages is None:
+            raise ValueError(f"Conversation with ID {conversation_id} not found")
+        
+        return messages
+    
     @classmethod
     def format_history_for_gemini(cls, conversation_id: str) -> List[Dict]:
         """
@@ -90,10 +265,31 @@ class ConversationService:
         Raises:
             ValueError: If the conversation ID is not found
         """
-        messages = cls.get_messages(conversation_id)
+        messages = cls._message_records(conversation_id)
         
         # Format messages for Gemini
         return [
             {"role": message.role, "parts": [message.content]}
             for message in messages
-        ] 
\ No newline at end of file
+        ]
+    
+    @classmethod
+    def build_context(cls, conversation_id: str) -> ContextWindow:
+        """
+        Build the history to send to Gemini for the next turn of a conversation.
+        
+        Recent turns are kept verbatim and older turns are folded into a
+        cached summary, so the prompt stays within CONTEXT_TOKEN_BUDGET.
+        
+        Args:
+            conversation_id: The ID of the conversation
+            
+        Returns:
+            The ContextWindow with the history in Gemini's format and the
+            number of tokens saved compared with sending every message
+            
+        Raises:
+            ValueError: If the conversation ID is not found
+        """
+        messages = cls._message_records(conversation_id)
+        return cls._context_builder.build(conversation_id, messages)
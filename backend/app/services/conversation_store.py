@@ -0,0 +1,913 @@
+"""
+Storage backends for conversation histories.
+"""
+
+import atexit
+import itertools
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from array import array
+from collections import OrderedDict
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+from app.config.settings import (
+    CONVERSATION_STORE,
+    CONVERSATION_MAX_COUNT,
+    CONVERSATION_MAX_BYTES,
+    CONVERSATION_IDLE_TTL,
+    CONVERSATION_COMPRESS_AFTER,
+    CONVERSATION_DB_PATH,
+    CONVERSATION_DB_FLUSH_INTERVAL,
+    CONVERSATION_DB_BATCH_SIZE,
+    CONVERSATION_DB_BUSY_TIMEOUT
+)
+from app.models.schemas import ConversationHistory, Message
+
+logger = logging.getLogger(__name__)
+
+# Rough per-object overheads used to estimate the memory held by a conversation;
+# a stored message is a small tuple of its role and content strings
+CONVERSATION_OVERHEAD_BYTES = 256
+MESSAGE_OVERHEAD_BYTES = 64
+
+# zlib level for idle conversations; higher levels cost more time than they
+# save space on short text
+COMPRESSION_LEVEL = 6
+
+class MessageRecord(NamedTuple):
+    """Lightweight read-only view of a stored message, for hot read paths."""
+    role: str
+    content: str
+
+class MessagePage(NamedTuple):
+    """A slice of a conversation's messages and the conversation's total message count."""
+    messages: Sequence[Union[Message, MessageRecord]]
+    total: int
+
+def estimate_message_bytes(message: Union[Message, MessageRecord]) -> int:
+    """
+    Estimate the memory held by a single message.
+
+    Args:
+        message: The message to measure
+
+    Returns:
+        The approximate size in bytes
+    """
+    return MESSAGE_OVERHEAD_BYTES + len(message.role) + len(message.content)
+
+class ConversationStore:
+    """Interface for conversation storage backends."""
+
+    # Called with the ID of each conversation the store drops
+    _removal_listeners: Tuple[Callable[[str], None], ...] = ()
+
+    def add_removal_listener(self, listener: Callable[[str], None]) -> None:
+        """
+        Have a function called whenever a conversation is evicted, expires or is deleted.
+
+        The listener may be called with the store's lock held, from whichever
+        thread caused the removal, so it must be quick and must not use the store.
+
+        Args:
+            listener: Called with the ID of the removed conversation
+        """
+        self._removal_listeners += (listener,)
+
+    def _removed(self, conversation_id: str) -> None:
+        for listener in self._removal_listeners:
+            listener(conversation_id)
+
+    def create(self) -> ConversationHistory:
+        """
+        Create and store a new, empty conversation.
+
+        Returns:
+            The new ConversationHistory
+        """
+        raise NotImplementedError
+
+    def get(self, conversation_id: str) -> Optional[ConversationHistory]:
+        """
+        Get a conversation by ID.
+
+        Args:
+            conversation_id: The ID of the conversation to get
+
+        Returns:
+            The conversation if found, None otherwise
+        """
+        raise NotImplementedError
+
+    def messages(self, conversation_id: str) -> Optional[Sequence[Union[Message, MessageRecord]]]:
+        """
+        Get the messages of a conversation without building a ConversationHistory.
+
+        Stores that keep messages in a compact form override this to skip
+        creating a Pydantic model per message; the default uses get().
+
+        Args:
+            conversation_id: The ID of the conversation
+
+        Returns:
+            The messages (each with `role` and `content`), or None if not found
+        """
+        conversation = self.get(conversation_id)
+        return conversation.messages if conversation else None
+
+    def page(self, conversation_id: str, start: int, limit: int) -> Optional[MessagePage]:
+        """
+        Get a slice of the messages of a conversation.
+
+        Args:
+            conversation_id: The ID of the conversation
+            start: Index of the first message to return
+            limit: Maximum number of messages to return
+
+        Returns:
+            The MessagePage, or None if not found
+        """
+        messages = self.messages(conversation_id)
+        if messages is None:
+            return None
+        return MessagePage(messages[start:start + limit], len(messages))
+
+    def iter_conversations(self) -> Iterator[Tuple[str, Sequence[Union[Message, MessageRecord]]]]:
+        """
+        Iterate over all stored conversations, for bulk export.
+
+        Conversations are read one at a time, so memory use does not grow
+        with the size of the store. Reading a conversation this way does not
+        count as an access: it does not keep it from expiring.
+
+        Yields:
+            Tuples containing (conversation ID, messages)
+        """
+        raise NotImplementedError
+
+    def exists(self, conversation_id: str) -> bool:
+        """
+        Check whether a conversation is stored.
+
+        Args:
+            conversation_id: The ID of the conversation
+
+        Returns:
+            True if the conversation exists
+        """
+        return self.get(conversation_id) is not None
+
+    def append(self, conversation_id: str, message: Message) -> None:
+        """
+        Append a message to a conversation.
+
+        Args:
+            conversation_id: The ID of the conversation
+            message: The message to append
+
+        Raises:
+            ValueError: If the conversation ID is not found
+        """
+        raise NotImplementedError
+
+    def remove_message(self, conversation_id: str, message: Message) -> bool:
+        """
+        Remove the most recent message equal to the given one, e.g. to roll
+        back a question whose answer was abandoned.
+
+        Args:
+            conversation_id: The ID of the conversation
+            message: The message to remove (matched by role and content)
+
+        Returns:
+            True if a message was removed
+        """
+        raise NotImplementedError
+
+    def delete(self, conversation_id: str) -> bool:
+        """
+        Delete a conversation.
+
+        Args:
+            conversation_id: The ID of the conversation to delete
+
+        Returns:
+            True if the conversation existed, False otherwise
+        """
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get occupancy and eviction counters for the store.
+
+        Returns:
+            A dictionary of counter names to values
+        """
+        raise NotImplementedError
+
+    def occupancy(self) -> float:
+        """
+        Get how full the store is, cheaply enough to check on every readiness probe.
+
+        Returns:
+            The fraction of the store's capacity in use (0 for an unbounded store)
+        """
+        return 0.0
+
+# Role names by code; codes are assigned as new roles are seen
+_ROLES: List[str] = ["user", "model"]
+_ROLE_CODES: Dict[str, int] = {"user": 0, "model": 1}
+
+def _role_code(role: str) -> int:
+    code = _ROLE_CODES.get(role)
+    if code is None:
+        if len(_ROLES) > 255:
+            raise ValueError(f"Too many distinct message roles to store: {role}")
+        code = len(_ROLES)
+        _ROLES.append(role)
+        _ROLE_CODES[role] = code
+    return code
+
+class _Entry:
+    """
+    A stored conversation in compact form, with its size and last access time.
+
+    While the conversation is in use, its messages are MessageRecord tuples
+    (role names are shared strings), so reads only copy a list. Once idle,
+    the roles are packed one code byte per message and the contents are
+    compressed into a single zlib buffer holding the UTF-8 lengths followed
+    by the concatenated UTF-8 contents; `records` is None until the next access.
+    """
+
+    __slots__ = ("conversation_id", "records", "roles", "packed", "size", "last_access")
+
+    def __init__(self, conversation_id: str, last_access: float):
+        self.conversation_id = conversation_id
+        self.records: Optional[List[MessageRecord]] = []
+        self.roles: Optional[bytearray] = None
+        self.packed: Optional[bytes] = None
+        self.size = CONVERSATION_OVERHEAD_BYTES
+        self.last_access = last_access
+
+    def compress(self) -> int:
+        """Compress the messages; returns the change in estimated size."""
+        self.roles = bytearray(_role_code(record.role) for record in self.records)
+        encoded = [record.content.encode("utf-8") for record in self.records]
+        lengths = array("I", (len(data) for data in encoded))
+        self.packed = zlib.compress(lengths.tobytes() + b"".join(encoded), COMPRESSION_LEVEL)
+        self.records = None
+        old_size = self.size
+        self.size = CONVERSATION_OVERHEAD_BYTES + len(self.roles) + len(self.packed)
+        return self.size - old_size
+
+    def decompress(self) -> int:
+        """Restore the messages of a compressed entry; returns the change in estimated size."""
+        records = self.snapshot()
+        self.records = records
+        self.roles = None
+        self.packed = None
+        old_size = self.size
+        self.size = CONVERSATION_OVERHEAD_BYTES + sum(map(estimate_message_bytes, records))
+        return self.size - old_size
+
+    def snapshot(self) -> List[MessageRecord]:
+        """Copy the messages without changing the entry, decompressing if needed."""
+        if self.records is not None:
+            return list(self.records)
+        data = zlib.decompress(self.packed)
+        lengths = array("I")
+        offset = lengths.itemsize * len(self.roles)
+        lengths.frombytes(data[:offset])
+        records = []
+        for code, length in zip(self.roles, lengths):
+            records.append(MessageRecord(_ROLES[code], data[offset:offset + length].decode("utf-8")))
+            offset += length
+        return records
+
+    def to_conversation(self) -> ConversationHistory:
+        return ConversationHistory(
+            id=self.conversation_id,
+            messages=[Message(role=record.role, content=record.content) for record in self.records]
+        )
+
+class InMemoryConversationStore(ConversationStore):
+    """
+    Bounded in-memory conversation store.
+
+    Conversations are kept in least-recently-used order, so evicting for the
+    count or byte limit and expiring idle conversations both only ever remove
+    entries from the front, in O(1) per entry.
+
+    Messages are stored compactly (see _Entry) rather than as Pydantic
+    models, which are only built when get() is called. Conversations idle
+    for `compress_after` seconds are compressed and transparently
+    decompressed on their next access. Uncompressed conversations are also
+    tracked in their own LRU order, so finding the ones to compress costs
+    O(1) per compressed conversation.
+    """
+
+    def __init__(
+        self,
+        max_conversations: int,
+        max_bytes: int,
+        idle_ttl: float,
+        compress_after: float = 0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            max_conversations: Maximum number of conversations kept (0 for no limit)
+            max_bytes: Maximum estimated total size of all conversations (0 for no limit)
+            idle_ttl: Seconds after the last access before a conversation expires (0 for no expiry)
+            compress_after: Seconds after the last access before a conversation is compressed (0 for never)
+            clock: Monotonic time source, replaceable in tests
+        """
+        self.max_conversations = max_conversations
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.compress_after = compress_after
+        self._clock = clock
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._uncompressed: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._evicted_count = 0
+        self._evicted_bytes = 0
+        self._expired = 0
+        self._compressions = 0
+        self._decompressions = 0
+
+    def create(self) -> ConversationHistory:
+        conversation = ConversationHistory()
+        with self._lock:
+            now = self._clock()
+            self._expire(now)
+            entry = _Entry(conversation.id, now)
+            self._entries[conversation.id] = entry
+            self._uncompressed[conversation.id] = entry
+            self._bytes += entry.size
+            self._evict()
+        return conversation
+
+    def get(self, conversation_id: str) -> Optional[ConversationHistory]:
+        with self._lock:
+            entry = self._touch(conversation_id)
+            return entry.to_conversation() if entry else None
+
+    def messages(self, conversation_id: str) -> Optional[List[MessageRecord]]:
+        with self._lock:
+            entry = self._touch(conversation_id)
+            return list(entry.records) if entry else None
+
+    def page(self, conversation_id: str, start: int, limit: int) -> Optional[MessagePage]:
+        with self._lock:
+            entry = self._touch(conversation_id)
+            if not entry:
+                return None
+            return MessagePage(entry.records[start:start + limit], len(entry.records))
+
+    def iter_conversations(self) -> Iterator[Tuple[str, List[MessageRecord]]]:
+        with self._lock:
+            conversation_ids = list(self._entries)
+        for conversation_id in conversation_ids:
+            # The lock is only held per conversation, so requests keep being served
+            with self._lock:
+                entry = self._entries.get(conversation_id)
+                records = entry.snapshot() if entry else None
+            if records is not None:
+                yield conversation_id, records
+
+    def exists(self, conversation_id: str) -> bool:
+        with self._lock:
+            return self._touch(conversation_id) is not None
+
+    def append(self, conversation_id: str, message: Message) -> None:
+        with self._lock:
+            entry = self._touch(conversation_id)
+            if not entry:
+                raise ValueError(f"Conversation with ID {conversation_id} not found")
+
+            size = estimate_message_bytes(message)
+            entry.records.append(MessageRecord(_ROLES[_role_code(message.role)], message.content))
+            entry.size += size
+            self._bytes += size
+            self._evict()
+
+    def remove_message(self, conversation_id: str, message: Message) -> bool:
+        with self._lock:
+            entry = self._touch(conversation_id)
+            if not entry:
+                return False
+            for index in range(len(entry.records) - 1, -1, -1):
+                record = entry.records[index]
+                if record.role == message.role and record.content == message.content:
+                    del entry.records[index]
+                    size = estimate_message_bytes(record)
+                    entry.size -= size
+                    self._bytes -= size
+                    return True
+            return False
+
+    def delete(self, conversation_id: str) -> bool:
+        with self._lock:
+            entry = self._entries.pop(conversation_id, None)
+            if not entry:
+                return False
+            self._uncompressed.pop(conversation_id, None)
+            self._bytes -= entry.size
+            self._removed(conversation_id)
+            return True
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            now = self._clock()
+            self._expire(now)
+            self._compress_idle(now)
+            return {
+                "conversations": len(self._entries),
+                "compressed": len(self._entries) - len(self._uncompressed),
+                "bytes": self._bytes,
+                "evicted_count_limit": self._evicted_count,
+                "evicted_bytes_limit": self._evicted_bytes,
+                "expired_idle": self._expired,
+                "compressions": self._compressions,
+                "decompressions": self._decompressions,
+            }
+
+    def occupancy(self) -> float:
+        with self._lock:
+            return max(
+                len(self._entries) / self.max_conversations if self.max_conversations else 0.0,
+                self._bytes / self.max_bytes if self.max_bytes else 0.0
+            )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _touch(self, conversation_id: str) -> Optional[_Entry]:
+        """Look up a live entry, decompress it if needed and mark it as most recently used."""
+        now = self._clock()
+        self._expire(now)
+        self._compress_idle(now)
+        entry = self._entries.get(conversation_id)
+        if entry:
+            entry.last_access = now
+            self._entries.move_to_end(conversation_id)
+            if entry.packed is not None:
+                self._bytes += entry.decompress()
+                self._decompressions += 1
+            self._uncompressed[conversation_id] = entry
+            self._uncompressed.move_to_end(conversation_id)
+        return entry
+
+    def _compress_idle(self, now: float) -> None:
+        """Compress conversations idle for longer than compress_after, oldest first."""
+        if not self.compress_after:
+            return
+        while self._uncompressed:
+            entry = next(iter(self._uncompressed.values()))
+            if now - entry.last_access < self.compress_after:
+                break
+            self._uncompressed.popitem(last=False)
+            self._bytes += entry.compress()
+            self._compressions += 1
+
+    def _expire(self, now: float) -> None:
+        """Drop conversations idle for longer than the TTL, oldest first."""
+        if not self.idle_ttl:
+            return
+        while self._entries:
+            entry = next(iter(self._entries.values()))
+            if now - entry.last_access < self.idle_ttl:
+                break
+            self._pop_oldest()
+            self._expired += 1
+
+    def _evict(self) -> None:
+        """Evict least recently used conversations until within limits."""
+        # The most recently used conversation is never evicted, even if it
+        # alone exceeds the byte limit
+        while self.max_conversations and len(self._entries) > self.max_conversations:
+            self._pop_oldest()
+            self._evicted_count += 1
+        while self.max_bytes and self._bytes > self.max_bytes and len(self._entries) > 1:
+            self._pop_oldest()
+            self._evicted_bytes += 1
+
+    def _pop_oldest(self) -> None:
+        conversation_id, entry = self._entries.popitem(last=False)
+        self._uncompressed.pop(conversation_id, None)
+        self._bytes -= entry.size
+        self._removed(conversation_id)
+
+class SQLiteConversationStore(ConversationStore):
+    """
+    Durable conversation store shared by all worker processes on one host.
+
+    Conversations and messages live in a SQLite database in WAL mode, with
+    an append-only messages table indexed by conversation. Every write
+    (new conversations and messages, rolled back messages, deletions) is
+    queued in memory and applied in order, in batches, by a background
+    thread, so requests never wait on a disk write or on another worker
+    holding the database. Reads use a connection of their own, which in WAL
+    mode never waits for writers, and also see the rows still queued in
+    this process; other processes see them once the batch is written, at
+    most flush_interval seconds later.
+
+    Conversations without a new message for `idle_ttl` seconds are deleted
+    by the writer thread, as the in-memory store expires idle ones.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS conversations (
+            id TEXT PRIMARY KEY,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS messages (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            conversation_id TEXT NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            created_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_messages_conversation
+            ON messages (conversation_id, seq);
+    """
+
+    # Statements applying each kind of queued write, with the parameters taken from it
+    WRITES = {
+        "conversation": (
+            ("INSERT OR IGNORE INTO conversations (id, created_at, updated_at) VALUES (?, ?, ?)",
+             lambda op: (op[1], op[2], op[2])),
+        ),
+        "message": (
+            ("INSERT INTO messages (conversation_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+             lambda op: op[1:]),
+            ("UPDATE conversations SET updated_at = ? WHERE id = ?",
+             lambda op: (op[4], op[1])),
+        ),
+        "remove": (
+            ("DELETE FROM messages WHERE seq = (SELECT MAX(seq) FROM messages "
+             "WHERE conversation_id = ? AND role = ? AND content = ? AND created_at = ?)",
+             lambda op: op[1:]),
+        ),
+        "delete": (
+            ("DELETE FROM messages WHERE conversation_id = ?", lambda op: (op[1],)),
+            ("DELETE FROM conversations WHERE id = ?", lambda op: (op[1],)),
+        ),
+    }
+
+    def __init__(
+        self,
+        path: str,
+        flush_interval: float = 0.05,
+        batch_size: int = 256,
+        idle_ttl: float = 0,
+        busy_timeout: float = 0.25
+    ):
+        """
+        Args:
+            path: Path of the SQLite database file
+            flush_interval: Maximum seconds a queued write waits before being flushed
+            batch_size: Number of queued writes that triggers an immediate flush
+            idle_ttl: Seconds without a new message before a conversation is deleted (0 for no expiry)
+            busy_timeout: Seconds a write waits for another process to release the
+                database before the batch is retried later
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.idle_ttl = idle_ttl
+
+        # Used only by whoever holds _write_lock: the writer thread, flush() and close()
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=busy_timeout)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(self.SCHEMA)
+        self._migrate()
+        self._write_lock = threading.Lock()
+        # Reads never wait for writers in WAL mode
+        self._reader = sqlite3.connect(path, check_same_thread=False, timeout=busy_timeout)
+        self._read_lock = threading.Lock()
+
+        # Guards the queues only, never held during database access
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        # Queued writes, in order: ("conversation", id, created_at),
+        # ("message", conversation_id, role, content, created_at),
+        # ("remove", conversation_id, role, content, created_at) or ("delete", id)
+        self._pending: List[Tuple] = []
+        # The batch being written, still visible to readers until it is committed
+        self._writing: List[Tuple] = []
+        self._writer: Optional[threading.Thread] = None
+        self._closed = False
+        self._flushes = 0
+        self._rows_written = 0
+        self._write_errors = 0
+        self._expired = 0
+        atexit.register(self.close)
+
+    def create(self) -> ConversationHistory:
+        conversation = ConversationHistory()
+        self._enqueue(("conversation", conversation.id, time.time()))
+        return conversation
+
+    def get(self, conversation_id: str) -> Optional[ConversationHistory]:
+        rows = self._rows(conversation_id)
+        if rows is None:
+            return None
+        return ConversationHistory(
+            id=conversation_id,
+            messages=[Message(role=role, content=content) for role, content, _ in rows]
+        )
+
+    def exists(self, conversation_id: str) -> bool:
+        return self._exists(conversation_id, self._queued(conversation_id))
+
+    def page(self, conversation_id: str, start: int, limit: int) -> Optional[MessagePage]:
+        queued = self._queued(conversation_id)
+        if any(op[0] != "conversation" for op in queued):
+            # Rare: merge the queued writes into the whole conversation
+            rows = self._rows(conversation_id, queued)
+            if rows is None:
+                return None
+            return MessagePage([MessageRecord(role, content) for role, content, _ in rows[start:start + limit]], len(rows))
+        if not self._exists(conversation_id, queued):
+            return None
+        with self._read_lock:
+            total = self._reader.execute(
+                "SELECT COUNT(*) FROM messages WHERE conversation_id = ?", (conversation_id,)
+            ).fetchone()[0]
+            rows = self._reader.execute(
+                "SELECT role, content FROM messages WHERE conversation_id = ? ORDER BY seq LIMIT ? OFFSET ?",
+                (conversation_id, limit, start)
+            ).fetchall()
+        return MessagePage([MessageRecord(role, content) for role, content in rows], total)
+
+    def iter_conversations(self, batch_size: int = 100) -> Iterator[Tuple[str, List[MessageRecord]]]:
+        self.flush()
+        last_id = ""
+        while True:
+            with self._read_lock:
+                conversation_ids = [row[0] for row in self._reader.execute(
+                    "SELECT id FROM conversations WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch_size)
+                )]
+            if not conversation_ids:
+                return
+            for conversation_id in conversation_ids:
+                with self._read_lock:
+                    rows = self._reader.execute(
+                        "SELECT role, content FROM messages WHERE conversation_id = ? ORDER BY seq",
+                        (conversation_id,)
+                    ).fetchall()
+                yield conversation_id, [MessageRecord(role, content) for role, content in rows]
+            last_id = conversation_ids[-1]
+
+    def append(self, conversation_id: str, message: Message) -> None:
+        if not self.exists(conversation_id):
+            raise ValueError(f"Conversation with ID {conversation_id} not found")
+        self._enqueue(("message", conversation_id, message.role, message.content, time.time()))
+
+    def remove_message(self, conversation_id: str, message: Message) -> bool:
+        with self._lock:
+            for index in range(len(self._pending) - 1, -1, -1):
+                op = self._pending[index]
+                if op[0] == "message" and op[1:4] == (conversation_id, message.role, message.content):
+                    del self._pending[index]
+                    return True
+        # Already written, or being written: find the row, then queue its removal
+        rows = self._rows(conversation_id)
+        target = next(
+            (row for row in reversed(rows or []) if row[:2] == (message.role, message.content)),
+            None
+        )
+        if target is None:
+            return False
+        self._enqueue(("remove", conversation_id, message.role, message.content, target[2]))
+        return True
+
+    def delete(self, conversation_id: str) -> bool:
+        if not self.exists(conversation_id):
+            return False
+        self._enqueue(("delete", conversation_id))
+        self._removed(conversation_id)
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        with self._read_lock:
+            stored = self._reader.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+        with self._lock:
+            queued = self._writing + self._pending
+            return {
+                "conversations": stored + sum(1 for op in queued if op[0] == "conversation"),
+                "pending_writes": len(queued),
+                "flushes": self._flushes,
+                "rows_written": self._rows_written,
+                "write_errors": self._write_errors,
+                "expired_idle": self._expired,
+            }
+
+    def flush(self) -> None:
+        """
+        Write all queued rows to the database now.
+
+        Raises:
+            sqlite3.Error: If the write fails; the rows stay queued, in order
+        """
+        self._write_pending()
+
+    def close(self) -> None:
+        """Flush queued rows and stop the background writer."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._wakeup.notify_all()
+        if self._writer:
+            self._writer.join()
+        self._write_pending()
+        with self._write_lock:
+            self._connection.close()
+        with self._read_lock:
+            self._reader.close()
+
+    def _migrate(self) -> None:
+        """Bring a database created by an earlier version up to the current schema."""
+        columns = [row[1] for row in self._connection.execute("PRAGMA table_info(conversations)")]
+        if "updated_at" not in columns:
+            with self._connection:
+                self._connection.execute("ALTER TABLE conversations ADD COLUMN updated_at REAL NOT NULL DEFAULT 0")
+                self._connection.execute("UPDATE conversations SET updated_at = created_at")
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS idx_conversations_updated ON conversations (updated_at)"
+        )
+
+    def _queued(self, conversation_id: str) -> List[Tuple]:
+        """Snapshot the queued writes of a conversation, being written or not, in order."""
+        with self._lock:
+            return [op for op in self._writing + self._pending if op[1] == conversation_id]
+
+    def _exists(self, conversation_id: str, queued: List[Tuple]) -> bool:
+        """Check for a conversation, given the snapshot of its queued writes taken first."""
+        for op in reversed(queued):
+            if op[0] == "delete":
+                return False
+            if op[0] == "conversation":
+                return True
+        with self._read_lock:
+            row = self._reader.execute(
+                "SELECT 1 FROM conversations WHERE id = ?", (conversation_id,)
+            ).fetchone()
+        return row is not None
+
+    def _rows(self, conversation_id: str, queued: Optional[List[Tuple]] = None) -> Optional[List[Tuple[str, str, float]]]:
+        """
+        Read a conversation's messages as (role, content, created_at), queued writes applied.
+
+        The queued writes are snapshotted before the database is read, so a
+        batch committed in between is seen in the database as well: rows
+        are told apart by their timestamps and only applied once.
+
+        Returns:
+            The messages in order, or None if the conversation does not exist
+        """
+        if queued is None:
+            queued = self._queued(conversation_id)
+        if not self._exists(conversation_id, queued):
+            return None
+        with self._read_lock:
+            rows = self._reader.execute(
+                "SELECT role, content, created_at FROM messages WHERE conversation_id = ? ORDER BY seq",
+                (conversation_id,)
+            ).fetchall()
+        written = set(rows)
+        for op in queued:
+            if op[0] == "message" and op[2:] not in written:
+                rows.append(op[2:])
+            elif op[0] == "remove" and op[2:] in rows:
+                rows.remove(op[2:])
+        return rows
+
+    def _enqueue(self, op: Tuple) -> None:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Conversation store is closed")
+            self._pending.append(op)
+            if self._writer is None or not self._writer.is_alive():
+                # Started lazily so that forked worker processes get their own
+                # thread, and again should the thread ever have died
+                self._writer = threading.Thread(
+                    target=self._run_writer,
+                    name="conversation-store-writer",
+                    daemon=True
+                )
+                self._writer.start()
+            if len(self._pending) >= self.batch_size:
+                self._wakeup.notify()
+
+    def _run_writer(self) -> None:
+        expiry_interval = max(1.0, min(60.0, self.idle_ttl / 10))
+        next_expiry = time.monotonic() + expiry_interval
+        while True:
+            with self._lock:
+                if self._closed:
+                    return
+                self._wakeup.wait(self.flush_interval)
+                if self._closed:
+                    # close() writes what is left
+                    return
+            try:
+                self._write_pending()
+                if self.idle_ttl and time.monotonic() >= next_expiry:
+                    next_expiry = time.monotonic() + expiry_interval
+                    self._expire_idle()
+            except sqlite3.Error as e:
+                # E.g. "database is locked" by other workers for longer than
+                # the busy timeout; the batch was requeued, so try again
+                self._write_errors += 1
+                logger.warning("Writing %d queued conversation rows failed: %s", len(self._pending), e)
+
+    def _write_pending(self) -> None:
+        """
+        Write queued rows in a single transaction, in the order they were queued.
+
+        Raises:
+            sqlite3.Error: If the write fails; the rows stay queued, in order
+        """
+        with self._write_lock:
+            with self._lock:
+                if not self._pending:
+                    return
+                batch, self._pending = self._pending, []
+                self._writing = batch
+            try:
+                with self._connection:
+                    for kind, ops in itertools.groupby(batch, key=lambda op: op[0]):
+                        ops = list(ops)
+                        for statement, parameters in self.WRITES[kind]:
+                            self._connection.executemany(statement, [parameters(op) for op in ops])
+            except sqlite3.Error:
+                with self._lock:
+                    self._pending = batch + self._pending
+                    self._writing = []
+                raise
+            with self._lock:
+                self._writing = []
+                self._flushes += 1
+                self._rows_written += len(batch)
+
+    def _expire_idle(self) -> None:
+        """Delete conversations without a new message for idle_ttl seconds, except those with queued writes."""
+        cutoff = time.time() - self.idle_ttl
+        with self._lock:
+            busy = sorted({op[1] for op in self._pending})
+        exclude = f" AND id NOT IN ({', '.join('?' * len(busy))})" if busy else ""
+        with self._write_lock:
+            expired = [row[0] for row in self._connection.execute(
+                "SELECT id FROM conversations WHERE updated_at < ?" + exclude, [cutoff, *busy]
+            )]
+            if not expired:
+                return
+            with self._connection:
+                self._connection.executemany(
+                    "DELETE FROM messages WHERE conversation_id = ?", [(conversation_id,) for conversation_id in expired]
+                )
+                self._connection.executemany(
+                    "DELETE FROM conversations WHERE id = ?", [(conversation_id,) for conversation_id in expired]
+                )
+        self._expired += len(expired)
+        for conversation_id in expired:
+            self._removed(conversation_id)
+
+def create_store(name: str = CONVERSATION_STORE) -> ConversationStore:
+    """
+    Create a conversation store by name, configured from settings.
+
+    Args:
+        name: The store name ('memory' or 'sqlite')
+
+    Returns:
+        A new ConversationStore instance
+
+    Raises:
+        ValueError: If the store name is unknown
+    """
+    if name == "memory":
+        return InMemoryConversationStore(
+            max_conversations=CONVERSATION_MAX_COUNT,
+            max_bytes=CONVERSATION_MAX_BYTES,
+            idle_ttl=CONVERSATION_IDLE_TTL,
+            compress_after=CONVERSATION_COMPRESS_AFTER
+        )
+    if name == "sqlite":
+        return SQLiteConversationStore(
+            path=CONVERSATION_DB_PATH,
+            flush_interval=CONVERSATION_DB_FLUSH_INTERVAL,
+            batch_size=CONVERSATION_DB_BATCH_SIZE,
+            idle_ttl=CONVERSATION_IDLE_TTL,
+            busy_timeout=CONVERSATION_DB_BUSY_TIMEOUT
+        )
+    raise ValueError(f"Unknown conversation store: {name}")
@@ -0,0 +1,62 @@
+"""
+Per-request deadlines for upstream model calls.
+"""
+
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import Awaitable, Optional, TypeVar
+from app.services.exceptions import DeadlineExceededError
+
+T = TypeVar("T")
+
+# Monotonic time by which the current request must be answered; each request
+# runs in its own task, so setting it never leaks into other requests
+request_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+def set_deadline(timeout: float) -> None:
+    """
+    Give the current request a deadline.
+
+    Args:
+        timeout: Seconds from now
+    """
+    request_deadline.set(time.monotonic() + timeout)
+
+def remaining() -> Optional[float]:
+    """
+    Get the time left until the current request's deadline.
+
+    Returns:
+        Seconds left (0 or less once passed), or None if the request has no deadline
+    """
+    deadline = request_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+def expired() -> bool:
+    """Check whether the current request's deadline has passed."""
+    left = remaining()
+    return left is not None and left <= 0
+
+async def within_deadline(awaitable: Awaitable[T]) -> T:
+    """
+    Await something, giving up when the current request's deadline passes.
+
+    Args:
+        awaitable: The coroutine or future to wait for
+
+    Returns:
+        Its result
+
+    Raises:
+        DeadlineExceededError: If the deadline passes first
+    """
+    left = remaining()
+    if left is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, max(left, 0))
+    except TimeoutError as e:
+        if expired():
+            raise DeadlineExceededError("Request deadline exceeded before the AI model answered") from e
+        raise
@@ -0,0 +1,23 @@
+"""
+Exceptions raised by the AI service and its model backends.
+"""
+
+class AIServiceError(Exception):
+    """Base exception for AI service errors."""
+    pass
+
+class ModelConnectionError(AIServiceError):
+    """Exception raised when there's an issue connecting to the AI model."""
+    pass
+
+class ModelResponseError(AIServiceError):
+    """Exception raised when there's an issue with the AI model's response."""
+    pass
+
+class RateLimitError(AIServiceError):
+    """Exception raised when the AI model rejects a request for exceeding its rate limit or quota."""
+    pass
+
+class DeadlineExceededError(AIServiceError):
+    """Exception raised when a request's deadline passes before the model answers."""
+    pass
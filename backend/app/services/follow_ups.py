@@ -0,0 +1,311 @@
+"""
+Suggested follow-up questions, and their answers prefetched in the background.
+"""
+
+import asyncio
+import contextvars
+import logging
+import re
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Set
+from app.config.settings import (
+    PREFETCH_MAX_PER_CONVERSATION,
+    PREFETCH_MAX_CONVERSATIONS,
+    PREFETCH_MAX_IN_FLIGHT,
+    PREFETCH_MAX_UTILIZATION
+)
+from app.services.admission import admission_controller
+from app.services.answer_cache import normalize_question
+from app.services.conversation_service import ConversationService
+from app.services.deadline import within_deadline
+
+logger = logging.getLogger(__name__)
+
+EXAMPLE_FOLLOW_UP = "Can you give an example?"
+SIMPLER_FOLLOW_UP = "Can you explain that more simply?"
+
+# Next step per subject, matched against the question (then the answer) in order
+_SUBJECT_FOLLOW_UPS = [
+    (re.compile(r"\b(?:program\w*|code|coding|algorithm\w*|python|java\w*|function|data structures?|recursion)\b"),
+     "Can you show this in code?"),
+    (re.compile(r"\b(?:math\w*|equations?|solve|algebra|calculus|derivatives?|integrals?|geometry|probability|theorem|statistics)\b"),
+     "Can you walk me through a practice problem?"),
+    (re.compile(r"\b(?:physics|chemistry|chemical|biology|cells?|atoms?|molecules?|energy|forces?|reactions?|genes?|evolution)\b"),
+     "How could this be shown in an experiment?"),
+    (re.compile(r"\b(?:history|historical|wars?|revolution|empire|century|treaty|dynasty)\b"),
+     "What were its long-term consequences?"),
+    (re.compile(r"\b(?:literature|novel|poem|poetry|author|metaphor|theme|shakespeare)\b"),
+     "Where does this appear in a well-known work?"),
+    (re.compile(r"\b(?:economics|economy|markets?|inflation|supply|demand|trade)\b"),
+     "How does this show up in a real economy?"),
+    (re.compile(r"\b(?:grammar|language|verbs?|nouns?|sentences?|tense|etymology)\b"),
+     "Can you give me some practice sentences?"),
+    (re.compile(r"\b(?:geography|climate|continents?|rivers?|countries|population)\b"),
+     "Where in the world is this most visible?"),
+]
+
+def suggest_follow_ups(question: str, answer: str, limit: int) -> List[str]:
+    """
+    Suggest the follow-up questions students most often ask after an answer.
+
+    Asking for an example comes first, then the next step for the subject
+    (if one is recognized in the question, or else in the answer), then a
+    simpler explanation.
+
+    Args:
+        question: The question that was answered
+        answer: The answer it got
+        limit: Maximum number of suggestions
+
+    Returns:
+        The suggestions, most likely first
+    """
+    subject_follow_up = None
+    for text in (question.lower(), answer.lower()):
+        subject_follow_up = next((follow_up for pattern, follow_up in _SUBJECT_FOLLOW_UPS if pattern.search(text)), None)
+        if subject_follow_up:
+            break
+    suggestions = [EXAMPLE_FOLLOW_UP, subject_follow_up, SIMPLER_FOLLOW_UP]
+    return [suggestion for suggestion in suggestions if suggestion][:limit]
+
+class PrefetchedAnswer(NamedTuple):
+    """A follow-up answered ahead of time, and what it was answered against."""
+    turns: int
+    model: str
+    answer: str
+
+class _Prefetches:
+    """The suggestions made after a conversation's latest answer and their prefetches."""
+
+    __slots__ = ("suggested", "pending", "answers")
+
+    def __init__(self, suggested: Set[str]):
+        self.suggested = suggested
+        self.pending: Dict[str, asyncio.Task] = {}
+        self.answers: Dict[str, PrefetchedAnswer] = {}
+
+class FollowUpPrefetcher:
+    """
+    Answers suggested follow-ups in the background so asking one is instant.
+
+    After an answer, the first `max_per_conversation` suggestions are
+    answered by low-priority background tasks, against the conversation's
+    history as it stands. When the student then asks one of them, the turn
+    uses the prefetched answer (waiting for it if it is still on its way)
+    and is recorded like any other.
+
+    Prefetching spends model calls that may never be used, so it is budgeted:
+    nothing is prefetched while admission control is at or above
+    `max_utilization` or draining, at most `max_in_flight` prefetches run at
+    once, each holding an admission control slot (only taken when no
+    request is waiting for one, and counted in its utilization), and
+    prefetched answers are kept for at most `max_conversations`
+    conversations, least recently answered first out. Whatever is asked
+    next in a conversation ends its round: the other prefetched answers
+    were made for a history that has now changed, and are dropped. They are
+    also dropped when the conversation store evicts the conversation.
+
+    A prefetched answer is only used if the conversation has the same
+    number of turns and the question is routed to the same model as when it
+    was prefetched.
+    """
+
+    def __init__(self, max_per_conversation: int, max_conversations: int, max_in_flight: int, max_utilization: float):
+        """
+        Args:
+            max_per_conversation: Suggestions answered ahead after each answer (0 disables prefetching)
+            max_conversations: Conversations holding prefetched answers at once
+            max_in_flight: Prefetches running at once
+            max_utilization: Admission control utilization from which prefetching is skipped
+        """
+        self.max_per_conversation = max_per_conversation
+        self.max_conversations = max_conversations
+        self.max_in_flight = max_in_flight
+        self.max_utilization = max_utilization
+        self._conversations: "OrderedDict[str, _Prefetches]" = OrderedDict()
+        self._in_flight = 0
+        self.rounds = 0
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.skipped_load = 0
+        self.skipped_budget = 0
+        self.selected = 0
+        self.hits = 0
+        self.joined = 0
+        self.stale = 0
+        self.wasted = 0
+        self.evicted = 0
+
+    def schedule(
+        self,
+        conversation_id: str,
+        suggestions: List[str],
+        compute: Callable[[str], Awaitable[PrefetchedAnswer]]
+    ) -> int:
+        """
+        Record the suggestions made after an answer and start prefetching them if the budget allows.
+
+        Must be called on the event loop.
+
+        Args:
+            conversation_id: The ID of the conversation
+            suggestions: The suggested follow-ups, most likely first
+            compute: Answers a follow-up against the conversation's current history
+
+        Returns:
+            The number of prefetches started
+        """
+        if not self.max_per_conversation or not suggestions:
+            return 0
+        previous = self._conversations.pop(conversation_id, None)
+        if previous is not None:
+            self._drop(previous)
+            self.wasted += len(previous.answers)
+        prefetches = _Prefetches({normalize_question(suggestion) for suggestion in suggestions})
+        self._conversations[conversation_id] = prefetches
+        self.rounds += 1
+        while len(self._conversations) > self.max_conversations:
+            oldest = self._conversations.popitem(last=False)[1]
+            self._drop(oldest)
+            self.wasted += len(oldest.answers)
+            self.evicted += 1
+
+        if admission_controller.draining or admission_controller.utilization() >= self.max_utilization:
+            self.skipped_load += 1
+            return 0
+        loop = asyncio.get_running_loop()
+        for suggestion in suggestions[:self.max_per_conversation]:
+            if self._in_flight >= self.max_in_flight:
+                self.skipped_budget += 1
+                break
+            admitted_at = admission_controller.try_acquire()
+            if admitted_at is None:
+                self.skipped_load += 1
+                break
+            key = normalize_question(suggestion)
+            # A new context, so the prefetch is not bound by the request's deadline
+            task = loop.create_task(self._prefetch(prefetches, key, suggestion, compute), context=contextvars.Context())
+            task.add_done_callback(lambda _, key=key, admitted_at=admitted_at: self._finished(prefetches, key, admitted_at))
+            prefetches.pending[key] = task
+            self._in_flight += 1
+            self.started += 1
+        return len(prefetches.pending)
+
+    async def take(self, conversation_id: str, question: str, turns: int, model: str) -> Optional[str]:
+        """
+        Get the prefetched answer to a question about to be answered, ending the conversation's round.
+
+        Args:
+            conversation_id: The ID of the conversation
+            question: The question being asked
+            turns: Turns the conversation has before this question
+            model: The model the question is routed to
+
+        Returns:
+            The prefetched answer, or None if there is none that is still valid
+
+        Raises:
+            DeadlineExceededError: If the request's deadline passes while waiting for the prefetch
+        """
+        prefetches = self._conversations.pop(conversation_id, None)
+        if prefetches is None:
+            return None
+        key = normalize_question(question)
+        if key in prefetches.suggested:
+            self.selected += 1
+        task = prefetches.pending.get(key)
+        self._drop(prefetches, keep=task)
+        if task is not None:
+            self.joined += 1
+            await within_deadline(asyncio.wait({task}))
+
+        prefetched = prefetches.answers.pop(key, None)
+        self.wasted += len(prefetches.answers)
+        if prefetched is None:
+            return None
+        if prefetched.turns != turns or prefetched.model != model:
+            self.stale += 1
+            return None
+        self.hits += 1
+        return prefetched.answer
+
+    def discard(self, conversation_id: str) -> None:
+        """
+        Drop a conversation's prefetched answers and cancel its prefetches.
+
+        Safe to call from any thread, e.g. as a conversation store removal listener.
+
+        Args:
+            conversation_id: The ID of the conversation
+        """
+        prefetches = self._conversations.pop(conversation_id, None)
+        if prefetches is not None:
+            self._drop(prefetches)
+            self.wasted += len(prefetches.answers)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get budget, usage and hit counters.
+
+        Returns:
+            A dictionary of counter names to values
+        """
+        return {
+            "conversations": len(self._conversations),
+            "in_flight": self._in_flight,
+            "rounds": self.rounds,
+            "started": self.started,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "skipped_load": self.skipped_load,
+            "skipped_budget": self.skipped_budget,
+            "selected": self.selected,
+            "hits": self.hits,
+            # Suggested follow-ups that were asked and answered from a prefetch
+            "hit_rate": self.hits / self.selected if self.selected else 0.0,
+            "joined": self.joined,
+            "stale": self.stale,
+            "wasted": self.wasted,
+            "evicted": self.evicted,
+        }
+
+    async def _prefetch(
+        self,
+        prefetches: _Prefetches,
+        key: str,
+        question: str,
+        compute: Callable[[str], Awaitable[PrefetchedAnswer]]
+    ) -> None:
+        try:
+            prefetches.answers[key] = await compute(question)
+            self.completed += 1
+        except Exception as e:
+            self.failed += 1
+            logger.info("Prefetching a follow-up failed: %s", e)
+
+    def _finished(self, prefetches: _Prefetches, key: str, admitted_at: float) -> None:
+        # Also runs for a task cancelled before it started, unlike a finally in _prefetch
+        admission_controller.release(admitted_at)
+        task = prefetches.pending.pop(key)
+        self._in_flight -= 1
+        if task.cancelled():
+            self.cancelled += 1
+
+    def _drop(self, prefetches: _Prefetches, keep: Optional[asyncio.Task] = None) -> None:
+        """Cancel a round's prefetches still running, except `keep`."""
+        for task in prefetches.pending.values():
+            if task is not keep:
+                # Thread-safe, as removal listeners may run off the event loop
+                task.get_loop().call_soon_threadsafe(task.cancel)
+
+# Shared prefetcher for this worker process
+follow_up_prefetcher = FollowUpPrefetcher(
+    max_per_conversation=PREFETCH_MAX_PER_CONVERSATION,
+    max_conversations=PREFETCH_MAX_CONVERSATIONS,
+    max_in_flight=PREFETCH_MAX_IN_FLIGHT,
+    max_utilization=PREFETCH_MAX_UTILIZATION
+)
+ConversationService.add_removal_listener(follow_up_prefetcher.discard)
@@ -0,0 +1,138 @@
+"""
+Idempotency keys: replay the response of a request the client already sent.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Tuple
+from app.config.settings import IDEMPOTENCY_MAX_KEYS, IDEMPOTENCY_TTL
+
+class IdempotencyKeyReused(Exception):
+    """Exception raised when a key is sent again with a different request."""
+
+def request_fingerprint(*parts: Any) -> str:
+    """
+    Fingerprint the parts of a request that determine its response.
+
+    Args:
+        *parts: JSON-serializable request fields, e.g. the question and conversation ID
+
+    Returns:
+        A hash identifying the request
+    """
+    return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()
+
+class IdempotencyStore:
+    """
+    Bounded LRU + TTL store of responses by client-chosen idempotency key.
+
+    The first request with a key runs its computation as a separate task;
+    requests repeating the key while it runs wait for the same result, and
+    later ones get the stored result, so a retried request is answered once
+    and its messages are added to the conversation once. Because the task
+    is not tied to the first request, a client that times out and retries
+    picks up the answer that was already being computed. Failures are
+    passed to every waiter and are not stored, so a failed request can be
+    retried with the same key.
+
+    Keys are per worker process: a retry routed to another worker is
+    computed again.
+    """
+
+    def __init__(self, max_keys: int, ttl: float, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            max_keys: Maximum number of stored responses
+            ttl: Seconds a stored response can be replayed
+            clock: Monotonic time source, replaceable in tests
+        """
+        self.max_keys = max_keys
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[str, Any, float]]" = OrderedDict()
+        self._in_flight: Dict[str, Tuple[str, asyncio.Task]] = {}
+        self.replayed = 0
+        self.attached = 0
+        self.computed = 0
+        self.reused_keys = 0
+        self.evictions = 0
+
+    async def run(self, key: str, fingerprint: str, compute: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Get the response for a key, computing it only if the key is new.
+
+        Args:
+            key: The client's idempotency key
+            fingerprint: Fingerprint of the request (see request_fingerprint)
+            compute: Coroutine function producing the response for a new key
+
+        Returns:
+            A tuple containing (response, whether it was replayed from an
+            earlier or concurrent request with the same key)
+
+        Raises:
+            IdempotencyKeyReused: If the key was used for a different request
+        """
+        item = self._entries.get(key)
+        if item is not None:
+            stored_fingerprint, response, stored_at = item
+            if self._clock() - stored_at < self.ttl:
+                self._check(fingerprint, stored_fingerprint)
+                self._entries.move_to_end(key)
+                self.replayed += 1
+                return response, True
+            del self._entries[key]
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self._check(fingerprint, in_flight[0])
+            self.attached += 1
+            # Shielded so a waiter going away does not cancel the computation
+            return await asyncio.shield(in_flight[1]), True
+
+        self.computed += 1
+        task = asyncio.get_running_loop().create_task(self._compute(key, fingerprint, compute))
+        # Retrieve the outcome even if every waiter went away, so a failure is not reported as unhandled
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._in_flight[key] = (fingerprint, task)
+        return await asyncio.shield(task), False
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get store occupancy and replay counters.
+
+        Returns:
+            A dictionary of counter names to values
+        """
+        return {
+            "keys": len(self._entries),
+            "in_flight": len(self._in_flight),
+            "computed": self.computed,
+            "replayed": self.replayed,
+            "attached": self.attached,
+            "reused_keys": self.reused_keys,
+            "evictions": self.evictions,
+        }
+
+    async def _compute(self, key: str, fingerprint: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            response = await compute()
+        finally:
+            del self._in_flight[key]
+        self._entries[key] = (fingerprint, response, self._clock())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_keys:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return response
+
+    def _check(self, fingerprint: str, stored_fingerprint: str) -> None:
+        if fingerprint != stored_fingerprint:
+            self.reused_keys += 1
+            raise IdempotencyKeyReused("Idempotency-Key was already used for a different request")
+
+# Shared store for this worker process
+idempotency_store = IdempotencyStore(max_keys=IDEMPOTENCY_MAX_KEYS, ttl=IDEMPOTENCY_TTL)
@@ -0,0 +1,282 @@
+"""
+Pool of model backends, one per API key, routed by remaining quota.
+"""
+
+import asyncio
+import time
+from typing import AsyncIterator, Callable, Dict, List, NamedTuple, Optional, Set
+from app.config.settings import AI_KEY_RPM, AI_KEY_COOLDOWN, AI_KEY_MAX_COOLDOWN
+from app.services.admission import TokenBucket
+from app.services.exceptions import RateLimitError
+from app.services.model_backend import GenerationOptions, ModelBackend, ModelReply
+
+class ApiKey(NamedTuple):
+    """An API key and its requests-per-minute quota (0 if unknown)."""
+    key: str
+    rpm: float
+
+def parse_api_keys(value: str, default_rpm: float = AI_KEY_RPM) -> List[ApiKey]:
+    """
+    Parse a comma-separated list of "key" or "key:rpm" entries.
+
+    Args:
+        value: The setting value, e.g. "AIza...:60,AIza...:15"
+        default_rpm: Quota of keys listed without one
+
+    Returns:
+        The keys in order
+
+    Raises:
+        ValueError: If a quota is not a number
+    """
+    keys = []
+    for entry in filter(None, (part.strip() for part in value.split(","))):
+        key, _, rpm = entry.partition(":")
+        try:
+            keys.append(ApiKey(key, float(rpm) if rpm else default_rpm))
+        except ValueError:
+            raise ValueError(f"Invalid quota for API key #{len(keys) + 1}: {rpm!r}")
+    return keys
+
+class KeySlot:
+    """One key of the pool: its backend, quota accounting, cooldown and usage."""
+
+    def __init__(self, name: str, backend: ModelBackend, rpm: float, now: float):
+        """
+        Args:
+            name: Label used in metrics and logs (never the key itself)
+            backend: The backend making calls with this key
+            rpm: The key's requests-per-minute quota (0 if unknown: no accounting)
+            now: The current time
+        """
+        self.name = name
+        self.backend = backend
+        # A full minute's quota can be used at once, as the upstream allows
+        self.bucket = TokenBucket(rpm / 60.0, rpm, now) if rpm else None
+        self.cooldown_until = 0.0
+        self.strikes = 0
+        self.in_flight = 0
+        self.calls = 0
+        self.rate_limited = 0
+        self.failures = 0
+
+    def headroom(self, now: float) -> float:
+        """Requests the key can still make now by our accounting (infinite without a quota)."""
+        if now < self.cooldown_until:
+            return 0.0
+        return self.bucket.available(now) if self.bucket else float("inf")
+
+class KeyPoolBackend(ModelBackend):
+    """
+    Spreads model calls over several API keys, each with its own quota.
+
+    Each key has its own backend (and so its own client), a token bucket
+    tracking its requests-per-minute quota and a cooldown. A call goes to
+    the key with the most headroom, ties going to the key with fewest calls
+    in flight. A key that reports a rate limit rests for `cooldown` seconds,
+    doubling on each consecutive rate limit up to `max_cooldown`, and the
+    call is retried at once on another key. When every key is out of quota
+    or resting, RateLimitError is raised without an upstream call.
+
+    Errors other than rate limits are passed on unchanged, for the
+    ResilientBackend wrapping the pool to retry or not.
+    """
+
+    def __init__(
+        self,
+        backends: Dict[str, ModelBackend],
+        rpm: Optional[Dict[str, float]] = None,
+        cooldown: float = 10.0,
+        max_cooldown: float = 120.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            backends: Backend per key name, in order
+            rpm: Requests-per-minute quota per key name (missing or 0: unknown)
+            cooldown: Seconds a key rests after its first rate limit
+            max_cooldown: Longest rest after repeated rate limits
+            clock: Monotonic time source, replaceable in tests
+        """
+        if not backends:
+            raise ValueError("A key pool needs at least one backend")
+        rpm = rpm or {}
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._clock = clock
+        now = clock()
+        self.slots = [KeySlot(name, backend, rpm.get(name, 0.0), now) for name, backend in backends.items()]
+        self.failovers = 0
+        self.exhausted = 0
+
+    @classmethod
+    def from_settings(cls, keys: List[ApiKey], factory: Callable[[str], ModelBackend]) -> "KeyPoolBackend":
+        """
+        Build a pool over API keys using the key pool settings.
+
+        Args:
+            keys: The keys and their quotas (see parse_api_keys)
+            factory: Creates the backend for one key
+
+        Returns:
+            A new KeyPoolBackend
+        """
+        names = [f"key{index}" for index in range(len(keys))]
+        return cls(
+            {name: factory(api_key.key) for name, api_key in zip(names, keys)},
+            rpm={name: api_key.rpm for name, api_key in zip(names, keys)},
+            cooldown=AI_KEY_COOLDOWN,
+            max_cooldown=AI_KEY_MAX_COOLDOWN
+        )
+
+    async def warm_up(self) -> None:
+        await asyncio.gather(*(slot.backend.warm_up() for slot in self.slots))
+
+    async def probe(self) -> None:
+        # The pool can answer as long as one of its keys can
+        results = await asyncio.gather(*(slot.backend.probe() for slot in self.slots), return_exceptions=True)
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if len(errors) == len(results):
+            raise errors[0]
+
+    def generate(self, history: List[Dict], message: str, options: Optional[GenerationOptions] = None) -> ModelReply:
+        tried: Set[KeySlot] = set()
+        while True:
+            slot = self._acquire(tried)
+            try:
+                reply = slot.backend.generate(history, message, options)
+            except RateLimitError:
+                self._rate_limited(slot, tried)
+                continue
+            except Exception:
+                slot.failures += 1
+                raise
+            finally:
+                slot.in_flight -= 1
+            slot.strikes = 0
+            return reply
+
+    async def generate_async(self, history: List[Dict], message: str, options: Optional[GenerationOptions] = None) -> ModelReply:
+        tried: Set[KeySlot] = set()
+        while True:
+            slot = self._acquire(tried)
+            try:
+                reply = await slot.backend.generate_async(history, message, options)
+            except RateLimitError:
+                self._rate_limited(slot, tried)
+                continue
+            except Exception:
+                slot.failures += 1
+                raise
+            finally:
+                slot.in_flight -= 1
+            slot.strikes = 0
+            return reply
+
+    async def stream_async(self, history: List[Dict], message: str, options: Optional[GenerationOptions] = None) -> AsyncIterator[str]:
+        # Another key can only take over until the first chunk has been passed on
+        tried: Set[KeySlot] = set()
+        while True:
+            slot = self._acquire(tried)
+            started = False
+            try:
+                async for chunk in slot.backend.stream_async(history, message, options):
+                    started = True
+                    yield chunk
+            except RateLimitError:
+                self._rate_limited(slot, tried)
+                if started:
+                    raise
+                continue
+            except Exception:
+                slot.failures += 1
+                raise
+            finally:
+                slot.in_flight -= 1
+            slot.strikes = 0
+            return
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get pool-wide counters.
+
+        Returns:
+            A dictionary of counter names to values
+        """
+        now = self._clock()
+        return {
+            "keys": len(self.slots),
+            "keys_available": sum(1 for slot in self.slots if now >= slot.cooldown_until),
+            "failovers": self.failovers,
+            "exhausted": self.exhausted,
+        }
+
+    def key_stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Get usage, quota and cooldown state per key.
+
+        Returns:
+            A dictionary of key names to their counters
+        """
+        now = self._clock()
+        stats = {}
+        for slot in self.slots:
+            headroom = slot.headroom(now)
+            stats[slot.name] = {
+                "calls": slot.calls,
+                "in_flight": slot.in_flight,
+                "rate_limited": slot.rate_limited,
+                "failures": slot.failures,
+                "cooling_down": now < slot.cooldown_until,
+                "cooldown_remaining": max(0.0, slot.cooldown_until - now),
+                # Unknown quotas have unlimited headroom, which is not exported
+                "headroom": headroom if headroom != float("inf") else None,
+            }
+        return stats
+
+    def _acquire(self, tried: Set[KeySlot]) -> KeySlot:
+        """
+        Pick the key with the most headroom and count a call against it.
+
+        Args:
+            tried: Keys that already rate limited this call
+
+        Returns:
+            The chosen key
+
+        Raises:
+            RateLimitError: If no untried key has headroom left
+        """
+        now = self._clock()
+        best = None
+        best_headroom = 0.0
+        for slot in self.slots:
+            if slot in tried:
+                continue
+            headroom = slot.headroom(now)
+            if headroom >= 1 and (
+                best is None
+                or headroom > best_headroom
+                or (headroom == best_headroom and slot.in_flight < best.in_flight)
+            ):
+                best, best_headroom = slot, headroom
+        if best is None:
+            self.exhausted += 1
+            raise RateLimitError(f"All {len(self.slots)} API keys are rate limited or out of quota")
+        if tried:
+            self.failovers += 1
+        if best.bucket:
+            best.bucket.take(now)
+        best.in_flight += 1
+        best.calls += 1
+        return best
+
+    def _rate_limited(self, slot: KeySlot, tried: Set[KeySlot]) -> None:
+        """Rest a key that reported a rate limit and keep the call off it."""
+        slot.rate_limited += 1
+        slot.strikes += 1
+        slot.cooldown_until = self._clock() + min(self.max_cooldown, self.cooldown * 2 ** (slot.strikes - 1))
+        if slot.bucket:
+            # The upstream disagrees with our accounting; start the key over from empty
+            slot.bucket.tokens = 0.0
+        tried.add(slot)
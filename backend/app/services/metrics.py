@@ -0,0 +1,360 @@
+"""
+In-process metrics in the Prometheus text exposition format, and per-request stage timing.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from store lookups up to slow upstream calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    """A named metric with a fixed set of label names."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"Metric {self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        """Render the metric as exposition lines, header included."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+class Counter(_Metric):
+    """A monotonically increasing count."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        """
+        Increase the count.
+
+        Args:
+            amount: The amount to add (must not be negative)
+            **labels: A value for every label name
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        """Get the current count for a label combination."""
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+class Gauge(_Metric):
+    """A value that can go up and down, optionally read from a function at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, function: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation)
+        self._value = 0.0
+        self._function = function
+
+    def set(self, value: float) -> None:
+        """Set the current value."""
+        self._value = value
+
+    def _samples(self) -> List[str]:
+        value = self._function() if self._function else self._value
+        return [f"{self.name} {_format_value(value)}"]
+
+class Histogram(_Metric):
+    """Observations counted into cumulative buckets, with their sum and count."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # label values -> [per-bucket counts..., sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        """
+        Record an observation.
+
+        Args:
+            value: The observed value, e.g. seconds
+            **labels: A value for every label name
+        """
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = [0] * len(self.buckets) + [0.0]
+                self._series[key] = series
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+                    break
+            series[-1] += value
+
+    def count(self, **labels: str) -> int:
+        """Get the number of observations for a label combination."""
+        series = self._series.get(self._key(labels))
+        return int(sum(series[:-1])) if series else 0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    """
+    The metrics of one worker process.
+
+    Besides metrics updated as events happen, the registry can expose the
+    `stats()` dictionaries of existing components: they are read at scrape
+    time and each numeric entry becomes a gauge, so components keep plain
+    counters and pay nothing per request for being observable. Components
+    with several instances (e.g. API keys) can expose one dictionary per
+    instance under a label.
+    """
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._stats: List[Tuple[str, str, Callable[[], Dict[str, float]]]] = []
+        self._labeled_stats: List[Tuple[str, str, str, Callable[[], Dict[str, Dict[str, float]]]]] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Create and register a Counter."""
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, function: Optional[Callable[[], float]] = None) -> Gauge:
+        """Create and register a Gauge."""
+        return self._register(Gauge(name, documentation, function))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        """Create and register a Histogram."""
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_stats(self, prefix: str, documentation: str, stats: Callable[[], Dict[str, float]]) -> None:
+        """
+        Expose a component's stats dictionary as gauges.
+
+        Args:
+            prefix: Metric name prefix; each key is appended as "<prefix>_<key>"
+            documentation: Help text shared by the gauges
+            stats: Function returning the current stats; non-numeric values are skipped
+        """
+        self._stats.append((prefix, documentation, stats))
+
+    def register_labeled_stats(
+        self,
+        prefix: str,
+        documentation: str,
+        label: str,
+        stats: Callable[[], Dict[str, Dict[str, float]]]
+    ) -> None:
+        """
+        Expose per-instance stats dictionaries as labelled gauges.
+
+        Args:
+            prefix: Metric name prefix; each key is appended as "<prefix>_<key>"
+            documentation: Help text shared by the gauges
+            label: Name of the label carrying the instance name
+            stats: Function returning the current stats by instance name;
+                non-numeric values are skipped
+        """
+        self._labeled_stats.append((prefix, documentation, label, stats))
+
+    def render(self) -> str:
+        """
+        Render all metrics in the Prometheus text exposition format.
+
+        Returns:
+            The exposition text
+        """
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for prefix, documentation, stats in self._stats:
+            for key, value in stats().items():
+                if isinstance(value, bool):
+                    value = int(value)
+                if not isinstance(value, (int, float)):
+                    continue
+                name = f"{prefix}_{key}"
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {_format_value(value)}")
+        for prefix, documentation, label, stats in self._labeled_stats:
+            # Samples of one metric must be listed together
+            samples: Dict[str, List[str]] = {}
+            for instance, values in stats().items():
+                for key, value in values.items():
+                    if isinstance(value, bool):
+                        value = int(value)
+                    if not isinstance(value, (int, float)):
+                        continue
+                    labels = _format_labels((label,), (instance,))
+                    samples.setdefault(key, []).append(f"{prefix}_{key}{labels} {_format_value(value)}")
+            for key, key_samples in samples.items():
+                lines.append(f"# HELP {prefix}_{key} {documentation}")
+                lines.append(f"# TYPE {prefix}_{key} gauge")
+                lines.extend(key_samples)
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+# Shared registry for this worker process
+registry = MetricsRegistry()
+
+REQUEST_LATENCY = registry.histogram(
+    "mentorai_http_request_duration_seconds",
+    "Time to complete HTTP requests, by route template and method.",
+    ("route", "method")
+)
+REQUESTS = registry.counter(
+    "mentorai_http_requests_total",
+    "HTTP requests, by route template, method and status code.",
+    ("route", "method", "status")
+)
+STAGE_LATENCY = registry.histogram(
+    "mentorai_stage_duration_seconds",
+    "Time spent in each stage of answering a question.",
+    ("stage",)
+)
+MODEL_TOKENS = registry.counter(
+    "mentorai_model_tokens_total",
+    "Tokens reported by the AI model, by kind (prompt or output) and model tier.",
+    ("kind", "tier")
+)
+MODEL_ROUTES = registry.counter(
+    "mentorai_model_routes_total",
+    "Model calls routed to each model tier, and whether load moved them down a tier.",
+    ("tier", "load_shifted")
+)
+MODEL_CALL_LATENCY = registry.histogram(
+    "mentorai_model_call_duration_seconds",
+    "Time to get a complete answer from the AI model, by model tier.",
+    ("tier",)
+)
+SIMILAR_QUESTION_LOOKUP_LATENCY = registry.histogram(
+    "mentorai_similar_question_lookup_duration_seconds",
+    "Time to search the index of answered questions for a near-duplicate.",
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025)
+)
+AI_ERRORS = registry.counter(
+    "mentorai_ai_errors_total",
+    "AI service errors returned to clients, by error class.",
+    ("type",)
+)
+CANCELLED_REQUESTS = registry.counter(
+    "mentorai_cancelled_requests_total",
+    "Requests whose model work was abandoned before answering, by reason (client_disconnect or deadline).",
+    ("reason",)
+)
+ROLLED_BACK_MESSAGES = registry.counter(
+    "mentorai_rolled_back_messages_total",
+    "Questions removed from conversation history because their answer was abandoned or failed."
+)
+
+# Stage durations of the current request in seconds, for the Server-Timing header
+request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+def record_stage(name: str, seconds: float) -> None:
+    """
+    Record time spent in a pipeline stage.
+
+    Args:
+        name: The stage name, e.g. "model_call"
+        seconds: Time spent in the stage
+    """
+    STAGE_LATENCY.observe(seconds, stage=name)
+    timings = request_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Time the enclosed block as a pipeline stage.
+
+    Args:
+        name: The stage name, e.g. "store_lookup"
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started)
+
+def server_timing_header(timings: Dict[str, float], total: float) -> str:
+    """
+    Format stage durations as a Server-Timing header value.
+
+    Args:
+        timings: Stage names to seconds
+        total: Seconds from receiving the request to sending the response headers
+
+    Returns:
+        The header value, durations in milliseconds
+    """
+    entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items()]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
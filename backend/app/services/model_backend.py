@@ -0,0 +1,479 @@
+"""
+Pluggable backends for generating answers from the AI model.
+"""
+
+import asyncio
+import functools
+import math
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, NamedTuple, Optional, Tuple
+from app.config.settings import (
+    GOOGLE_API_KEY,
+    GOOGLE_API_KEYS,
+    AI_MODEL,
+    AI_BACKEND,
+    AI_EXECUTOR_WORKERS,
+    SYSTEM_PROMPT
+)
+from app.services.context_builder import estimate_tokens
+from app.services.exceptions import ModelConnectionError, RateLimitError
+
+# The Gemini SDK, imported and configured on first use: importing it takes
+# most of the application's startup time, and tools that never call the
+# model (benchmarks, the fake backend) should not need an API key
+_genai: Any = None
+
+def load_genai() -> Any:
+    """
+    Import and configure the Gemini SDK, once.
+    
+    Returns:
+        The google.generativeai module
+        
+    Raises:
+        ValueError: If neither GOOGLE_API_KEY nor GOOGLE_API_KEYS is set
+    """
+    global _genai
+    if _genai is None:
+        if not GOOGLE_API_KEY and not GOOGLE_API_KEYS:
+            raise ValueError("GOOGLE_API_KEY (or GOOGLE_API_KEYS) environment variable not set")
+        import google.generativeai as genai
+        if GOOGLE_API_KEY:
+            genai.configure(api_key=GOOGLE_API_KEY)
+        _genai = genai
+    return _genai
+
+# Bounded thread pool for backends that only offer blocking calls
+_executor: Optional[ThreadPoolExecutor] = None
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Get the shared executor for blocking model calls, creating it on first use.
+    
+    Returns:
+        A ThreadPoolExecutor limited to AI_EXECUTOR_WORKERS threads
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=AI_EXECUTOR_WORKERS,
+            thread_name_prefix="model-backend"
+        )
+    return _executor
+
+class ModelReply(NamedTuple):
+    """A single reply produced by a model backend, with the token usage it reported."""
+    text: str
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+
+class GenerationOptions(NamedTuple):
+    """Per-request generation settings; None leaves the backend's default."""
+    model: Optional[str] = None
+    max_output_tokens: Optional[int] = None
+
+def _reply_from_response(response) -> ModelReply:
+    """Build a ModelReply from a Gemini response, including its usage metadata."""
+    usage = getattr(response, "usage_metadata", None)
+    return ModelReply(
+        text=response.text,
+        prompt_tokens=getattr(usage, "prompt_token_count", 0) or 0,
+        output_tokens=getattr(usage, "candidates_token_count", 0) or 0
+    )
+
+class ModelBackend:
+    """
+    Interface for the model backends used by the AI service.
+
+    A backend receives the prior conversation as native chat history and
+    answers one new message with a single upstream call.
+    """
+
+    def generate(self, history: List[Dict], message: str, options: Optional[GenerationOptions] = None) -> ModelReply:
+        """
+        Generate a reply to a message given the prior conversation.
+
+        Args:
+            history: Prior turns in Gemini's format ({"role": ..., "parts": [...]})
+            message: The new user message to answer
+            options: Optional model and output limit for this request
+
+        Returns:
+            The model's reply
+        """
+        raise NotImplementedError
+
+    async def generate_async(self, history: List[Dict], message: str, options: Optional[GenerationOptions] = None) -> ModelReply:
+        """
+        Generate a reply without blocking the event loop.
+
+        Backends with native async support override this; the default runs
+        the blocking generate() on the shared bounded executor.
+
+        Args:
+            history: Prior turns in Gemini's format
+            message: The new user message to answer
+            options: Optional model and output limit for this request
+
+        Returns:
+            The model's reply
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            get_executor(),
+            functools.partial(self.generate, history, message, options)
+        )
+
+    async def stream_async(self, history: List[Dict], message: str, options: Optional[GenerationOptions] = None) -> AsyncIterator[str]:
+        """
+        Generate a reply as a stream of text chunks.
+
+        Backends that can stream override this; the default yields the whole
+        reply from generate_async() as a single chunk.
+
+        Args:
+            history: Prior turns in Gemini's format
+            message: The new user message to answer
+            options: Optional model and output limit for this request
+
+        Yields:
+            Successive chunks of the reply text
+        """
+        reply = await self.generate_async(history, message, options)
+        yield reply.text
+
+    async def warm_up(self) -> None:
+        """
+        Prepare for the first request, e.g. by opening upstream connections.
+
+        The default does nothing.
+        """
+
+    async def probe(self) -> None:
+        """
+        Check that the upstream answers, with a call that costs no generation.
+
+        The default does nothing, for backends without an upstream.
+
+        Raises:
+            Exception: If the upstream cannot be reached
+        """
+
+class GeminiBackend(ModelBackend):
+    """
+    Backend that calls the Google Gemini API.
+
+    Creating the backend imports and configures the SDK, so it is created
+    during application startup rather than at import time. Without an
+    `api_key` the backend uses the SDK's process-wide client and
+    GOOGLE_API_KEY; with one it gets clients of its own, so backends for
+    different keys can run side by side (see KeyPoolBackend).
+    """
+
+    def __init__(self, model_name: str = AI_MODEL, system_instruction: str = SYSTEM_PROMPT, api_key: Optional[str] = None):
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self._genai = load_genai()
+        self._models: Dict[str, Any] = {}
+        self._clients: Optional[Tuple[Any, Any]] = None
+        if api_key:
+            from google.ai import generativelanguage as glm
+            # Created here, on the event loop's thread, which the async client needs
+            self._clients = (
+                glm.GenerativeServiceClient(client_options={"api_key": api_key}),
+                glm.GenerativeServiceAsyncClient(client_options={"api_key": api_key}),
+            )
+            # Fails now, at startup, if the SDK no longer takes per-model clients
+            self.model
+
+        from google.api_core import exceptions as google_exceptions
+        self._rate_limit_error = google_exceptions.ResourceExhausted
+        # Transient upstream failures, surfaced as ModelConnectionError so they can be retried
+        self._transient_errors = (
+            google_exceptions.ServiceUnavailable,
+            google_exceptions.InternalServerError,
+            google_exceptions.DeadlineExceeded,
+        )
+
+    @property
+    def model(self):
+        """The default Gemini model, built once and reused across requests."""
+        return self._model_for(self.model_name)
+
+    def _model_for(self, model_name: str):
+        """Get a Gemini model by name, building it on first use."""
+        model = self._models.get(model_name)
+        if model is None:
+            model = self._genai.GenerativeModel(
+                model_name,
+                system_instruction=self.system_instruction
+            )
+            if self._clients:
+                # The SDK only configures clients per process; models take
+                # theirs from these private attributes when set. Without them
+                # every key would silently use the process-wide client
+                if not (hasattr(model, "_client") and hasattr(model, "_async_client")):
+                    raise RuntimeError(
+                        "This google-generativeai version does not support per-key clients; "
+                        "install the version pinned in requirements.txt"
+                    )
+                model._client, model._async_client = self._clients
+            self._models[model_name] = model
+        return model
+
+    def _start_chat(self, history: List[Dict], options: Optional[GenerationOptions]) -> Tuple[Any, Optional[Dict]]:
+        """Start a chat on the requested model, with the generation config to send with it."""
+        options = options or GenerationOptions()
+        chat = self._model_for(options.model or self.model_name).start_chat(history=history)
+        config = {"max_output_tokens": options.max_output_tokens} if options.max_output_tokens else None
+        return chat, config
+
+    async def warm_up(self) -> None:
+        # Build the model and open the async channel that send_message_async
+        # uses; counting tokens is free and does not generate anything
+        await self.model.count_tokens_async("warm up")
+
+    async def probe(self) -> None:
+        try:
+            await self.model.count_tokens_async("ping")
+        except self._rate_limit_error:
+            # Reachable, only throttled; every worker shares the quota, so
+            # taking this one out of rotation would not help
+            pass
+        except self._transient_errors as e:
+            raise ModelConnectionError(f"AI service temporarily unavailable: {str(e)}")
+
+    def generate(self, history: List[Dict], message: str, options: Optional[GenerationOptions] = None) -> ModelReply:
+        chat, config = self._start_chat(history, options)
+        try:
+            response = chat.send_message(message, generation_config=config)
+        except self._rate_limit_error as e:
+            raise RateLimitError(f"Rate limit exceeded: {str(e)}")
+        except self._transient_errors as e:
+            raise ModelConnectionError(f"AI service temporarily unavailable: {str(e)}")
+        return _reply_from_response(response)
+
+    async def generate_async(self, history: List[Dict], message: str, options: Optional[GenerationOptions] = None) -> ModelReply:
+        chat, config = self._start_chat(history, options)
+        try:
+            response = await chat.send_message_async(message, generation_config=config)
+        except self._rate_limit_error as e:
+            raise RateLimitError(f"Rate limit exceeded: {str(e)}")
+        except self._transient_errors as e:
+            raise ModelConnectionError(f"AI service temporarily unavailable: {str(e)}")
+        return _reply_from_response(response)
+
+    async def stream_async(self, history: List[Dict], message: str, options: Optional[GenerationOptions] = None) -> AsyncIterator[str]:
+        chat, config = self._start_chat(history, options)
+        try:
+            response = await chat.send_message_async(message, generation_config=config, stream=True)
+            async for chunk in response:
+                if chunk.text:
+                    yield chunk.text
+        except self._rate_limit_error as e:
+            raise RateLimitError(f"Rate limit exceeded: {str(e)}")
+        except self._transient_errors as e:
+            raise ModelConnectionError(f"AI service temporarily unavailable: {str(e)}")
+
+class FakeBackend(ModelBackend):
+    """
+    Deterministic local backend for development and tests.
+
+    Replies are derived only from the request, and every call is recorded so
+    callers can check how many upstream calls a turn made. An optional
+    latency simulates a slow upstream; max_in_flight records the highest
+    number of calls that were running at the same time.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls: List[Tuple[List[Dict], str]] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    @property
+    def call_count(self) -> int:
+        """Number of upstream calls made so far."""
+        return len(self.calls)
+
+    def _reply(self, history: List[Dict], message: str) -> ModelReply:
+        self.calls.append((list(history), message))
+        text = f"[turn {len(history) // 2 + 1}] Answer to: {message}"
+        prompt_tokens = sum(estimate_tokens(part) for turn in history for part in turn["parts"])
+        return ModelReply(text=text, prompt_tokens=prompt_tokens + estimate_tokens(message), output_tokens=estimate_tokens(text))
+
+    def generate(self, history: List[Dict], message: str, options: Optional[GenerationOptions] = None) -> ModelReply:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._reply(history, message)
+
+    async def generate_async(self, history: List[Dict], message: str, options: Optional[GenerationOptions] = None) -> ModelReply:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            return self._reply(history, message)
+        finally:
+            self.in_flight -= 1
+
+    async def stream_async(self, history: List[Dict], message: str, options: Optional[GenerationOptions] = None) -> AsyncIterator[str]:
+        reply = self._reply(history, message)
+        words = reply.text.split(" ")
+        for index, word in enumerate(words):
+            if self.latency:
+                await asyncio.sleep(self.latency / len(words))
+            yield word if index == 0 else " " + word
+
+class SimulatedBackend(ModelBackend):
+    """
+    Stand-in for Gemini with a realistic latency distribution, for load tests.
+
+    Latency is log-normal around `latency_median` seconds; `latency_sigma`
+    controls the tail (0 gives a constant latency). Each call fails with
+    probability `error_rate`, and replies are `output_words` words long.
+    """
+
+    def __init__(
+        self,
+        latency_median: float = 0.5,
+        latency_sigma: float = 0.5,
+        error_rate: float = 0.0,
+        output_words: int = 150,
+        seed: Optional[int] = None
+    ):
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.output_words = output_words
+        self._random = random.Random(seed)
+        self.calls = 0
+        self.failures = 0
+
+    def _latency(self) -> float:
+        if not self.latency_median:
+            return 0.0
+        return self.latency_median * math.exp(self._random.gauss(0.0, self.latency_sigma))
+
+    def _reply(self, history: List[Dict], message: str) -> ModelReply:
+        self.calls += 1
+        if self._random.random() < self.error_rate:
+            self.failures += 1
+            raise ModelConnectionError("Simulated upstream failure")
+        words = message.split()
+        text = " ".join(words[index % len(words)] for index in range(self.output_words)) if words else ""
+        prompt_tokens = sum(estimate_tokens(part) for turn in history for part in turn["parts"])
+        return ModelReply(text=text, prompt_tokens=prompt_tokens + estimate_tokens(message), output_tokens=estimate_tokens(text))
+
+    def generate(self, history: List[Dict], message: str, options: Optional[GenerationOptions] = None) -> ModelReply:
+        time.sleep(self._latency())
+        return self._reply(history, message)
+
+    async def generate_async(self, history: List[Dict], message: str, options: Optional[GenerationOptions] = None) -> ModelReply:
+        await asyncio.sleep(self._latency())
+        return self._reply(history, message)
+
+class FaultInjectingBackend(ModelBackend):
+    """
+    Wraps another backend and injects failures and latency, for testing
+    retries, circuit breaking and hedging.
+
+    The first `fail_first` calls fail, then each call fails with probability
+    `error_rate`. Failures are created by `error_factory`. `extra_latency`
+    seconds are added to every call, and `slow_every` makes every n-th call
+    take `slow_latency` seconds instead.
+    """
+
+    def __init__(
+        self,
+        inner: ModelBackend,
+        fail_first: int = 0,
+        error_rate: float = 0.0,
+        error_factory=lambda: ModelConnectionError("Injected upstream failure"),
+        extra_latency: float = 0.0,
+        slow_every: int = 0,
+        slow_latency: float = 0.0,
+        seed: Optional[int] = None
+    ):
+        self.inner = inner
+        self.fail_first = fail_first
+        self.error_rate = error_rate
+        self.error_factory = error_factory
+        self.extra_latency = extra_latency
+        self.slow_every = slow_every
+        self.slow_latency = slow_latency
+        self._random = random.Random(seed)
+        self.calls = 0
+        self.failures = 0
+
+    def _next_fault(self) -> Tuple[float, Optional[Exception]]:
+        """Decide the latency and failure (if any) of the next call."""
+        self.calls += 1
+        latency = self.extra_latency
+        if self.slow_every and self.calls % self.slow_every == 0:
+            latency = self.slow_latency
+        if self.calls <= self.fail_first or self._random.random() < self.error_rate:
+            self.failures += 1
+            return latency, self.error_factory()
+        return latency, None
+
+    async def warm_up(self) -> None:
+        await self.inner.warm_up()
+
+    async def probe(self) -> None:
+        await self.inner.probe()
+
+    def generate(self, history: List[Dict], message: str, options: Optional[GenerationOptions] = None) -> ModelReply:
+        latency, error = self._next_fault()
+        if latency:
+            time.sleep(latency)
+        if error:
+            raise error
+        return self.inner.generate(history, message, options)
+
+    async def generate_async(self, history: List[Dict], message: str, options: Optional[GenerationOptions] = None) -> ModelReply:
+        latency, error = self._next_fault()
+        if latency:
+            await asyncio.sleep(latency)
+        if error:
+            raise error
+        return await self.inner.generate_async(history, message, options)
+
+    async def stream_async(self, history: List[Dict], message: str, options: Optional[GenerationOptions] = None) -> AsyncIterator[str]:
+        latency, error = self._next_fault()
+        if latency:
+            await asyncio.sleep(latency)
+        if error:
+            raise error
+        async for chunk in self.inner.stream_async(history, message, options):
+            yield chunk
+
+def create_backend(name: str = AI_BACKEND) -> ModelBackend:
+    """
+    Create a model backend by name.
+
+    With GOOGLE_API_KEYS set, the Gemini backend is a KeyPoolBackend with
+    one GeminiBackend per key.
+
+    Args:
+        name: The backend name ('gemini' or 'fake')
+
+    Returns:
+        A new ModelBackend instance
+
+    Raises:
+        ValueError: If the backend name is unknown
+    """
+    if name == "gemini":
+        if GOOGLE_API_KEYS:
+            from app.services.key_pool import KeyPoolBackend, parse_api_keys
+            return KeyPoolBackend.from_settings(
+                parse_api_keys(GOOGLE_API_KEYS),
+                lambda api_key: GeminiBackend(api_key=api_key)
+            )
+        return GeminiBackend()
+    if name == "fake":
+        return FakeBackend()
+    raise ValueError(f"Unknown AI backend: {name}")
@@ -0,0 +1,161 @@
+"""
+Routing of questions to model tiers by estimated complexity.
+"""
+
+import re
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+from app.services.topic_classifier import TopicClassifier
+
+# Markers of questions that need careful multi-step reasoning
+_MATH_MARKERS = re.compile(
+    r"\d\s*[-+*/^=<>]\s*\d|[∫∑∏√π∞≤≥≠]|\\(?:frac|int|sum|sqrt)"
+    r"|\b(?:prove|proof|derive|derivation|integral|integrate|derivative|differentiate|limit|matrix|matrices|eigen\w*|theorem|lemma)\b"
+)
+_CODE_MARKERS = re.compile(
+    r"```|\bdef\s+\w+\s*\(|\bclass\s+\w+|\bfunction\b|\breturn\b|#include|=>|\bimport\s+\w+|[{};]\s*$",
+    re.MULTILINE
+)
+_REASONING_MARKERS = re.compile(
+    r"\bstep[- ]by[- ]step\b|\bcompare\b|\bcontrast\b|\banaly[sz]e\b|\bevaluate\b|\bcritique\b|\bin detail\b"
+)
+
+class ModelTier(NamedTuple):
+    """A model and generation settings that questions can be routed to."""
+    name: str
+    model: str
+    max_output_tokens: int
+    min_score: int
+
+class RouteDecision(NamedTuple):
+    """The tier chosen for one request, and why."""
+    tier: ModelTier
+    score: int
+    reasons: Tuple[str, ...]
+    load_shifted: bool
+
+def parse_tiers(spec: str) -> List[ModelTier]:
+    """
+    Parse a tier table such as "fast:gemini-1.5-flash-8b:1024:0,deep:gemini-1.5-pro:4096:5".
+
+    Args:
+        spec: Comma-separated "name:model:max_output_tokens:min_score" entries
+
+    Returns:
+        The tiers, ordered from the lowest to the highest min_score
+
+    Raises:
+        ValueError: If an entry is malformed or no tier accepts a score of 0
+    """
+    tiers = []
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        fields = entry.split(":")
+        if len(fields) != 4:
+            raise ValueError(f"Invalid model tier (expected name:model:max_output_tokens:min_score): {entry}")
+        name, model, max_output_tokens, min_score = fields
+        tiers.append(ModelTier(name, model, int(max_output_tokens), int(min_score)))
+    tiers.sort(key=lambda tier: tier.min_score)
+    if not tiers or tiers[0].min_score > 0:
+        raise ValueError("Model tiers must include one with min_score 0")
+    return tiers
+
+class ModelRouter:
+    """
+    Picks a model tier per request from cheap local signals.
+
+    Each signal adds to a complexity score: long questions, subjects that
+    usually need careful reasoning, math, code or multi-step markers, and
+    deep conversations. The request goes to the highest tier whose min_score
+    the question reaches. A client hint naming a tier takes precedence over
+    the score. When the server is loaded beyond `load_shift`, requests move
+    down one tier so the faster model absorbs the load and latency holds.
+    """
+
+    def __init__(
+        self,
+        tiers: List[ModelTier],
+        complex_subjects: Iterable[str] = (),
+        load_shift: float = 0.0,
+        long_question_words: int = 40,
+        deep_conversation_turns: int = 6
+    ):
+        """
+        Args:
+            tiers: Available tiers, ordered by min_score
+            complex_subjects: Subjects whose questions score one point higher
+            load_shift: Load (0-1 of admission capacity) above which requests drop a tier (0 disables)
+            long_question_words: Word count above which a question scores one point (two at 3x)
+            deep_conversation_turns: Prior turns above which a question scores one point
+        """
+        self.tiers = tiers
+        self.load_shift = load_shift
+        self.long_question_words = long_question_words
+        self.deep_conversation_turns = deep_conversation_turns
+        self._subjects = TopicClassifier(complex_subjects, ())
+        self._by_name = {tier.name: index for index, tier in enumerate(tiers)}
+
+    def score(self, question: str, turns: int = 0) -> Tuple[int, Tuple[str, ...]]:
+        """
+        Estimate how demanding a question is.
+
+        Args:
+            question: The question
+            turns: Number of earlier turns in the conversation
+
+        Returns:
+            A tuple containing (complexity score, names of the signals that fired)
+        """
+        score = 0
+        reasons = []
+        words = len(question.split())
+        if words > self.long_question_words * 3:
+            score += 2
+            reasons.append("very_long")
+        elif words > self.long_question_words:
+            score += 1
+            reasons.append("long")
+
+        text = question.lower()
+        if self._subjects.classify(text).academic_hits:
+            score += 1
+            reasons.append("subject")
+        if _MATH_MARKERS.search(text):
+            score += 2
+            reasons.append("math")
+        if _CODE_MARKERS.search(question):
+            score += 2
+            reasons.append("code")
+        if _REASONING_MARKERS.search(text):
+            score += 1
+            reasons.append("reasoning")
+        if turns > self.deep_conversation_turns:
+            score += 1
+            reasons.append("deep_conversation")
+        return score, tuple(reasons)
+
+    def route(self, question: str, turns: int = 0, hint: Optional[str] = None, load: float = 0.0) -> RouteDecision:
+        """
+        Choose the tier for a request.
+
+        Args:
+            question: The question
+            turns: Number of earlier turns in the conversation
+            hint: Optional tier name requested by the client; unknown names are ignored
+            load: Current load as a fraction of admission capacity
+
+        Returns:
+            The RouteDecision
+        """
+        score, reasons = self.score(question, turns)
+        if hint in self._by_name:
+            index = self._by_name[hint]
+            reasons += ("hint",)
+        else:
+            index = 0
+            for candidate, tier in enumerate(self.tiers):
+                if score >= tier.min_score:
+                    index = candidate
+
+        load_shifted = bool(self.load_shift and load >= self.load_shift and index > 0)
+        if load_shifted:
+            index -= 1
+        return RouteDecision(self.tiers[index], score, reasons, load_shifted)
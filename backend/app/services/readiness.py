@@ -0,0 +1,209 @@
+"""
+Readiness of a worker: cached upstream probe, event loop lag, load and store occupancy.
+"""
+
+import asyncio
+import logging
+from collections import deque
+from typing import Callable, Deque, Dict, List, NamedTuple, Optional
+from app.config.settings import (
+    READY_PROBE_INTERVAL,
+    READY_PROBE_TIMEOUT,
+    READY_PROBE_FAILURES,
+    READY_LAG_INTERVAL,
+    READY_LAG_WINDOW,
+    READY_MAX_LOOP_LAG,
+    READY_MAX_IN_FLIGHT,
+    READY_MAX_QUEUED,
+    READY_MAX_STORE_OCCUPANCY
+)
+from app.services.admission import admission_controller
+from app.services.conversation_service import ConversationService
+from app.services.model_backend import ModelBackend
+
+logger = logging.getLogger(__name__)
+
+class ReadinessCheck(NamedTuple):
+    """Outcome of one readiness check: the measured value against its limit (0 if disabled)."""
+    ok: bool
+    value: float
+    limit: float
+    detail: Optional[str] = None
+
+def _within(value: float, limit: float) -> ReadinessCheck:
+    return ReadinessCheck(not limit or value <= limit, value, limit)
+
+class ReadinessMonitor:
+    """
+    Background measurements behind /ready, so answering it costs nothing.
+
+    While the app runs, a watchdog task sleeps for `lag_interval` seconds
+    at a time and records how much later than asked it woke up: time the
+    event loop spent on something else, such as blocking code. A prober
+    task calls the model backend's probe() every `probe_interval` seconds;
+    /ready reports its cached result and never calls the model itself.
+
+    The worker is ready when the upstream probe has not failed
+    `max_probe_failures` times in a row, the worst recent loop lag, the
+    admitted and queued requests and the store occupancy are within their
+    limits, and it is not draining for shutdown. Until the first probe has
+    finished the upstream counts as unknown, and the worker as not ready.
+    """
+
+    def __init__(
+        self,
+        probe_interval: float,
+        probe_timeout: float,
+        max_probe_failures: int,
+        lag_interval: float,
+        lag_window: int,
+        max_loop_lag: float,
+        max_in_flight: int,
+        max_queued: int,
+        max_store_occupancy: float
+    ):
+        """
+        Args:
+            probe_interval: Seconds between upstream probes (0 disables probing)
+            probe_timeout: Seconds a probe may take before it counts as failed
+            max_probe_failures: Consecutive failed probes that make the worker not ready (0 disables)
+            lag_interval: Seconds between event loop lag samples
+            lag_window: Number of recent lag samples whose worst is checked
+            max_loop_lag: Seconds of lag that make the worker not ready (0 disables)
+            max_in_flight: Admitted requests that make the worker not ready (0 disables)
+            max_queued: Requests waiting for admission that make the worker not ready (0 disables)
+            max_store_occupancy: Fraction of the conversation store in use that makes
+                the worker not ready (0 disables)
+        """
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.max_probe_failures = max_probe_failures
+        self.lag_interval = lag_interval
+        self.max_loop_lag = max_loop_lag
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.max_store_occupancy = max_store_occupancy
+        self._lag_samples: Deque[float] = deque(maxlen=lag_window)
+        self._tasks: List[asyncio.Task] = []
+        self.probes = 0
+        self.probe_failures = 0
+        self.consecutive_failures = 0
+        self.last_probe_error: Optional[str] = None
+
+    def start(self, get_backend: Callable[[], ModelBackend]) -> None:
+        """
+        Start the background tasks on the running event loop.
+
+        Args:
+            get_backend: Returns the backend to probe (looked up for each probe,
+                so a replaced backend is probed)
+        """
+        loop = asyncio.get_running_loop()
+        self._lag_samples.clear()
+        self._tasks = [loop.create_task(self._watch_loop_lag())]
+        if self.probe_interval:
+            self._tasks.append(loop.create_task(self._probe_periodically(get_backend)))
+
+    async def stop(self) -> None:
+        """Stop the background tasks."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    @property
+    def loop_lag(self) -> float:
+        """The worst event loop lag among the recent samples, in seconds."""
+        return max(self._lag_samples, default=0.0)
+
+    async def probe(self, backend: ModelBackend) -> bool:
+        """
+        Probe the upstream once and record the outcome.
+
+        Args:
+            backend: The model backend to probe
+
+        Returns:
+            True if the probe succeeded
+        """
+        self.probes += 1
+        try:
+            await asyncio.wait_for(backend.probe(), self.probe_timeout)
+        except Exception as e:
+            self.probe_failures += 1
+            self.consecutive_failures += 1
+            self.last_probe_error = str(e) or type(e).__name__
+            logger.warning(
+                "Upstream probe failed: %s", self.last_probe_error,
+                extra={"consecutive_failures": self.consecutive_failures}
+            )
+            return False
+        self.consecutive_failures = 0
+        self.last_probe_error = None
+        return True
+
+    def checks(self) -> Dict[str, ReadinessCheck]:
+        """
+        Evaluate every readiness check from cached and current state.
+
+        Returns:
+            The checks by name
+        """
+        if not self.probe_interval:
+            upstream = ReadinessCheck(True, 0, 0, "Probing disabled")
+        elif not self.probes:
+            upstream = ReadinessCheck(not self.max_probe_failures, 0, self.max_probe_failures, "Not probed yet")
+        else:
+            upstream = ReadinessCheck(
+                not self.max_probe_failures or self.consecutive_failures < self.max_probe_failures,
+                self.consecutive_failures,
+                self.max_probe_failures,
+                self.last_probe_error
+            )
+        return {
+            "upstream": upstream,
+            "event_loop_lag": _within(self.loop_lag, self.max_loop_lag),
+            "in_flight": _within(admission_controller.in_flight, self.max_in_flight),
+            "queued": _within(admission_controller.queue_depth, self.max_queued),
+            "store_occupancy": _within(ConversationService.occupancy(), self.max_store_occupancy),
+            "draining": ReadinessCheck(not admission_controller.draining, float(admission_controller.draining), 0),
+        }
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get event loop lag and probe counters.
+
+        Returns:
+            A dictionary of counter names to values
+        """
+        return {
+            "event_loop_lag_seconds": self.loop_lag,
+            "probes": self.probes,
+            "probe_failures": self.probe_failures,
+            "consecutive_probe_failures": self.consecutive_failures,
+        }
+
+    async def _watch_loop_lag(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.lag_interval)
+            self._lag_samples.append(max(0.0, loop.time() - started - self.lag_interval))
+
+    async def _probe_periodically(self, get_backend: Callable[[], ModelBackend]) -> None:
+        while True:
+            await self.probe(get_backend())
+            await asyncio.sleep(self.probe_interval)
+
+# Shared monitor for this worker process
+readiness_monitor = ReadinessMonitor(
+    probe_interval=READY_PROBE_INTERVAL,
+    probe_timeout=READY_PROBE_TIMEOUT,
+    max_probe_failures=READY_PROBE_FAILURES,
+    lag_interval=READY_LAG_INTERVAL,
+    lag_window=READY_LAG_WINDOW,
+    max_loop_lag=READY_MAX_LOOP_LAG,
+    max_in_flight=READY_MAX_IN_FLIGHT,
+    max_queued=READY_MAX_QUEUED,
+    max_store_occupancy=READY_MAX_STORE_OCCUPANCY
+)
@@ -0,0 +1,418 @@
+"""
+Resilience layer around model backends: circuit breaking, retries and hedging.
+"""
+
+import asyncio
+import random
+import time
+from collections import deque
+from typing import AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple, Type
+from app.config.settings import (
+    AI_MAX_RETRIES,
+    AI_RETRY_BASE_DELAY,
+    AI_RETRY_MAX_DELAY,
+    AI_RETRYABLE_ERRORS,
+    AI_CIRCUIT_FAILURE_THRESHOLD,
+    AI_CIRCUIT_RECOVERY_TIME,
+    AI_HEDGE_PERCENTILE,
+    AI_HEDGE_MIN_SAMPLES
+)
+from app.services import deadline
+from app.services.exceptions import (
+    AIServiceError,
+    DeadlineExceededError,
+    ModelConnectionError,
+    ModelResponseError,
+    RateLimitError
+)
+from app.services.metrics import stage
+from app.services.model_backend import GenerationOptions, ModelBackend, ModelReply
+
+# Error classes that can be named in the AI_RETRYABLE_ERRORS setting
+ERROR_CLASSES: Dict[str, Type[BaseException]] = {
+    "AIServiceError": AIServiceError,
+    "ModelConnectionError": ModelConnectionError,
+    "ModelResponseError": ModelResponseError,
+    "RateLimitError": RateLimitError,
+    "ConnectionError": ConnectionError,
+    "TimeoutError": TimeoutError,
+}
+
+class CircuitOpenError(ModelConnectionError):
+    """Exception raised without calling the model while the circuit breaker is open."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def parse_error_classes(names: str) -> Tuple[Type[BaseException], ...]:
+    """
+    Resolve a comma-separated list of error class names.
+
+    Args:
+        names: Class names from ERROR_CLASSES, e.g. "ModelConnectionError,RateLimitError"
+
+    Returns:
+        The matching exception classes
+
+    Raises:
+        ValueError: If a name is not a known error class
+    """
+    classes = []
+    for name in filter(None, (part.strip() for part in names.split(","))):
+        if name not in ERROR_CLASSES:
+            raise ValueError(f"Unknown error class in retryable errors: {name}")
+        classes.append(ERROR_CLASSES[name])
+    return tuple(classes)
+
+def full_jitter_delay(attempt: int, base: float, cap: float) -> float:
+    """
+    Backoff delay with "full jitter": uniform between 0 and the exponential bound.
+
+    Spreading retries over the whole interval keeps clients that failed at the
+    same moment from retrying in lockstep.
+
+    Args:
+        attempt: Number of the retry, starting at 1
+        base: Delay bound of the first retry in seconds
+        cap: Maximum delay bound in seconds
+
+    Returns:
+        Seconds to wait before the retry
+    """
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+class CircuitBreaker:
+    """
+    Fails fast while the upstream is unhealthy.
+
+    Closed: calls pass through, and `failure_threshold` consecutive failures
+    open the circuit. Open: calls are rejected immediately until
+    `recovery_time` has passed. Half-open: a single probe call is let through;
+    its success closes the circuit and its failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, recovery_time: float, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            failure_threshold: Consecutive failures that open the circuit (0 disables the breaker)
+            recovery_time: Seconds the circuit stays open before a probe is allowed
+            clock: Monotonic time source, replaceable in tests
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self._clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+        self._probe_in_flight = False
+
+    def before_call(self) -> None:
+        """
+        Check that a call may proceed.
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or half-open with a probe already running
+        """
+        if not self.failure_threshold or self.state == self.CLOSED:
+            return
+        if self.state == self.OPEN:
+            remaining = self.opened_at + self.recovery_time - self._clock()
+            if remaining > 0:
+                self.rejected += 1
+                raise CircuitOpenError("AI service circuit is open after repeated failures", remaining)
+            self.state = self.HALF_OPEN
+        if self._probe_in_flight:
+            self.rejected += 1
+            raise CircuitOpenError("AI service is recovering; probe in progress", self.recovery_time)
+        self._probe_in_flight = True
+
+    def record_success(self) -> None:
+        """Record a successful call, closing the circuit."""
+        self.failures = 0
+        self.state = self.CLOSED
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        """Record a failed call, opening the circuit once the threshold is reached."""
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.failure_threshold and (self.state == self.HALF_OPEN or self.failures >= self.failure_threshold):
+            if self.state != self.OPEN:
+                self.times_opened += 1
+            self.state = self.OPEN
+            self.opened_at = self._clock()
+
+    def record_ignored(self) -> None:
+        """Record a call whose outcome says nothing about upstream health."""
+        self._probe_in_flight = False
+
+class LatencyTracker:
+    """Rolling window of recent call latencies."""
+
+    def __init__(self, window: int = 500):
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def record(self, seconds: float) -> None:
+        """Add a latency sample."""
+        self._samples.append(seconds)
+
+    def percentile(self, percent: float) -> float:
+        """
+        Get a latency percentile over the window.
+
+        Args:
+            percent: The percentile, between 0 and 100
+
+        Returns:
+            The latency in seconds, or 0 if there are no samples
+        """
+        if not self._samples:
+            return 0.0
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(len(ordered) * percent / 100))
+        return ordered[index]
+
+class ResilientBackend(ModelBackend):
+    """
+    Wraps a model backend with a circuit breaker, jittered retries and hedging.
+
+    Retryable errors (by class) are retried up to `max_retries` times with
+    full-jitter backoff, and count as failures for the circuit breaker. Other
+    errors are raised immediately. When hedging is enabled, a call that runs
+    longer than the configured latency percentile gets a second, parallel
+    attempt, and whichever finishes first successfully wins.
+
+    Calls respect the deadline of the current request (see
+    app.services.deadline): each attempt is cut off when it passes, and a
+    retry whose backoff would end after it is not made. Both raise
+    DeadlineExceededError, which is never retried.
+    """
+
+    def __init__(
+        self,
+        inner: ModelBackend,
+        max_retries: int = 2,
+        retryable: Tuple[Type[BaseException], ...] = (ModelConnectionError, ConnectionError, TimeoutError),
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        breaker: Optional[CircuitBreaker] = None,
+        hedge_percentile: float = 0.0,
+        hedge_min_samples: int = 20,
+        sleep: Callable[[float], "asyncio.Future"] = asyncio.sleep
+    ):
+        """
+        Args:
+            inner: The backend that makes the actual upstream calls
+            max_retries: Retries after the first attempt for retryable errors
+            retryable: Error classes worth retrying
+            base_delay: Backoff bound of the first retry in seconds
+            max_delay: Maximum backoff bound in seconds
+            breaker: Circuit breaker shared by all calls (None disables it)
+            hedge_percentile: Latency percentile after which a hedged attempt starts (0 disables hedging)
+            hedge_min_samples: Latency samples needed before hedging starts
+            sleep: Async sleep function, replaceable in tests
+        """
+        self.inner = inner
+        self.max_retries = max_retries
+        self.retryable = retryable
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker(0, 0)
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.latency = LatencyTracker()
+        self._sleep = sleep
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.deadline_exceeded = 0
+
+    @classmethod
+    def from_settings(cls, inner: ModelBackend) -> "ResilientBackend":
+        """
+        Wrap a backend using the resilience settings.
+
+        Args:
+            inner: The backend to wrap
+
+        Returns:
+            A new ResilientBackend
+        """
+        return cls(
+            inner,
+            max_retries=AI_MAX_RETRIES,
+            retryable=parse_error_classes(AI_RETRYABLE_ERRORS),
+            base_delay=AI_RETRY_BASE_DELAY,
+            max_delay=AI_RETRY_MAX_DELAY,
+            breaker=CircuitBreaker(AI_CIRCUIT_FAILURE_THRESHOLD, AI_CIRCUIT_RECOVERY_TIME),
+            hedge_percentile=AI_HEDGE_PERCENTILE,
+            hedge_min_samples=AI_HEDGE_MIN_SAMPLES
+        )
+
+    def generate(self, history: List[Dict], message: str, options: Optional[GenerationOptions] = None) -> ModelReply:
+        return self.inner.generate(history, message, options)
+
+    async def warm_up(self) -> None:
+        await self.inner.warm_up()
+
+    async def probe(self) -> None:
+        # Not retried, and not counted by the circuit breaker
+        await self.inner.probe()
+
+    async def generate_async(self, history: List[Dict], message: str, options: Optional[GenerationOptions] = None) -> ModelReply:
+        attempt = 0
+        while True:
+            timeout = self._time_left()
+            self.breaker.before_call()
+            try:
+                if timeout is None:
+                    reply = await self._attempt(history, message, options)
+                else:
+                    reply = await asyncio.wait_for(self._attempt(history, message, options), timeout)
+            except self.retryable as e:
+                if isinstance(e, TimeoutError) and deadline.expired():
+                    # Cut off by our own deadline, which says nothing about the upstream
+                    self.breaker.record_ignored()
+                    raise self._deadline_error() from e
+                self.breaker.record_failure()
+                attempt += 1
+                if attempt > self.max_retries:
+                    if isinstance(e, AIServiceError):
+                        raise
+                    raise ModelConnectionError(
+                        f"Failed to connect to AI service after {self.max_retries} retries: {str(e)}"
+                    )
+                await self._backoff(attempt)
+                continue
+            except asyncio.CancelledError:
+                self.breaker.record_ignored()
+                raise
+            except Exception:
+                self.breaker.record_ignored()
+                raise
+            self.breaker.record_success()
+            return reply
+
+    async def stream_async(self, history: List[Dict], message: str, options: Optional[GenerationOptions] = None) -> AsyncIterator[str]:
+        # Retries are only possible until the first chunk has been passed on
+        attempt = 0
+        while True:
+            self._time_left()
+            self.breaker.before_call()
+            started = False
+            stream = self.inner.stream_async(history, message, options).__aiter__()
+            try:
+                while True:
+                    # Each chunk must arrive within the time left for the request
+                    timeout = self._time_left()
+                    try:
+                        if timeout is None:
+                            chunk = await stream.__anext__()
+                        else:
+                            chunk = await asyncio.wait_for(stream.__anext__(), timeout)
+                    except StopAsyncIteration:
+                        break
+                    started = True
+                    yield chunk
+            except self.retryable as e:
+                if isinstance(e, TimeoutError) and deadline.expired():
+                    # Cut off by our own deadline, which says nothing about the upstream
+                    self.breaker.record_ignored()
+                    raise self._deadline_error() from e
+                self.breaker.record_failure()
+                attempt += 1
+                if started or attempt > self.max_retries:
+                    raise
+                await self._backoff(attempt)
+                continue
+            except BaseException:
+                self.breaker.record_ignored()
+                raise
+            finally:
+                await stream.aclose()
+            self.breaker.record_success()
+            return
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get retry, hedging and circuit breaker counters.
+
+        Returns:
+            A dictionary of counter names to values
+        """
+        return {
+            "circuit_state": self.breaker.state,
+            "circuit_open": self.breaker.state != CircuitBreaker.CLOSED,
+            "circuit_opened": self.breaker.times_opened,
+            "circuit_rejected": self.breaker.rejected,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "deadline_exceeded": self.deadline_exceeded,
+            "latency_p50": self.latency.percentile(50),
+            "latency_p95": self.latency.percentile(95),
+        }
+
+    def _time_left(self) -> Optional[float]:
+        """Seconds left for the current request, or None without a deadline."""
+        left = deadline.remaining()
+        if left is not None and left <= 0:
+            raise self._deadline_error()
+        return left
+
+    def _deadline_error(self) -> DeadlineExceededError:
+        self.deadline_exceeded += 1
+        return DeadlineExceededError("Request deadline exceeded before the AI model answered")
+
+    async def _backoff(self, attempt: int) -> None:
+        """Wait before a retry, unless the wait would outlast the request's deadline."""
+        delay = full_jitter_delay(attempt, self.base_delay, self.max_delay)
+        left = deadline.remaining()
+        if left is not None and delay >= left:
+            raise self._deadline_error()
+        self.retries += 1
+        with stage("retry_backoff"):
+            await self._sleep(delay)
+
+    async def _attempt(self, history: List[Dict], message: str, options: Optional[GenerationOptions]) -> ModelReply:
+        """One logical attempt, possibly hedged with a second parallel call."""
+        started = time.monotonic()
+        if not self.hedge_percentile or len(self.latency) < self.hedge_min_samples:
+            reply = await self.inner.generate_async(history, message, options)
+            self.latency.record(time.monotonic() - started)
+            return reply
+
+        hedge_after = self.latency.percentile(self.hedge_percentile)
+        primary = asyncio.ensure_future(self.inner.generate_async(history, message, options))
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+            if not done:
+                self.hedges += 1
+                tasks.add(asyncio.ensure_future(self.inner.generate_async(history, message, options)))
+
+            # Take the first success; only fail if every attempt failed
+            error: Optional[BaseException] = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        self.latency.record(time.monotonic() - started)
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
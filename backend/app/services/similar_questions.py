@@ -0,0 +1,481 @@
+"""
+Index of answered opening questions, searched for near-duplicates of new ones.
+"""
+
+import json
+import logging
+import os
+import random
+import re
+import time
+import zlib
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+from app.config.settings import (
+    SIMILAR_QUESTIONS_MAX_ENTRIES,
+    SIMILAR_QUESTIONS_THRESHOLD,
+    SIMILAR_QUESTIONS_DIMENSIONS,
+    SIMILAR_QUESTIONS_AUDIT_RATE,
+    SIMILAR_QUESTIONS_AUDIT_THRESHOLD,
+    SIMILAR_QUESTIONS_PATH
+)
+from app.services.answer_cache import normalize_question
+
+logger = logging.getLogger(__name__)
+
+# Words that change how a question is phrased, not what it asks
+_FILLER = frozenset((
+    "a", "an", "the", "is", "are", "was", "were", "be", "s", "what", "whats",
+    "do", "does", "did", "can", "could", "would", "will", "you", "your", "please", "me", "i", "my",
+    "explain", "explanation", "describe", "description", "tell", "define", "definition", "meaning",
+    "mean", "means", "about", "overview", "introduction",
+    "simply", "simple", "briefly", "brief", "detail", "detailed", "us", "it", "its", "this", "that",
+    "to", "of", "and", "in", "on", "for", "with", "some", "give", "help", "understand",
+))
+# Numbers, operators and question words that are not "what": a question
+# differing in any of them needs another answer, however similar the rest
+_LITERAL = re.compile(r"^(?:\d+(?:\.\d+)?|[+\-*/=<>^%×÷≠≤≥]|how|why|which|when|where|who|whom|whose)$")
+
+class _Entry(NamedTuple):
+    """A stored question, its answer and what must match for the answer to be reused."""
+    question: str
+    answer: str
+    scope: str
+    literals: Tuple[str, ...]
+
+class SimilarMatch(NamedTuple):
+    """A stored question found similar to the one asked."""
+    row: int
+    question: str
+    answer: str
+    score: float
+
+def _features(text: str) -> Tuple[List[str], Tuple[str, ...]]:
+    """
+    Split a text into the words and word pairs compared between questions.
+
+    Args:
+        text: The question (or answer) as written
+
+    Returns:
+        A tuple containing (the features, the numbers, operators and
+        question words in the text in order)
+    """
+    words = [word for word in normalize_question(text).split() if word not in _FILLER]
+    literals = tuple(word for word in words if _LITERAL.match(word))
+    # Word pairs keep order significant: "celsius to fahrenheit" is not "fahrenheit to celsius"
+    return words + [f"{first} {second}" for first, second in zip(words, words[1:])], literals
+
+class SimilarQuestionIndex:
+    """
+    Bounded index of answered questions searched by hashed TF-IDF similarity.
+
+    A question is reduced to its content words and word pairs, each hashed
+    (with a hash-derived sign, so collisions tend to cancel) into one of
+    `dimensions` counts. Stored questions are the rows of an int8 count
+    matrix; a float32 matrix holds them weighted by inverse document
+    frequency and normalized, one column per question. A question only
+    has a handful of non-zero features, so a lookup multiplies those few
+    rows of the weight matrix by the question's weights, scoring every
+    stored question while reading a small fraction of the matrix, then
+    partially sorts the scores for the `top_k` best. A candidate above `threshold` is only used if it was
+    answered by the same model and prompt (its scope) and has the same
+    numbers, operators and question words (how, why, which...), since
+    "solve 2x = 4" and "solve 2x = 6" differ in nothing else, and neither
+    do "2+2" and "2*2", or "how" and "why" a process works.
+
+    New answers are added one row at a time, weighted with the document
+    frequencies of the moment. All rows are reweighted once the index has
+    changed by a tenth since the last time, so weights follow the questions
+    students actually ask without a full rebuild per answer. When full, the
+    least recently used question makes room.
+
+    A sample of hits (`audit_rate`) is audited: the model answers the new
+    question anyway and an answer too different from the one served
+    (similarity below `audit_threshold`) counts as a false match and
+    removes the stored question.
+
+    With a path, the index is saved on shutdown and loaded at startup. The
+    counts are memory-mapped copy-on-write, so loading only reads the pages
+    it needs and workers started from one file share them until they change.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        dimensions: int,
+        threshold: float,
+        audit_rate: float = 0.0,
+        audit_threshold: float = 0.3,
+        top_k: int = 8,
+        path: str = "",
+        clock: Callable[[], float] = time.monotonic,
+        rng: Optional[random.Random] = None
+    ):
+        """
+        Args:
+            capacity: Maximum number of stored questions
+            dimensions: Size of the hashed feature space
+            threshold: Cosine similarity from which a stored answer is reused
+            audit_rate: Fraction of hits to audit against a fresh answer
+            audit_threshold: Answer similarity below which an audited hit was a false match
+            top_k: Best candidates checked for scope and literals per lookup
+            path: Base path of the saved index ("<path>.npy" and "<path>.json"; empty: not saved)
+            clock: Monotonic time source, replaceable in tests
+            rng: Random source for audit sampling, replaceable in tests
+        """
+        self.capacity = capacity
+        self.dimensions = dimensions
+        self.threshold = threshold
+        self.audit_rate = audit_rate
+        self.audit_threshold = audit_threshold
+        self.top_k = top_k
+        self.path = path
+        self._clock = clock
+        self._rng = rng or random.Random()
+        self._counts = np.zeros((capacity, dimensions), dtype=np.int8)
+        # Feature by question, so the rows of a question's features are contiguous
+        self._weights = np.zeros((dimensions, capacity), dtype=np.float32)
+        self._last_used = np.zeros(capacity, dtype=np.float64)
+        self._document_frequency = np.zeros(dimensions, dtype=np.int32)
+        self._idf = np.ones(dimensions, dtype=np.float32)
+        self._entries: List[Optional[_Entry]] = [None] * capacity
+        self._free: List[int] = []
+        self._rows = 0  # Rows ever used; rows beyond are all zero
+        self._size = 0
+        self._changes = 0  # Rows added or removed since the last reweighting
+        self.lookups = 0
+        self.hits = 0
+        self.guarded = 0
+        self.evictions = 0
+        self.reweights = 0
+        self.audits = 0
+        self.false_matches = 0
+
+    @classmethod
+    def from_settings(cls) -> "SimilarQuestionIndex":
+        """
+        Create an index from the similar question settings, loading the saved one if any.
+
+        Returns:
+            A new SimilarQuestionIndex
+        """
+        index = cls(
+            capacity=SIMILAR_QUESTIONS_MAX_ENTRIES,
+            dimensions=SIMILAR_QUESTIONS_DIMENSIONS,
+            threshold=SIMILAR_QUESTIONS_THRESHOLD,
+            audit_rate=SIMILAR_QUESTIONS_AUDIT_RATE,
+            audit_threshold=SIMILAR_QUESTIONS_AUDIT_THRESHOLD,
+            path=SIMILAR_QUESTIONS_PATH
+        )
+        if index.path:
+            index.load()
+        return index
+
+    def __len__(self) -> int:
+        return self._size
+
+    def lookup(self, question: str, scope: str) -> Optional[SimilarMatch]:
+        """
+        Find a stored question similar enough to reuse its answer.
+
+        Args:
+            question: The question as asked
+            scope: What the answer must have been produced with (model and prompt version)
+
+        Returns:
+            The best usable match, or None
+        """
+        self.lookups += 1
+        if not self._size:
+            return None
+        counts, literals = self._vectorize(question)
+        scores = self._scores(counts)
+        if scores is None:
+            return None
+
+        k = min(self.top_k, self._rows)
+        candidates = np.argpartition(scores, -k)[-k:]
+        for row in candidates[np.argsort(scores[candidates])[::-1]]:
+            score = float(scores[row])
+            if score < self.threshold:
+                break
+            entry = self._entries[row]
+            if entry is None:
+                continue
+            if entry.scope != scope or entry.literals != literals:
+                self.guarded += 1
+                continue
+            self.hits += 1
+            self._last_used[row] = self._clock()
+            return SimilarMatch(int(row), entry.question, entry.answer, score)
+        return None
+
+    def add(self, question: str, answer: str, scope: str) -> None:
+        """
+        Store an answered question, replacing the least recently used one when full.
+
+        A question identical after normalization to a stored one of the
+        same scope replaces that one's answer instead.
+
+        Args:
+            question: The question as asked
+            answer: The answer it got
+            scope: What the answer was produced with (model and prompt version)
+        """
+        counts, literals = self._vectorize(question)
+        if not counts.any():
+            return
+        entry = _Entry(question, answer, scope, literals)
+        scores = self._scores(counts) if self._size else None
+        if scores is not None:
+            row = int(np.argmax(scores))
+            same = self._entries[row]
+            if scores[row] >= 1 - 1e-6 and same is not None and same.scope == scope and same.literals == literals:
+                self._entries[row] = entry
+                self._last_used[row] = self._clock()
+                return
+
+        if self._free:
+            row = self._free.pop()
+        elif self._rows < self.capacity:
+            row = self._rows
+            self._rows += 1
+        else:
+            row = int(np.argmin(self._last_used))
+            self._clear(row)
+            self._free.remove(row)
+            self.evictions += 1
+
+        self._counts[row] = counts
+        self._document_frequency += counts != 0
+        self._entries[row] = entry
+        self._last_used[row] = self._clock()
+        self._size += 1
+        self._changes += 1
+        if self._changes >= max(16, self._size // 10):
+            self.reweight()
+        else:
+            self._weights[:, row] = self._weigh(counts)
+
+    def discard(self, match: SimilarMatch) -> None:
+        """
+        Remove a matched question, unless its row has been reused since.
+
+        Args:
+            match: A match returned by lookup()
+        """
+        entry = self._entries[match.row]
+        if entry is not None and entry.question == match.question and entry.answer == match.answer:
+            self._clear(match.row)
+            self._changes += 1
+
+    def should_audit(self) -> bool:
+        """Decide whether to audit a hit."""
+        return self._rng.random() < self.audit_rate
+
+    def audit(self, match: SimilarMatch, question: str, fresh_answer: str) -> bool:
+        """
+        Compare the answer served for a hit with the model's own answer to the question.
+
+        A false match is logged and its stored question discarded.
+
+        Args:
+            match: The match whose answer was served
+            question: The question it was served for
+            fresh_answer: The model's answer to that question
+
+        Returns:
+            True if the answers agree
+        """
+        self.audits += 1
+        agreement = self.similarity(match.answer, fresh_answer)
+        if agreement >= self.audit_threshold:
+            return True
+        self.false_matches += 1
+        self.discard(match)
+        logger.warning(
+            "Similar question audit found a false match",
+            extra={"question_similarity": round(match.score, 3), "answer_similarity": round(agreement, 3)}
+        )
+        logger.debug("False match: %r was answered as %r", question, match.question)
+        return False
+
+    def similarity(self, first: str, second: str) -> float:
+        """
+        Cosine similarity of two texts' hashed features, without frequency weighting.
+
+        Args:
+            first: A text
+            second: Another text
+
+        Returns:
+            The similarity, from 0 (nothing in common) to 1
+        """
+        a = self._vectorize(first)[0].astype(np.float32)
+        b = self._vectorize(second)[0].astype(np.float32)
+        norms = float(np.linalg.norm(a) * np.linalg.norm(b))
+        return float(a @ b) / norms if norms else 0.0
+
+    def reweight(self) -> None:
+        """Recompute the inverse document frequencies and reweight every stored question."""
+        self._idf = (np.log((1.0 + self._size) / (1.0 + self._document_frequency)) + 1.0).astype(np.float32)
+        weights = self._counts[:self._rows] * self._idf
+        norms = np.linalg.norm(weights, axis=1, keepdims=True)
+        np.divide(weights, norms, out=weights, where=norms > 0)
+        self._weights[:, :self._rows] = weights.T
+        self._changes = 0
+        self.reweights += 1
+
+    def save(self) -> None:
+        """
+        Write the index to its path, replacing any earlier save.
+
+        The counts are written to "<path>.npy" and the questions and answers
+        to "<path>.json", each through a temporary file. The JSON file holds a
+        checksum of the counts, so a pair of files from different saves is
+        detected and not loaded.
+        """
+        if not self.path:
+            return
+        counts_path, entries_path = f"{self.path}.npy", f"{self.path}.json"
+        mapped = np.lib.format.open_memmap(
+            counts_path + ".tmp", mode="w+", dtype=np.int8, shape=(self.capacity, self.dimensions)
+        )
+        mapped[:] = self._counts
+        mapped.flush()
+        del mapped
+        document = {
+            "capacity": self.capacity,
+            "dimensions": self.dimensions,
+            "checksum": zlib.crc32(self._counts.tobytes()),
+            "entries": [
+                [row, entry.question, entry.answer, entry.scope, list(entry.literals)]
+                for row, entry in enumerate(self._entries) if entry is not None
+            ],
+        }
+        with open(entries_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(document, f)
+        os.replace(counts_path + ".tmp", counts_path)
+        os.replace(entries_path + ".tmp", entries_path)
+        logger.info("Saved %d similar questions to %s", self._size, self.path)
+
+    def load(self) -> bool:
+        """
+        Replace the index with the one saved at its path.
+
+        A missing, unreadable or mismatched save (other capacity or
+        dimensions, or files from different saves) is logged and ignored.
+
+        Returns:
+            True if a saved index was loaded
+        """
+        try:
+            with open(f"{self.path}.json", encoding="utf-8") as f:
+                document = json.load(f)
+            counts = np.load(f"{self.path}.npy", mmap_mode="c")
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            logger.warning("Could not load similar questions from %s: %s", self.path, e)
+            return False
+        if (
+            counts.shape != (self.capacity, self.dimensions)
+            or counts.dtype != np.int8
+            or document.get("capacity") != self.capacity
+            or document.get("dimensions") != self.dimensions
+        ):
+            logger.warning("Ignoring similar questions saved at %s with other settings", self.path)
+            return False
+        if zlib.crc32(counts.tobytes()) != document.get("checksum"):
+            logger.warning("Ignoring similar questions saved at %s: files are from different saves", self.path)
+            return False
+
+        self._counts = counts
+        self._entries = [None] * self.capacity
+        for row, question, answer, scope, literals in document["entries"]:
+            self._entries[row] = _Entry(question, answer, scope, tuple(literals))
+        used = [row for row, entry in enumerate(self._entries) if entry is not None]
+        self._rows = used[-1] + 1 if used else 0
+        self._free = [row for row in range(self._rows) if self._entries[row] is None]
+        self._size = len(used)
+        self._document_frequency = (counts[:self._rows] != 0).sum(axis=0, dtype=np.int32)
+        # Fresh zeroed arrays are only backed by memory once written to
+        self._weights = np.zeros_like(self._weights)
+        self._last_used = np.zeros_like(self._last_used)
+        self.reweight()
+        logger.info("Loaded %d similar questions from %s", self._size, self.path)
+        return True
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get occupancy, hit and audit counters.
+
+        Returns:
+            A dictionary of counter names to values
+        """
+        return {
+            "entries": self._size,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+            "guarded": self.guarded,
+            "evictions": self.evictions,
+            "reweights": self.reweights,
+            "audits": self.audits,
+            "false_matches": self.false_matches,
+        }
+
+    def _vectorize(self, text: str) -> Tuple[np.ndarray, Tuple[str, ...]]:
+        """
+        Hash a text's features into a row of counts.
+
+        Args:
+            text: The question (or answer) as written
+
+        Returns:
+            A tuple containing (the int8 counts, the literals in the text)
+        """
+        features, literals = _features(text)
+        buckets: Dict[int, int] = {}
+        for feature in features:
+            hashed = zlib.crc32(feature.encode("utf-8"))
+            bucket = hashed % self.dimensions
+            buckets[bucket] = buckets.get(bucket, 0) + (1 if hashed & 0x80000000 else -1)
+        counts = np.zeros(self.dimensions, dtype=np.int8)
+        if buckets:
+            counts[list(buckets)] = np.clip(list(buckets.values()), -127, 127)
+        return counts, literals
+
+    def _weigh(self, counts: np.ndarray) -> np.ndarray:
+        """Weight a row of counts by the current inverse document frequencies and normalize it."""
+        weights = counts * self._idf
+        norm = float(np.linalg.norm(weights))
+        return weights / norm if norm else weights
+
+    def _scores(self, counts: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Score every stored question against a question's counts.
+
+        Args:
+            counts: The question's counts (from _vectorize)
+
+        Returns:
+            Cosine similarities indexed by row, or None if the question has no features
+        """
+        features = np.flatnonzero(counts)
+        weights = counts[features] * self._idf[features]
+        norm = float(np.linalg.norm(weights))
+        if not norm:
+            return None
+        return (weights / norm) @ self._weights[features, :self._rows]
+
+    def _clear(self, row: int) -> None:
+        """Remove the question stored in a row and make the row free."""
+        self._document_frequency -= self._counts[row] != 0
+        self._counts[row] = 0
+        self._weights[:, row] = 0
+        self._last_used[row] = 0
+        self._entries[row] = None
+        self._free.append(row)
+        self._size -= 1
@@ -0,0 +1,88 @@
+"""
+Fast local classifier for telling academic questions from off-topic ones.
+"""
+
+import re
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+# Pattern kinds
+ACADEMIC = 0
+OFF_TOPIC = 1
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+class TopicScore(NamedTuple):
+    """Result of classifying a question."""
+    academic_hits: int
+    off_topic_hits: int
+    matches: Tuple[str, ...]
+
+    @property
+    def score(self) -> int:
+        """Academic hits minus off-topic hits; negative means off-topic."""
+        return self.academic_hits - self.off_topic_hits
+
+class TopicClassifier:
+    """
+    Word-level multi-pattern matcher over academic and off-topic phrases.
+
+    Phrases are compiled into a trie keyed by whole words: the first word of
+    every phrase maps to the phrases that start with it, longest first. A
+    question is split into words once, and each word costs a single dict
+    lookup however many patterns there are, so matching stays in the
+    microsecond range. Because matching works on whole words, "art" never
+    matches inside "start". Multi-word phrases such as "industrial
+    revolution" match across any whitespace or punctuation, and a plural 's'
+    is accepted on the last word of every phrase.
+    """
+
+    def __init__(self, academic_topics: Iterable[str], off_topic_markers: Iterable[str]):
+        """
+        Args:
+            academic_topics: Words and phrases that indicate an academic question
+            off_topic_markers: Words and phrases that indicate a non-academic question
+        """
+        # first word -> [(remaining words, phrase, kind)], longest phrase first
+        self._trie: Dict[str, List[Tuple[Tuple[str, ...], str, int]]] = {}
+        seen = set()
+        for kind, phrases in ((ACADEMIC, academic_topics), (OFF_TOPIC, off_topic_markers)):
+            for phrase in phrases:
+                words = tuple(_WORD.findall(phrase.lower()))
+                if not words or words in seen:
+                    continue
+                seen.add(words)
+                name = " ".join(words)
+                for variant in (words, words[:-1] + (words[-1] + "s",)):
+                    self._trie.setdefault(variant[0], []).append((variant[1:], name, kind))
+
+        for entries in self._trie.values():
+            entries.sort(key=lambda entry: len(entry[0]), reverse=True)
+
+    def classify(self, text: str) -> TopicScore:
+        """
+        Count academic and off-topic phrases in a question.
+
+        Each distinct phrase is counted once, however often it appears, and
+        the longest phrase starting at a word wins ("industrial revolution"
+        rather than "industrial").
+
+        Args:
+            text: The question to classify
+
+        Returns:
+            The TopicScore for the question
+        """
+        words = _WORD.findall(text.lower())
+        trie = self._trie
+        found: Dict[str, int] = {}
+        for index, word in enumerate(words):
+            entries = trie.get(word)
+            if entries is None:
+                continue
+            for rest, phrase, kind in entries:
+                if not rest or tuple(words[index + 1:index + 1 + len(rest)]) == rest:
+                    found[phrase] = kind
+                    break
+
+        academic = sum(1 for kind in found.values() if kind == ACADEMIC)
+        return TopicScore(academic, len(found) - academic, tuple(found))
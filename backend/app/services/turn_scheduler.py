@@ -0,0 +1,107 @@
+"""
+Per-conversation turn scheduling: one turn at a time per conversation.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict
+from app.config.settings import CONVERSATION_MAX_QUEUED_TURNS
+from app.services.admission import AdmissionRejected
+from app.services.deadline import within_deadline
+
+class _Lane:
+    """The lock of one conversation and the number of turns holding or awaiting it."""
+
+    __slots__ = ("lock", "turns")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.turns = 0
+
+class TurnScheduler:
+    """
+    Runs the turns of each conversation one at a time, in arrival order.
+
+    A turn reads the conversation's history, asks the model and appends the
+    question and answer. Two overlapping turns of one conversation would
+    each answer without seeing the other and interleave their messages, so
+    a turn waits for the previous one of its conversation to finish. Turns
+    of different conversations never wait for each other.
+
+    A conversation only has a lane (its lock) while turns are running or
+    waiting; the last turn out removes it, so idle conversations take no
+    memory here however many there have been.
+
+    Turns are ordered per worker process. With several workers sharing the
+    SQLite store, turns of a conversation routed to different workers can
+    still overlap.
+    """
+
+    def __init__(self, max_queued: int):
+        """
+        Args:
+            max_queued: Turns allowed to wait behind the running one in a
+                conversation (0 for no limit)
+        """
+        self.max_queued = max_queued
+        self._lanes: Dict[str, _Lane] = {}
+        self.started = 0
+        self.waited = 0
+        self.rejected = 0
+        self.max_depth = 0
+
+    @asynccontextmanager
+    async def turn(self, conversation_id: str) -> AsyncIterator[None]:
+        """
+        Hold the conversation's turn for the duration of the block.
+
+        Args:
+            conversation_id: The ID of the conversation
+
+        Raises:
+            AdmissionRejected: 429 if the conversation already has max_queued turns waiting
+            DeadlineExceededError: If the request's deadline passes while waiting
+        """
+        lane = self._lanes.get(conversation_id)
+        if lane is None:
+            lane = self._lanes[conversation_id] = _Lane()
+        elif self.max_queued and lane.turns > self.max_queued:
+            self.rejected += 1
+            raise AdmissionRejected(
+                429, "Too many questions are waiting in this conversation. Please wait for the answers.", 1.0
+            )
+
+        lane.turns += 1
+        self.max_depth = max(self.max_depth, lane.turns)
+        try:
+            if lane.lock.locked():
+                self.waited += 1
+            await within_deadline(lane.lock.acquire())
+            try:
+                self.started += 1
+                yield
+            finally:
+                lane.lock.release()
+        finally:
+            lane.turns -= 1
+            if not lane.turns:
+                del self._lanes[conversation_id]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the number of busy conversations, queued turns and counters.
+
+        Returns:
+            A dictionary of counter names to values
+        """
+        return {
+            "conversations": len(self._lanes),
+            "queued": sum(lane.turns - 1 for lane in self._lanes.values()),
+            "started": self.started,
+            "waited": self.waited,
+            "rejected": self.rejected,
+            "max_depth": self.max_depth,
+        }
+
+# Shared scheduler for this worker process
+turn_scheduler = TurnScheduler(max_queued=CONVERSATION_MAX_QUEUED_TURNS)
@@ -0,0 +1,8 @@
+"""
+Benchmarks for the MentorAI backend.
+
+Run from the backend directory, e.g. `python -m benchmarks.topic_classifier`.
+`benchmarks.load` and `benchmarks.micro` accept --check to fail on a
+regression against baseline.json, and --update-baseline to record new
+reference numbers.
+"""
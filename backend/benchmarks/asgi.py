@@ -0,0 +1,101 @@
+"""
+Minimal in-process ASGI client, so benchmarks measure the app rather than a network stack.
+"""
+
+import asyncio
+import json
+from typing import Dict, Optional, Tuple
+
+class AsgiClient:
+    """Sends HTTP requests and lifespan events straight to an ASGI application."""
+
+    def __init__(self, app, client: Tuple[str, int] = ("127.0.0.1", 50000)):
+        self.app = app
+        self.client = client
+        self._lifespan_task: Optional[asyncio.Task] = None
+        self._lifespan_events: Optional[asyncio.Queue] = None
+        self._lifespan_replies: Optional[asyncio.Queue] = None
+
+    async def startup(self) -> None:
+        """Run the application's startup handlers."""
+        self._lifespan_events = asyncio.Queue()
+        self._lifespan_replies = asyncio.Queue()
+        scope = {"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}}
+        self._lifespan_task = asyncio.ensure_future(
+            self.app(scope, self._lifespan_events.get, self._lifespan_replies.put)
+        )
+        await self._lifespan_events.put({"type": "lifespan.startup"})
+        reply = await self._lifespan_replies.get()
+        if reply["type"] != "lifespan.startup.complete":
+            raise RuntimeError(f"Application startup failed: {reply.get('message', reply['type'])}")
+
+    async def shutdown(self) -> None:
+        """Run the application's shutdown handlers."""
+        if self._lifespan_task is None:
+            return
+        await self._lifespan_events.put({"type": "lifespan.shutdown"})
+        await self._lifespan_replies.get()
+        await self._lifespan_task
+        self._lifespan_task = None
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        json_body: Optional[Dict] = None,
+        headers: Optional[Dict[str, str]] = None
+    ) -> Tuple[int, Dict[str, str], bytes]:
+        """
+        Send one HTTP request.
+
+        Args:
+            method: The HTTP method
+            path: The path, optionally with a query string
+            json_body: Optional JSON request body
+            headers: Optional extra request headers
+
+        Returns:
+            A tuple containing (status code, response headers, response body)
+        """
+        body = json.dumps(json_body).encode() if json_body is not None else b""
+        raw_headers = [(b"host", b"benchmark"), (b"content-length", str(len(body)).encode())]
+        if json_body is not None:
+            raw_headers.append((b"content-type", b"application/json"))
+        for name, value in (headers or {}).items():
+            raw_headers.append((name.lower().encode(), value.encode()))
+        path, _, query = path.partition("?")
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": raw_headers,
+            "client": self.client,
+            "server": ("benchmark", 80),
+        }
+
+        sent = False
+        response: Dict = {"status": 500, "headers": {}, "body": []}
+
+        async def receive() -> Dict:
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            # The request body has been read; wait as a connected client would
+            await asyncio.Event().wait()
+
+        async def send(message: Dict) -> None:
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = {name.decode(): value.decode() for name, value in message.get("headers", [])}
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+
+        await self.app(scope, receive, send)
+        return response["status"], response["headers"], b"".join(response["body"])
@@ -0,0 +1,117 @@
+"""
+Shared helpers for the benchmarks: timing, memory and baseline comparison.
+"""
+
+import json
+import os
+import resource
+import time
+from typing import Callable, Dict, List, Tuple
+
+# Baselines of all benchmarks, checked in so regressions fail the run
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+def time_per_op(function: Callable[[], object], iterations: int, repeats: int = 5) -> float:
+    """
+    Best-of-N average microseconds per call.
+
+    Args:
+        function: The operation to time, called without arguments
+        iterations: Calls per repeat
+        repeats: Repeats, of which the fastest is reported
+
+    Returns:
+        Microseconds per call
+    """
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            function()
+        best = min(best, time.perf_counter() - start)
+    return best / iterations * 1e6
+
+def percentile(samples: List[float], percent: float) -> float:
+    """
+    Get a percentile of a list of samples (nearest rank).
+
+    Args:
+        samples: The samples
+        percent: The percentile, between 0 and 100
+
+    Returns:
+        The percentile, or 0 if there are no samples
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(len(ordered) * percent / 100.0)) - 1))
+    return ordered[index]
+
+def rss_mb() -> Tuple[float, float]:
+    """
+    Get the resident memory of this process.
+
+    Returns:
+        A tuple containing (current RSS, peak RSS) in megabytes; the current
+        value falls back to the peak where /proc is unavailable
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0  # KiB on Linux
+    try:
+        with open("/proc/self/statm") as statm:
+            current = int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024.0 * 1024.0)
+    except (OSError, ValueError, IndexError):
+        current = peak
+    return current, peak
+
+def load_baseline() -> Dict:
+    """Read the baseline file, or return an empty baseline if there is none."""
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH) as baseline_file:
+        return json.load(baseline_file)
+
+def save_baseline(section: str, values: Dict) -> None:
+    """
+    Replace one section of the baseline file.
+
+    Args:
+        section: The benchmark's section, e.g. "micro"
+        values: The new baseline values for that section
+    """
+    baseline = load_baseline()
+    baseline[section] = values
+    with open(BASELINE_PATH, "w") as baseline_file:
+        json.dump(baseline, baseline_file, indent=2, sort_keys=True)
+        baseline_file.write("\n")
+
+def find_regressions(
+    results: Dict[str, float],
+    baseline: Dict[str, float],
+    tolerance: float,
+    higher_is_better: Tuple[str, ...] = ()
+) -> List[str]:
+    """
+    Compare results with a baseline.
+
+    Args:
+        results: Measured values by name
+        baseline: Baseline values by name; names missing from it are not checked
+        tolerance: Allowed relative change for the worse, e.g. 0.5 for 50%
+        higher_is_better: Names where a lower value is the regression
+
+    Returns:
+        A description of every regression, empty if there are none
+    """
+    regressions = []
+    for name, expected in sorted(baseline.items()):
+        if name not in results or not expected:
+            continue
+        actual = results[name]
+        if name in higher_is_better:
+            worse = actual < expected / (1 + tolerance)
+        else:
+            worse = actual > expected * (1 + tolerance)
+        if worse:
+            regressions.append(f"{name}: {actual:.4g} vs baseline {expected:.4g} (tolerance {tolerance:.0%})")
+    return regressions
@@ -0,0 +1,127 @@
+"""
+Compare the memory and access latency of conversation storage layouts.
+
+Measures bytes per conversation (with tracemalloc) and the time to read a
+conversation back for three layouts: ConversationHistory holding Pydantic
+Message objects (how the in-memory store kept conversations before), the
+compact store with conversations in use ("hot") and the compact store after
+idle conversations were compressed ("cold"; the first access decompresses).
+
+Usage:
+    python -m benchmarks.conversation_memory [--conversations N] [--turns T]
+"""
+
+import argparse
+import os
+import time
+import tracemalloc
+
+# The benchmark never calls the model
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+os.environ.setdefault("AI_BACKEND", "fake")
+
+from app.models.schemas import ConversationHistory, Message
+from app.services.conversation_store import InMemoryConversationStore
+from benchmarks.common import time_per_op
+from benchmarks.micro import ANSWER, QUESTION
+
+class ManualClock:
+    """A clock the benchmark advances to make conversations idle."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def turn(index: int) -> tuple:
+    """A question and answer that differ per turn, as real messages do."""
+    return f"{QUESTION} ({index})", f"{ANSWER} ({index})"
+
+def legacy_layout(conversations: int, turns: int) -> dict:
+    """Conversations as ConversationHistory objects with Pydantic messages."""
+    histories = {}
+    for number in range(conversations):
+        conversation = ConversationHistory()
+        for index in range(turns):
+            question, answer = turn(number * turns + index)
+            conversation.messages.append(Message(role="user", content=question))
+            conversation.messages.append(Message(role="model", content=answer))
+        histories[conversation.id] = conversation
+    return histories
+
+def compact_layout(conversations: int, turns: int, clock: ManualClock) -> InMemoryConversationStore:
+    """Conversations in the compact in-memory store."""
+    store = InMemoryConversationStore(
+        max_conversations=0, max_bytes=0, idle_ttl=0, compress_after=60, clock=clock
+    )
+    for number in range(conversations):
+        conversation_id = store.create().id
+        for index in range(turns):
+            question, answer = turn(number * turns + index)
+            store.append(conversation_id, Message(role="user", content=question))
+            store.append(conversation_id, Message(role="model", content=answer))
+    return store
+
+def measure(build):
+    """Run `build`, returning its result and the bytes it left allocated."""
+    tracemalloc.start()
+    try:
+        result = build()
+        allocated, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, allocated
+
+def cold_access_micros(store: InMemoryConversationStore, clock: ManualClock, read) -> float:
+    """Microseconds per first read of a compressed conversation."""
+    clock.now += 3600
+    store.stats()  # compresses every idle conversation
+    conversation_ids = list(store._entries)
+    started = time.perf_counter()
+    for conversation_id in conversation_ids:
+        read(conversation_id)
+    return (time.perf_counter() - started) / len(conversation_ids) * 1e6
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--conversations", type=int, default=2000)
+    parser.add_argument("--turns", type=int, default=5, help="Question/answer pairs per conversation")
+    parser.add_argument("--iterations", type=int, default=5000)
+    args = parser.parse_args()
+
+    histories, legacy_bytes = measure(lambda: legacy_layout(args.conversations, args.turns))
+    clock = ManualClock()
+    store, hot_bytes = measure(lambda: compact_layout(args.conversations, args.turns, clock))
+
+    def compressed_layout() -> InMemoryConversationStore:
+        cold_clock = ManualClock()
+        cold_store = compact_layout(args.conversations, args.turns, cold_clock)
+        cold_clock.now += 3600
+        cold_store.stats()  # compresses every idle conversation
+        return cold_store
+
+    cold_store, cold_bytes = measure(compressed_layout)
+
+    legacy_id = next(iter(histories))
+    hot_id = next(iter(store._entries))
+
+    print(f"{args.conversations} conversations of {args.turns * 2} messages")
+    print(f"{'layout':24} {'bytes/conversation':>20} {'vs legacy':>10}")
+    for name, allocated in (("legacy (Pydantic)", legacy_bytes), ("compact, hot", hot_bytes), ("compact, cold", cold_bytes)):
+        print(f"{name:24} {allocated / args.conversations:20.0f} {allocated / legacy_bytes:9.0%}")
+    print(f"Store estimate, cold:    {cold_store.stats()['bytes'] / args.conversations:20.0f}")
+
+    print(f"\n{'access':40} {'us/op':>10}")
+    rows = (
+        ("legacy dict lookup", time_per_op(lambda: histories.get(legacy_id), args.iterations)),
+        ("hot messages() (records)", time_per_op(lambda: store.messages(hot_id), args.iterations)),
+        ("hot get() (builds Pydantic models)", time_per_op(lambda: store.get(hot_id), args.iterations)),
+        ("cold messages() (decompresses)", cold_access_micros(store, clock, store.messages)),
+        ("cold get() (decompresses)", cold_access_micros(store, clock, store.get)),
+    )
+    for name, micros in rows:
+        print(f"{name:40} {micros:10.2f}")
+
+if __name__ == "__main__":
+    main()
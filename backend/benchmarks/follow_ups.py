@@ -0,0 +1,119 @@
+"""
+Measure follow-up prefetching: hit rate, follow-up latency and extra model calls.
+
+Simulated students each ask an opening question and then several more,
+one at a time with a pause to read each answer. Each time, a student
+picks one of the suggested follow-ups with probability --pick (earlier
+suggestions more often) or asks something new. The run is repeated with
+prefetching off and on, against a simulated Gemini backend, reporting
+the median and p95 latency of the follow-ups that were picked, the
+prefetch hit rate and the model calls per answered question (the cost
+of prefetches that were never used).
+
+Questions go straight to the AI service, as /ask would send them, but
+without admission control. Prefetches still take admission slots, and
+the limit is raised so that only --max-in-flight bounds them here.
+
+Usage:
+    python -m benchmarks.follow_ups [--students N] [--turns T] [--pick P] [--think S]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+from typing import Dict, List
+
+# The benchmark never calls the real model
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+os.environ.setdefault("AI_BACKEND", "fake")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("AI_MAX_CONCURRENCY", "100000")
+os.environ.setdefault("ADMISSION_MAX_IN_FLIGHT", "100000")
+
+from app.services.ai_service import AIService
+from app.services.follow_ups import follow_up_prefetcher
+from app.services.model_backend import SimulatedBackend
+
+SUBJECTS = ["photosynthesis", "the french revolution", "recursion", "inflation", "chemical bonds", "metaphor"]
+
+class CountingBackend(SimulatedBackend):
+    """A simulated backend counting its calls."""
+
+    calls = 0
+
+    async def generate_async(self, *args, **kwargs):
+        CountingBackend.calls += 1
+        return await super().generate_async(*args, **kwargs)
+
+async def student(index: int, args: argparse.Namespace, rng: random.Random, latencies: List[float]) -> int:
+    """Hold one conversation; return the number of questions asked."""
+    loop = asyncio.get_running_loop()
+    question = f"Explain {rng.choice(SUBJECTS)} for lesson {index}"
+    answer, conversation_id = await AIService.get_answer(question)
+    suggestions = AIService.follow_ups(question, answer, conversation_id)
+    for turn in range(args.turns):
+        await asyncio.sleep(rng.expovariate(1 / args.think))
+        picked = suggestions and rng.random() < args.pick
+        if picked:
+            # Earlier suggestions are picked more often
+            question = suggestions[min(int(rng.expovariate(1.5)), len(suggestions) - 1)]
+        else:
+            question = f"What else should I know about lesson {index}, part {turn}?"
+        started = loop.time()
+        answer, conversation_id = await AIService.get_answer(question, conversation_id)
+        if picked:
+            latencies.append(loop.time() - started)
+        suggestions = AIService.follow_ups(question, answer, conversation_id)
+    return args.turns + 1
+
+async def run(args: argparse.Namespace, prefetch: int) -> Dict[str, float]:
+    backend = CountingBackend(latency_median=args.latency, latency_sigma=0.3, output_words=40, seed=args.seed)
+    AIService.set_backend(backend)
+    CountingBackend.calls = 0
+    follow_up_prefetcher.max_per_conversation = prefetch
+    follow_up_prefetcher.max_in_flight = args.max_in_flight
+    before = follow_up_prefetcher.stats()
+    rng = random.Random(args.seed)
+    latencies: List[float] = []
+    asked = sum(await asyncio.gather(*(student(index, args, rng, latencies) for index in range(args.students))))
+    # Let the last prefetches finish so their calls are counted
+    await asyncio.sleep(args.latency * 5)
+    after = follow_up_prefetcher.stats()
+    selected = after["selected"] - before["selected"]
+    return {
+        "picked": len(latencies),
+        "median": statistics.median(latencies) if latencies else 0.0,
+        "p95": sorted(latencies)[int(0.95 * (len(latencies) - 1))] if latencies else 0.0,
+        "hit_rate": (after["hits"] - before["hits"]) / selected if selected else 0.0,
+        "calls_per_question": CountingBackend.calls / asked,
+    }
+
+async def main_async(args: argparse.Namespace) -> None:
+    print(f"{args.students} students x {args.turns + 1} questions, picking a suggestion {args.pick:.0%} of the time; "
+          f"median model latency {args.latency * 1000:.0f} ms")
+    print(f"{'prefetch':10} {'picked':>7} {'median ms':>10} {'p95 ms':>8} {'hit rate':>9} {'calls/question':>15}")
+    for prefetch in (0, args.prefetch):
+        result = await run(args, prefetch)
+        print(
+            f"{'off' if not prefetch else f'{prefetch} ahead':10} {result['picked']:7d} "
+            f"{result['median'] * 1000:10.1f} {result['p95'] * 1000:8.1f} "
+            f"{result['hit_rate']:9.1%} {result['calls_per_question']:15.2f}"
+        )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=4, help="Questions after the opening one")
+    parser.add_argument("--pick", type=float, default=0.6, help="Probability of asking a suggested follow-up")
+    parser.add_argument("--think", type=float, default=0.5, help="Mean seconds spent reading an answer")
+    parser.add_argument("--latency", type=float, default=0.2, help="Median seconds per simulated model call")
+    parser.add_argument("--prefetch", type=int, default=2, help="Suggestions answered ahead when prefetching")
+    parser.add_argument("--max-in-flight", type=int, default=64, help="Prefetches running at once")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    main()
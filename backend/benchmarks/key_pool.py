@@ -0,0 +1,112 @@
+"""
+Compare answer throughput with one API key and with a pool of keys.
+
+Each key is stood in for by a simulated backend with its own quota: past
+its rate it fails with RateLimitError, as Gemini does. Requests arrive at
+a fixed rate above one key's quota. The report gives the answers served,
+the requests that failed with a rate limit, the failovers to another key
+and how the calls were spread over the keys, for a single key, a pool of
+keys and a pool where one key's real quota is half of what was configured
+for it (so it rate limits and rests).
+
+Usage:
+    python -m benchmarks.key_pool [--keys N] [--quota R] [--rate R] [--duration S]
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from typing import AsyncIterator, Dict, List, Optional
+
+# The benchmark never calls the real model
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+os.environ.setdefault("AI_BACKEND", "fake")
+
+from app.services.admission import TokenBucket
+from app.services.exceptions import RateLimitError
+from app.services.key_pool import KeyPoolBackend
+from app.services.model_backend import GenerationOptions, ModelBackend, ModelReply, SimulatedBackend
+
+class QuotaBackend(ModelBackend):
+    """One simulated API key: answers through `inner`, rate limited past `rate` calls per second."""
+
+    def __init__(self, inner: ModelBackend, rate: float):
+        self.inner = inner
+        self.bucket = TokenBucket(rate, rate, time.monotonic())
+
+    async def generate_async(self, history: List[Dict], message: str, options: Optional[GenerationOptions] = None) -> ModelReply:
+        if self.bucket.take(time.monotonic()):
+            raise RateLimitError("Simulated quota exceeded")
+        return await self.inner.generate_async(history, message, options)
+
+    async def stream_async(self, history: List[Dict], message: str, options: Optional[GenerationOptions] = None) -> AsyncIterator[str]:
+        reply = await self.generate_async(history, message, options)
+        yield reply.text
+
+def build_pool(quotas: List[float], declared: List[float], args: argparse.Namespace) -> KeyPoolBackend:
+    """A pool over simulated keys with real `quotas`, configured with `declared` ones (per second)."""
+    backends = {
+        f"key{index}": QuotaBackend(SimulatedBackend(latency_median=args.latency, latency_sigma=0.3, seed=index), quota)
+        for index, quota in enumerate(quotas)
+    }
+    return KeyPoolBackend(
+        backends,
+        rpm={name: rate * 60 for name, rate in zip(backends, declared)},
+        cooldown=1.0,
+        max_cooldown=5.0
+    )
+
+async def drive(pool: KeyPoolBackend, args: argparse.Namespace) -> Dict[str, int]:
+    """Send requests at a fixed rate for the duration and count the outcomes."""
+    outcomes = {"served": 0, "rate_limited": 0}
+
+    async def ask(index: int) -> None:
+        try:
+            await pool.generate_async([], f"Explain photosynthesis, request {index}")
+            outcomes["served"] += 1
+        except RateLimitError:
+            outcomes["rate_limited"] += 1
+
+    tasks = []
+    started = time.perf_counter()
+    for index in range(int(args.rate * args.duration)):
+        delay = started + index / args.rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(ask(index)))
+    await asyncio.gather(*tasks)
+    return outcomes
+
+async def run(args: argparse.Namespace) -> None:
+    setups = {
+        "one key": ([args.quota], [args.quota]),
+        f"{args.keys} keys": ([args.quota] * args.keys, [args.quota] * args.keys),
+        f"{args.keys} keys, one over-declared": (
+            [args.quota / 2] + [args.quota] * (args.keys - 1),
+            [args.quota] * args.keys
+        ),
+    }
+    print(f"{args.rate:.0f} requests/s for {args.duration:.0f} s; each key's quota is {args.quota:.0f} requests/s")
+    print(f"{'setup':28} {'served':>8} {'rate limited':>13} {'failovers':>10}  calls per key")
+    for name, (quotas, declared) in setups.items():
+        pool = build_pool(quotas, declared, args)
+        outcomes = await drive(pool, args)
+        per_key = " ".join(str(stats["calls"]) for stats in pool.key_stats().values())
+        print(
+            f"{name:28} {outcomes['served']:8d} {outcomes['rate_limited']:13d} "
+            f"{pool.stats()['failovers']:10d}  {per_key}"
+        )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--keys", type=int, default=4)
+    parser.add_argument("--quota", type=float, default=50.0, help="Requests per second each key allows")
+    parser.add_argument("--rate", type=float, default=150.0, help="Requests per second sent")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds of load per setup")
+    parser.add_argument("--latency", type=float, default=0.05, help="Median seconds per simulated model call")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
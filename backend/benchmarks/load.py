@@ -0,0 +1,150 @@
+"""
+Load-test /education/ask in process against a simulated Gemini backend.
+
+Virtual users hold multi-turn conversations at a fixed concurrency. The
+report gives latency percentiles, throughput, upstream calls per request and
+process memory. With --check, the run fails if the results regress against
+the "load" section of benchmarks/baseline.json (recorded with the same
+parameters).
+
+Usage:
+    python -m benchmarks.load [--users N] [--requests N] [--turns N]
+        [--latency-median S] [--latency-sigma S] [--error-rate P] [--output-words N]
+        [--check | --update-baseline] [--tolerance T]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+# The benchmark never calls the real model, and every request comes from one address
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+os.environ.setdefault("AI_BACKEND", "fake")
+os.environ.setdefault("ADMISSION_CLIENT_RATE", "0")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from app.main import create_application
+from app.services.ai_service import AIService
+from app.services.model_backend import SimulatedBackend
+from app.services.resilience import ResilientBackend
+from benchmarks.asgi import AsgiClient
+from benchmarks.common import find_regressions, load_baseline, percentile, rss_mb, save_baseline
+
+SUBJECTS = ["photosynthesis", "calculus", "the French Revolution", "plate tectonics", "recursion", "Shakespeare"]
+
+# Results where bigger numbers are better
+HIGHER_IS_BETTER = ("requests_per_second",)
+
+async def run(args: argparse.Namespace) -> dict:
+    """Drive the app with the configured load and collect the results."""
+    backend = SimulatedBackend(
+        latency_median=args.latency_median,
+        latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate,
+        output_words=args.output_words,
+        seed=args.seed
+    )
+    AIService.set_backend(ResilientBackend.from_settings(backend))
+    client = AsgiClient(create_application())
+    await client.startup()
+
+    latencies = []
+    statuses: Counter = Counter()
+    remaining = args.requests
+    conversations = 0
+
+    async def user(user_index: int) -> None:
+        nonlocal remaining, conversations
+        while remaining > 0:
+            conversations += 1
+            conversation_id = None
+            subject = SUBJECTS[conversations % len(SUBJECTS)]
+            for turn in range(args.turns):
+                if remaining <= 0:
+                    return
+                remaining -= 1
+                body = {"question": f"Explain {subject}, point {turn + 1}, for student {user_index}-{conversations}"}
+                if conversation_id:
+                    body["conversation_id"] = conversation_id
+                started = time.perf_counter()
+                status, _, response = await client.request("POST", "/education/ask", body)
+                latencies.append(time.perf_counter() - started)
+                statuses[status] += 1
+                if status != 200:
+                    break
+                if conversation_id is None:
+                    conversation_id = json.loads(response)["conversation_id"]
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user(index) for index in range(args.users)))
+    elapsed = time.perf_counter() - started
+    await client.shutdown()
+
+    current_rss, peak_rss = rss_mb()
+    completed = len(latencies)
+    return {
+        "requests": completed,
+        "errors": completed - statuses[200],
+        "statuses": dict(statuses),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "requests_per_second": completed / elapsed,
+        "upstream_calls_per_request": backend.calls / completed if completed else 0.0,
+        "rss_mb": current_rss,
+        "peak_rss_mb": peak_rss,
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=50, help="Concurrent virtual users")
+    parser.add_argument("--requests", type=int, default=2000, help="Total requests")
+    parser.add_argument("--turns", type=int, default=5, help="Questions per conversation")
+    parser.add_argument("--latency-median", type=float, default=0.05, help="Median upstream latency in seconds")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Log-normal spread of upstream latency")
+    parser.add_argument("--error-rate", type=float, default=0.01, help="Probability of an upstream failure")
+    parser.add_argument("--output-words", type=int, default=150, help="Words per simulated answer")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--check", action="store_true", help="Fail if results regress against the baseline")
+    parser.add_argument("--update-baseline", action="store_true", help="Record these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    params = {
+        name: getattr(args, name)
+        for name in ("users", "requests", "turns", "latency_median", "latency_sigma", "error_rate", "output_words", "seed")
+    }
+    print("Parameters: " + ", ".join(f"{name}={value}" for name, value in params.items()))
+    results = asyncio.run(run(args))
+
+    print()
+    print(f"Requests:             {results['requests']} ({results['errors']} errors, statuses {results['statuses']})")
+    print(f"Latency p50/p95/p99:  {results['p50_ms']:.1f} / {results['p95_ms']:.1f} / {results['p99_ms']:.1f} ms")
+    print(f"Throughput:           {results['requests_per_second']:.1f} requests/s")
+    print(f"Upstream calls/req:   {results['upstream_calls_per_request']:.3f}")
+    print(f"RSS (current/peak):   {results['rss_mb']:.1f} / {results['peak_rss_mb']:.1f} MB")
+
+    measured = {name: value for name, value in results.items() if isinstance(value, float)}
+    if args.update_baseline:
+        save_baseline("load", {"params": params, "results": {name: round(value, 3) for name, value in measured.items()}})
+        print("\nBaseline updated.")
+    elif args.check:
+        baseline = load_baseline().get("load")
+        if not baseline:
+            sys.exit("No load baseline recorded; run with --update-baseline first.")
+        if baseline["params"] != params:
+            sys.exit(f"The load baseline was recorded with different parameters: {baseline['params']}")
+        regressions = find_regressions(measured, baseline["results"], args.tolerance, HIGHER_IS_BETTER)
+        if regressions:
+            print("\nRegressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("\nNo regressions against the baseline.")
+
+if __name__ == "__main__":
+    main()
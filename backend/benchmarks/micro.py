@@ -0,0 +1,95 @@
+"""
+Micro-benchmarks of the per-request hot paths outside the model call.
+
+Times history formatting, context building, request validation and
+conversation store operations. With --check, the run fails if any operation
+got slower than the "micro" section of benchmarks/baseline.json allows.
+
+Usage:
+    python -m benchmarks.micro [--iterations N] [--check | --update-baseline] [--tolerance T]
+"""
+
+import argparse
+import os
+import sys
+
+# The benchmark never calls the model
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+os.environ.setdefault("AI_BACKEND", "fake")
+
+from app.models.schemas import Message, QuestionRequest
+from app.services.context_builder import ContextBuilder
+from app.services.conversation_service import ConversationService
+from app.services.conversation_store import InMemoryConversationStore
+from benchmarks.common import find_regressions, load_baseline, save_baseline, time_per_op
+
+QUESTION = "How does the Krebs cycle connect glycolysis to the electron transport chain?"
+ANSWER = (
+    "The Krebs cycle takes the pyruvate produced by glycolysis, once converted to acetyl-CoA, "
+    "and oxidizes it to carbon dioxide. The NADH and FADH2 it produces carry electrons to the "
+    "electron transport chain, where their energy drives ATP synthesis. "
+) * 4
+
+def conversation_with(store: InMemoryConversationStore, turns: int) -> str:
+    """Create a conversation with the given number of question/answer turns."""
+    conversation_id = store.create().id
+    for _ in range(turns):
+        store.append(conversation_id, Message(role="user", content=QUESTION))
+        store.append(conversation_id, Message(role="model", content=ANSWER))
+    return conversation_id
+
+def benchmarks(iterations: int) -> dict:
+    """Run every micro-benchmark, returning microseconds per operation by name."""
+    store = InMemoryConversationStore(max_conversations=0, max_bytes=0, idle_ttl=0)
+    ConversationService.set_store(store)
+    short_id = conversation_with(store, 5)
+    long_id = conversation_with(store, 50)
+    builder = ContextBuilder(token_budget=4000, summary_token_budget=500)
+    long_messages = store.get(long_id).messages
+    message = Message(role="user", content=QUESTION)
+
+    results = {}
+    results["format_history_10_messages"] = time_per_op(
+        lambda: ConversationService.format_history_for_gemini(short_id), iterations)
+    results["format_history_100_messages"] = time_per_op(
+        lambda: ConversationService.format_history_for_gemini(long_id), iterations // 10)
+    results["build_context_100_messages"] = time_per_op(
+        lambda: builder.build(long_id, long_messages), iterations // 10)
+    results["question_request_validation"] = time_per_op(
+        lambda: QuestionRequest(question=QUESTION, conversation_id=short_id), iterations)
+    results["store_create"] = time_per_op(store.create, iterations)
+    results["store_get"] = time_per_op(lambda: store.get(short_id), iterations)
+    results["store_messages"] = time_per_op(lambda: store.messages(short_id), iterations)
+    results["store_append"] = time_per_op(lambda: store.append(short_id, message), iterations)
+    return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--check", action="store_true", help="Fail if an operation regressed against the baseline")
+    parser.add_argument("--update-baseline", action="store_true", help="Record these timings as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed relative slowdown")
+    args = parser.parse_args()
+
+    results = benchmarks(args.iterations)
+    baseline = load_baseline().get("micro", {})
+    for name, micros in results.items():
+        reference = f"  (baseline {baseline[name]:8.2f})" if name in baseline else ""
+        print(f"{name:32} {micros:10.2f} us/op{reference}")
+
+    if args.update_baseline:
+        save_baseline("micro", {name: round(micros, 3) for name, micros in results.items()})
+        print("\nBaseline updated.")
+    elif args.check:
+        if not baseline:
+            sys.exit("No micro-benchmark baseline recorded; run with --update-baseline first.")
+        regressions = find_regressions(results, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("\nNo regressions against the baseline.")
+
+if __name__ == "__main__":
+    main()
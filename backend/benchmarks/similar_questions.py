@@ -0,0 +1,159 @@
+"""
+Measure the similar question index: hit rate, false matches and lookup latency.
+
+The index is filled with synthetic opening questions: academic topics,
+each asked with one phrasing, a few "how" questions and sums, and
+arithmetic questions that differ only in their numbers. It is then asked
+three kinds of questions:
+
+- paraphrases: a stored topic asked with another phrasing (should hit,
+  except "How does X work?": "how" must match and "work" is a physics
+  term, not filler, so those are expected to miss)
+- near misses: a stored equation with other numbers, a stored sum with
+  another operator ("2*2" after "2+2"), a stored "how" question asked
+  with "why", or a stored topic with its terms swapped ("celsius to
+  fahrenheit" after "fahrenheit to celsius"), which need a different
+  answer (should not hit)
+- unrelated: topics that were never stored (should not hit)
+
+The report gives the hit rate of each kind at several thresholds, lookup
+latency percentiles and insert time at the configured size, and the time to
+save the index and load it into a new one.
+
+Usage:
+    python -m benchmarks.similar_questions [--entries N] [--dimensions D] [--queries Q]
+"""
+
+import argparse
+import itertools
+import os
+import random
+import statistics
+import tempfile
+import time
+from typing import List, Tuple
+
+# The benchmark never calls the real model
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+os.environ.setdefault("AI_BACKEND", "fake")
+
+from app.services.similar_questions import SimilarQuestionIndex
+
+SCOPE = "gemini-2.0-flash:benchmark"
+
+CONCEPTS = [
+    "photosynthesis", "mitosis", "meiosis", "osmosis", "diffusion", "entropy", "enthalpy", "inertia",
+    "momentum", "torque", "refraction", "diffraction", "interference", "radioactivity", "fission", "fusion",
+    "electrolysis", "oxidation", "catalysis", "isomerism", "evolution", "natural selection", "genetic drift",
+    "plate tectonics", "erosion", "weathering", "the water cycle", "the carbon cycle", "supply and demand",
+    "inflation", "opportunity cost", "comparative advantage", "the french revolution", "the renaissance",
+    "the industrial revolution", "the cold war", "feudalism", "imperialism", "democracy", "federalism",
+    "recursion", "binary search", "hash tables", "linked lists", "dynamic programming", "big o notation",
+    "derivatives", "integrals", "limits", "vectors", "matrices", "eigenvalues", "probability", "prime numbers",
+    "the pythagorean theorem", "logarithms", "irony", "metaphor", "alliteration", "iambic pentameter",
+]
+SETTINGS = ["in biology", "in chemistry", "in physics", "in history", "in economics", "in mathematics"]
+PHRASINGS = [
+    "What is {}?",
+    "Explain {} simply",
+    "Can you explain {} to me?",
+    "Please describe {} briefly",
+    "Tell me about {}",
+    "what's {}",
+    "Give me a simple explanation of {}",
+    "How does {} work?",
+]
+CONVERSIONS = [("celsius", "fahrenheit"), ("kilometers", "miles"), ("radians", "degrees"), ("joules", "calories")]
+PROCESSES = ["photosynthesis", "vaccination", "inflation", "erosion", "recursion", "natural selection"]
+SUMS = [(2, "+", 2), (12, "/", 4), (7, "-", 3), (9, "*", 6), (3, "^", 2)]
+OTHER_OPERATOR = {"+": "*", "/": "-", "-": "+", "*": "/", "^": "*"}
+
+def topics() -> List[str]:
+    """Every stored topic: a concept, alone or in a setting."""
+    return [f"{concept} {setting}" for concept, setting in itertools.product(CONCEPTS, [""] + SETTINGS)]
+
+def fill(index: SimilarQuestionIndex, entries: int, rng: random.Random) -> Tuple[List[str], List[Tuple[int, int, int]]]:
+    """Store topic questions, conversions and equations; return the stored topics and equations."""
+    stored_topics = rng.sample(topics(), min(entries // 2, len(topics())))
+    for topic in stored_topics:
+        index.add(PHRASINGS[0].format(topic.strip()), f"An answer about {topic}", SCOPE)
+    for source, target in CONVERSIONS:
+        index.add(f"How do I convert {source} to {target}?", f"Multiply the {source}...", SCOPE)
+    for process in PROCESSES:
+        index.add(f"How does {process} work?", f"Step by step, {process}...", SCOPE)
+    for a, operator, b in SUMS:
+        index.add(f"What is {a}{operator}{b}?", "It is...", SCOPE)
+    equations = []
+    while len(index) < entries:
+        equation = (rng.randint(2, 99), rng.randint(1, 999), rng.randint(1, 999))
+        equations.append(equation)
+        index.add(f"Solve {equation[0]}x + {equation[1]} = {equation[2]}", f"x = {equation[2] - equation[1]}/{equation[0]}", SCOPE)
+    return stored_topics, equations
+
+def query_sets(stored_topics: List[str], equations: List[Tuple[int, int, int]], count: int, rng: random.Random) -> dict:
+    stored = set(stored_topics)
+    unrelated_topics = [topic for topic in topics() if topic not in stored] or ["the history of the accordion"]
+    paraphrases = [rng.choice(PHRASINGS[1:]).format(rng.choice(stored_topics).strip()) for _ in range(count)]
+    near_misses = [f"How do I convert {target} to {source}?" for source, target in CONVERSIONS]
+    near_misses += [f"Why does {process} work?" for process in PROCESSES]
+    near_misses += [f"What is {a}{OTHER_OPERATOR[operator]}{b}?" for a, operator, b in SUMS]
+    while len(near_misses) < count:
+        a, b, c = rng.choice(equations)
+        near_misses.append(f"Solve {a}x + {b} = {c + rng.randint(1, 9)}")
+    unrelated = [rng.choice(PHRASINGS).format(rng.choice(unrelated_topics).strip()) for _ in range(count)]
+    return {"paraphrases": paraphrases, "near misses": near_misses, "unrelated": unrelated}
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=5000, help="Questions stored in the index")
+    parser.add_argument("--dimensions", type=int, default=1024, help="Size of the hashed feature space")
+    parser.add_argument("--queries", type=int, default=2000, help="Questions asked of each kind")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    index = SimilarQuestionIndex(capacity=args.entries, dimensions=args.dimensions, threshold=0.0)
+    started = time.perf_counter()
+    stored_topics, equations = fill(index, args.entries, rng)
+    fill_seconds = time.perf_counter() - started
+    queries = query_sets(stored_topics, equations, args.queries, rng)
+
+    print(f"{len(index)} questions stored, {args.dimensions} dimensions; "
+          f"{fill_seconds / len(index) * 1e6:.0f} us per insert including {index.reweights} reweightings")
+    thresholds = [0.7, 0.8, 0.85, 0.9, 0.95]
+    print(f"{'hit rate':14}" + "".join(f"{threshold:>9.2f}" for threshold in thresholds))
+    for name, questions in queries.items():
+        rates = []
+        for threshold in thresholds:
+            index.threshold = threshold
+            rates.append(sum(index.lookup(question, SCOPE) is not None for question in questions) / len(questions))
+        print(f"{name:14}" + "".join(f"{rate:9.1%}" for rate in rates))
+
+    index.threshold = 0.85
+    latencies = []
+    for question in itertools.chain.from_iterable(queries.values()):
+        started = time.perf_counter()
+        index.lookup(question, SCOPE)
+        latencies.append(time.perf_counter() - started)
+    print(f"Lookup latency: median {statistics.median(latencies) * 1e6:.0f} us, "
+          f"p99 {percentile(latencies, 0.99) * 1e6:.0f} us")
+
+    with tempfile.TemporaryDirectory() as directory:
+        index.path = os.path.join(directory, "similar")
+        started = time.perf_counter()
+        index.save()
+        saved = time.perf_counter() - started
+        warm = SimilarQuestionIndex(capacity=args.entries, dimensions=args.dimensions, threshold=0.85, path=index.path)
+        started = time.perf_counter()
+        warm.load()
+        loaded = time.perf_counter() - started
+        hits = sum(warm.lookup(question, SCOPE) is not None for question in queries["paraphrases"])
+        print(f"Save {saved * 1000:.0f} ms, load {loaded * 1000:.0f} ms; "
+              f"loaded index answers {hits / len(queries['paraphrases']):.1%} of paraphrases")
+
+if __name__ == "__main__":
+    main()
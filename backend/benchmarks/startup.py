@@ -0,0 +1,128 @@
+"""
+Measure cold start: import time of app.main and time to the first /health 200.
+
+Each measurement runs in a fresh interpreter, so nothing is cached between
+runs except by the operating system. With --check, the run fails if either
+number exceeds the "startup" budget in benchmarks/baseline.json.
+
+Usage:
+    python -m benchmarks.startup [--runs N] [--backend fake|gemini] [--check | --update-baseline] [--tolerance T]
+"""
+
+import argparse
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.common import find_regressions, load_baseline, save_baseline
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SCRIPT = (
+    "import time; started = time.perf_counter(); import app.main; "
+    "print(time.perf_counter() - started)"
+)
+
+def child_env(backend: str) -> dict:
+    """Environment for the measured process."""
+    env = dict(os.environ, AI_BACKEND=backend, LOG_LEVEL="WARNING")
+    if backend == "gemini":
+        env.setdefault("GOOGLE_API_KEY", "benchmark")
+    return env
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def measure_import(backend: str) -> float:
+    """Seconds to import app.main in a fresh interpreter."""
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT],
+        cwd=BACKEND_DIR, env=child_env(backend), capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+def wait_healthy(server: subprocess.Popen, port: int, timeout: float = 30.0) -> None:
+    """
+    Poll /health until it answers 200.
+
+    Args:
+        server: The server process, checked for an early exit
+        port: The port the server listens on
+        timeout: Seconds to wait before giving up
+
+    Raises:
+        RuntimeError: If the server exits or is not healthy in time
+    """
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode} before becoming healthy")
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+        try:
+            connection.request("GET", "/health")
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.005)
+        finally:
+            connection.close()
+    raise RuntimeError(f"Server was not healthy within {timeout} seconds")
+
+def measure_first_health(backend: str) -> float:
+    """Seconds from starting uvicorn to the first successful /health response."""
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=child_env(backend), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_healthy(server, port)
+        return time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--backend", default="fake", choices=("fake", "gemini"))
+    parser.add_argument("--check", action="store_true", help="Fail if startup exceeds the budget")
+    parser.add_argument("--update-baseline", action="store_true", help="Record these timings as the budget")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed relative slowdown")
+    args = parser.parse_args()
+
+    imports = [measure_import(args.backend) for _ in range(args.runs)]
+    healths = [measure_first_health(args.backend) for _ in range(args.runs)]
+    results = {
+        "import_ms": statistics.median(imports) * 1000,
+        "first_health_ms": statistics.median(healths) * 1000,
+    }
+    print(f"Backend: {args.backend}, runs: {args.runs} (medians)")
+    print(f"Import app.main:       {results['import_ms']:8.1f} ms  (min {min(imports) * 1000:.1f})")
+    print(f"First /health 200:     {results['first_health_ms']:8.1f} ms  (min {min(healths) * 1000:.1f})")
+
+    section = f"startup_{args.backend}"
+    if args.update_baseline:
+        save_baseline(section, {name: round(value, 1) for name, value in results.items()})
+        print("\nBaseline updated.")
+    elif args.check:
+        baseline = load_baseline().get(section)
+        if not baseline:
+            sys.exit("No startup baseline recorded for this backend; run with --update-baseline first.")
+        regressions = find_regressions(results, baseline, args.tolerance)
+        if regressions:
+            print("\nOver budget:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("\nWithin the startup budget.")
+
+if __name__ == "__main__":
+    main()
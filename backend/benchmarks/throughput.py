@@ -0,0 +1,149 @@
+"""
+Compare HTTP throughput of the development and production server setups.
+
+Starts the app in real server processes with the fake model backend and
+drives POST /education/ask over keep-alive connections from several client
+processes. The "dev" setup is what run.py gives with requirements.txt: one
+process, the asyncio event loop, the h11 parser and access logging. The
+"production" setup is python -m app.server with the given worker count
+(uvloop and httptools when installed, no access log).
+
+The client processes share the machine with the server, so run this on a
+host with more cores than workers for meaningful numbers.
+
+Usage:
+    python -m benchmarks.throughput [--workers N] [--duration S] [--clients N] [--connections N]
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+from typing import List, Tuple
+
+from benchmarks.common import percentile
+from benchmarks.startup import BACKEND_DIR, free_port, wait_healthy
+
+def server_env(workers: int) -> dict:
+    """Environment for the server processes: fake model, no per-client rate limit."""
+    return dict(
+        os.environ,
+        AI_BACKEND="fake",
+        ADMISSION_CLIENT_RATE="0",
+        LOG_LEVEL="WARNING",
+        SERVER_WORKERS=str(workers),
+    )
+
+def server_command(setup: str, port: int, workers: int) -> List[str]:
+    """Command line starting the server for a setup."""
+    if setup == "dev":
+        return [
+            sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+            "--loop", "asyncio", "--http", "h11"
+        ]
+    return [sys.executable, "-m", "app.server", "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers)]
+
+async def connection_loop(port: int, deadline: float, client: int, latencies: List[float]) -> int:
+    """Send requests over one keep-alive connection until the deadline; returns the error count."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    errors = 0
+    sent = 0
+    try:
+        while time.perf_counter() < deadline:
+            body = json.dumps({"question": f"Explain photosynthesis, part {client}-{sent}"}).encode()
+            sent += 1
+            request = (
+                b"POST /education/ask HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body
+            )
+            started = time.perf_counter()
+            writer.write(request)
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n")[1:]:
+                name, _, value = line.partition(b":")
+                if name.strip().lower() == b"content-length":
+                    length = int(value)
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - started)
+            if not head.startswith(b"HTTP/1.1 200"):
+                errors += 1
+    finally:
+        writer.close()
+    return errors
+
+def client_process(port: int, duration: float, connections: int, client: int, results) -> None:
+    """Run `connections` keep-alive connections and report (latencies, errors)."""
+    async def run() -> Tuple[List[float], int]:
+        latencies: List[float] = []
+        deadline = time.perf_counter() + duration
+        errors = await asyncio.gather(*(
+            connection_loop(port, deadline, client * connections + index, latencies)
+            for index in range(connections)
+        ))
+        return latencies, sum(errors)
+
+    results.put(asyncio.run(run()))
+
+def measure(setup: str, args: argparse.Namespace) -> dict:
+    """Start a server setup, load it and return its throughput and latency."""
+    port = free_port()
+    server = subprocess.Popen(
+        server_command(setup, port, args.workers),
+        cwd=BACKEND_DIR, env=server_env(args.workers), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_healthy(server, port)
+        results = multiprocessing.Queue()
+        clients = [
+            multiprocessing.Process(target=client_process, args=(port, args.duration, args.connections, index, results))
+            for index in range(args.clients)
+        ]
+        for client in clients:
+            client.start()
+        latencies: List[float] = []
+        errors = 0
+        for _ in clients:
+            client_latencies, client_errors = results.get()
+            latencies.extend(client_latencies)
+            errors += client_errors
+        for client in clients:
+            client.join()
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_second": len(latencies) / args.duration,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Production worker processes")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load per setup")
+    parser.add_argument("--clients", type=int, default=2, help="Client processes")
+    parser.add_argument("--connections", type=int, default=32, help="Keep-alive connections per client process")
+    args = parser.parse_args()
+
+    results = {setup: measure(setup, args) for setup in ("dev", "production")}
+    print(f"{args.clients * args.connections} connections, {args.duration:.0f} s per setup, production workers: {args.workers}")
+    print(f"{'setup':12} {'requests/s':>12} {'p50 ms':>9} {'p99 ms':>9} {'errors':>8}")
+    for setup, result in results.items():
+        print(
+            f"{setup:12} {result['requests_per_second']:12.1f} {result['p50_ms']:9.1f} "
+            f"{result['p99_ms']:9.1f} {result['errors']:8d}"
+        )
+    gain = results["production"]["requests_per_second"] / max(results["dev"]["requests_per_second"], 1e-9)
+    print(f"\nProduction throughput: {gain:.2f}x the development setup")
+
+if __name__ == "__main__":
+    main()
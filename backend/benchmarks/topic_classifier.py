@@ -0,0 +1,69 @@
+"""
+Benchmark the topic classifier against naive per-keyword substring scanning.
+
+Usage:
+    python -m benchmarks.topic_classifier [--iterations N]
+"""
+
+import argparse
+import os
+import time
+
+# The benchmark never calls the model
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+os.environ.setdefault("AI_BACKEND", "fake")
+
+from app.services.ai_service import AIService
+
+QUESTIONS = [
+    "What is photosynthesis and how does it work?",
+    "Who won the match last night?",
+    "Explain the causes of the Industrial Revolution in Britain",
+    "Can you recommend a good Netflix movie for tonight?",
+    "How do I solve a quadratic equation by completing the square?",
+    "What is the physics behind a curveball in baseball?",
+    "hello",
+    "Write a Python function that reverses a linked list",
+    "What outfit should I wear to the concert this weekend?",
+    "Compare the themes of Hamlet and Macbeth in a short essay, focusing on ambition, guilt and fate",
+]
+
+def naive_scan(question: str) -> int:
+    """The straightforward approach: test every topic with `in`."""
+    text = question.lower()
+    return sum(1 for topic in AIService.EDUCATIONAL_TOPICS if topic in text)
+
+def time_per_call(function, iterations: int, repeats: int = 5) -> float:
+    """Best-of-N average microseconds per question over the sample questions."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            for question in QUESTIONS:
+                function(question)
+        best = min(best, time.perf_counter() - start)
+    return best / (iterations * len(QUESTIONS)) * 1e6
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    classifier = AIService._topic_classifier
+    topics = len(AIService.EDUCATIONAL_TOPICS) + len(AIService.NON_EDUCATIONAL_TOPICS)
+    print(f"Patterns: {topics}, questions: {len(QUESTIONS)}, iterations: {args.iterations}")
+    print()
+    for question in QUESTIONS:
+        result = classifier.classify(question)
+        verdict = "redirect" if AIService.is_off_topic(question) else "upstream"
+        print(f"  {verdict:8}  score={result.score:+d}  {question}")
+    print()
+
+    naive = time_per_call(naive_scan, args.iterations)
+    compiled = time_per_call(classifier.classify, args.iterations)
+    print(f"Naive substring scan (academic list only): {naive:8.2f} us/question")
+    print(f"Compiled word trie (both lists):            {compiled:8.2f} us/question")
+    print(f"Speed-up: {naive / compiled:.1f}x")
+
+if __name__ == "__main__":
+    main()
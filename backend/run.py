@@ -1,5 +1,7 @@
 """
-Script to run the FastAPI application.
+Script to run the FastAPI application for development, reloading on changes.
+
+For production, run `python -m app.server` instead (see app/server.py).
 """
 
 import uvicorn
@@ -0,0 +1,37 @@
+"""
+Shared test setup: the app is configured for the fake model backend before it is imported.
+"""
+
+import os
+
+# The tests never call the real model
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+os.environ.setdefault("AI_BACKEND", "fake")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import pytest
+
+from app.services.ai_service import AIService
+from app.services.model_backend import FakeBackend
+
+@pytest.fixture
+def backend():
+    """A fresh FakeBackend answering for AIService, removed again after the test."""
+    fake = FakeBackend()
+    AIService.set_backend(fake)
+    yield fake
+    AIService.set_backend(None)
+
+class FakeClock:
+    """A monotonic clock that only moves when told to."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock():
+    """A FakeClock starting at 0, to pass where components take a clock."""
+    return FakeClock()
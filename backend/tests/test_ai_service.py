@@ -0,0 +1,120 @@
+"""
+Tests for how AIService answers questions against the model backend.
+"""
+
+import asyncio
+
+import pytest
+
+from app.services.ai_service import AIService
+from app.services.conversation_service import ConversationService
+from app.services.exceptions import AIServiceError
+from app.services.model_backend import FakeBackend, FaultInjectingBackend
+
+def test_each_turn_makes_one_upstream_call(backend):
+    """Every turn is a single model call carrying the earlier turns as history."""
+    async def converse(turns):
+        answer, conversation_id = await AIService.get_answer("Explain photosynthesis in plants")
+        answers = [answer]
+        for turn in range(2, turns + 1):
+            answer, conversation_id = await AIService.get_answer(
+                f"Can you explain step {turn} of photosynthesis?", conversation_id
+            )
+            answers.append(answer)
+            assert backend.call_count == turn
+        return answers
+
+    turns = 5
+    answers = asyncio.run(converse(turns))
+
+    assert backend.call_count == turns
+    for turn, (history, message) in enumerate(backend.calls, start=1):
+        # Earlier questions and answers arrive as native chat history, not repeated calls
+        assert len(history) == 2 * (turn - 1)
+        assert answers[turn - 1].startswith(f"[turn {turn}]")
+
+def test_concurrent_questions_overlap_on_a_slow_backend(backend):
+    """Waiting for a slow model does not block the event loop, so concurrent questions overlap."""
+    backend.latency = 0.2
+    questions = [f"Explain the causes of the French Revolution, part {part}" for part in range(10)]
+
+    async def ask_all():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await asyncio.gather(*(AIService.get_answer(question) for question in questions))
+        return loop.time() - started
+
+    elapsed = asyncio.run(ask_all())
+
+    assert backend.call_count == len(questions)
+    assert backend.max_in_flight > 1
+    # About one latency in total, not one per question
+    assert elapsed < 2 * backend.latency
+
+def test_concurrent_turns_of_a_conversation_are_stored_in_order(backend):
+    """Questions sent at once to one conversation run one at a time, in order; other conversations overlap."""
+    backend.latency = 0.05
+    conversations, turns = 3, 4
+    conversation_ids = [ConversationService.create_conversation().id for _ in range(conversations)]
+
+    def question(conversation, turn):
+        return f"Explain photosynthesis step {turn} of lesson {conversation}"
+
+    async def ask_all():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        # Tasks start in creation order, so each conversation's turns arrive in turn order
+        await asyncio.gather(*(
+            asyncio.create_task(AIService.get_answer(question(conversation, turn), conversation_id))
+            for turn in range(turns)
+            for conversation, conversation_id in enumerate(conversation_ids)
+        ))
+        return loop.time() - started
+
+    elapsed = asyncio.run(ask_all())
+
+    for conversation, conversation_id in enumerate(conversation_ids):
+        messages = ConversationService.get_conversation(conversation_id).messages
+        assert [message.content for message in messages] == [
+            content
+            for turn in range(turns)
+            for content in (question(conversation, turn), f"[turn {turn + 1}] Answer to: {question(conversation, turn)}")
+        ]
+    assert backend.max_in_flight == conversations
+    # About one latency per turn, not one per turn of every conversation
+    assert elapsed < (turns + 1) * backend.latency
+
+def test_only_clearly_non_academic_questions_are_redirected():
+    """Questions merely using words like "score" or "game" still reach the model."""
+    academic = [
+        "How do I calculate the probability of a perfect score in a game of dice?",
+        "Compute the score for a team of 5 in a round-robin tournament",
+        "How does radiocarbon dating work?",
+        "Who won the Battle of Hastings?",
+    ]
+    off_topic = [
+        "Who won the NBA game last night?",
+        "Which celebrity is the biggest influencer on TikTok?",
+    ]
+    assert not any(AIService.is_off_topic(question) for question in academic)
+    assert all(AIService.is_off_topic(question) for question in off_topic)
+
+def test_failed_stream_leaves_no_empty_conversation():
+    """A stream that fails before its answer is recorded removes the conversation it started."""
+    failing = FaultInjectingBackend(FakeBackend(), fail_first=1)
+    AIService.set_backend(failing)
+
+    async def stream():
+        chunks, conversation_id = await AIService.stream_answer("Explain how tides are formed")
+        with pytest.raises(AIServiceError):
+            async for _ in chunks:
+                pass
+        return conversation_id
+
+    try:
+        conversation_id = asyncio.run(stream())
+    finally:
+        AIService.set_backend(None)
+
+    assert failing.failures == 1
+    assert not ConversationService.conversation_exists(conversation_id)
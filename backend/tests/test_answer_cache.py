@@ -0,0 +1,53 @@
+"""
+Tests for the cache of answers to opening questions.
+"""
+
+import asyncio
+
+from app.services import deadline
+from app.services.ai_service import AIService
+from app.services.answer_cache import AnswerCache
+from app.services.metrics import MODEL_ROUTES, request_timings, stage
+
+def test_coalesced_computation_keeps_the_request_context():
+    """The shared computation sees the first caller's deadline, and its stage timings reach that request."""
+    cache = AnswerCache(max_entries=10, ttl=60)
+    seen = {}
+
+    async def compute():
+        seen["deadline"] = deadline.remaining()
+        with stage("model_call"):
+            await asyncio.sleep(0.01)
+        return "Tides are caused by the moon's gravity."
+
+    async def ask():
+        timings = {}
+        request_timings.set(timings)
+        deadline.set_deadline(30)
+        answers = await asyncio.gather(
+            cache.get_or_compute("tides", compute),
+            cache.get_or_compute("tides", compute)
+        )
+        return answers, timings
+
+    answers, timings = asyncio.run(ask())
+
+    assert answers[0] == ("Tides are caused by the moon's gravity.", False)
+    assert answers[1] == ("Tides are caused by the moon's gravity.", True)
+    assert 0 < seen["deadline"] <= 30
+    assert timings["model_call"] > 0
+
+def test_model_routes_are_counted_only_for_model_calls(backend):
+    """An opening question answered from the cache is not counted as routed to a model tier."""
+    question = "Explain how the water cycle works"
+    tier = AIService.route(question).tier.name
+
+    def routed():
+        return sum(MODEL_ROUTES.value(tier=tier, load_shifted=shifted) for shifted in ("true", "false"))
+
+    before = routed()
+    asyncio.run(AIService.get_answer(question))
+    asyncio.run(AIService.get_answer(question))
+
+    assert backend.call_count == 1
+    assert routed() - before == 1
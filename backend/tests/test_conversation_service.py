@@ -0,0 +1,20 @@
+"""
+Tests for the conversation service.
+"""
+
+from app.services.conversation_service import ConversationService
+
+def test_deleting_a_conversation_drops_its_cached_summary():
+    """Summaries of older turns are freed with the conversation they summarize."""
+    conversation_id = ConversationService.create_conversation().id
+    paragraph = "Photosynthesis turns light, water and carbon dioxide into sugar and oxygen. " * 40
+    for turn in range(20):
+        ConversationService.add_message(conversation_id, "user", f"Question {turn}: {paragraph}")
+        ConversationService.add_message(conversation_id, "model", f"Answer {turn}: {paragraph}")
+
+    # The history is over the token budget, so older turns are summarized
+    assert ConversationService.build_context(conversation_id).summarized_messages > 0
+    assert conversation_id in ConversationService._context_builder._summaries
+
+    assert ConversationService.delete_conversation(conversation_id)
+    assert conversation_id not in ConversationService._context_builder._summaries
@@ -0,0 +1,100 @@
+"""
+Tests for the conversation stores.
+"""
+
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+
+from app.models.schemas import Message
+from app.services.conversation_store import SQLiteConversationStore
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Answers one question in a conversation kept in a SQLite database, as one worker process would
+WORKER = """
+import asyncio, sys
+from app.services.ai_service import AIService
+from app.services.conversation_service import ConversationService
+from app.services.conversation_store import SQLiteConversationStore
+from app.services.model_backend import FakeBackend
+
+path, question, conversation_id = sys.argv[1], sys.argv[2], sys.argv[3] or None
+store = SQLiteConversationStore(path)
+ConversationService.set_store(store)
+AIService.set_backend(FakeBackend())
+answer, conversation_id = asyncio.run(AIService.get_answer(question, conversation_id))
+store.close()
+print(conversation_id)
+print(answer)
+"""
+
+def run_worker(path: str, question: str, conversation_id: str = "") -> list:
+    """Answer a question in a new process; return its conversation ID and answer."""
+    env = dict(os.environ, GOOGLE_API_KEY="test", AI_BACKEND="fake", LOG_LEVEL="WARNING")
+    result = subprocess.run(
+        [sys.executable, "-c", WORKER, path, question, conversation_id],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=60, check=True
+    )
+    return result.stdout.strip().splitlines()
+
+def test_sqlite_conversation_continues_in_another_process(tmp_path):
+    """A conversation started by one worker process is continued as turn 2 by another."""
+    path = str(tmp_path / "conversations.db")
+
+    conversation_id, first_answer = run_worker(path, "Explain how vaccines train the immune system")
+    second_id, second_answer = run_worker(path, "Can you give an example of a vaccine?", conversation_id)
+
+    assert first_answer.startswith("[turn 1]")
+    assert second_id == conversation_id
+    # The second process saw the first turn as history
+    assert second_answer.startswith("[turn 2]")
+
+def test_sqlite_writer_survives_a_locked_database(tmp_path):
+    """Rows queued while another process holds the database are kept and written once it is free."""
+    path = str(tmp_path / "conversations.db")
+    store = SQLiteConversationStore(path, flush_interval=0.01, busy_timeout=0.01)
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN EXCLUSIVE")
+    try:
+        conversation = store.create()
+        store.append(conversation.id, Message(role="user", content="What is osmosis?"))
+        time.sleep(0.2)
+        assert store.stats()["write_errors"] > 0
+        assert store.stats()["pending_writes"] == 2
+        # Reads neither wait for the lock nor miss the queued rows
+        started = time.monotonic()
+        assert [message.content for message in store.get(conversation.id).messages] == ["What is osmosis?"]
+        assert time.monotonic() - started < 0.1
+    finally:
+        other.execute("ROLLBACK")
+        other.close()
+
+    time.sleep(0.2)
+    assert store.stats()["pending_writes"] == 0
+    assert store._writer.is_alive()
+    store.close()
+    reopened = SQLiteConversationStore(path)
+    assert [message.content for message in reopened.get(conversation.id).messages] == ["What is osmosis?"]
+    reopened.close()
+
+def test_sqlite_idle_conversations_expire(tmp_path):
+    """Conversations without a new message for idle_ttl seconds are deleted, and listeners told."""
+    store = SQLiteConversationStore(str(tmp_path / "conversations.db"), flush_interval=0.01, idle_ttl=0.5)
+    removed = []
+    store.add_removal_listener(removed.append)
+    idle = store.create()
+    store.append(idle.id, Message(role="user", content="What is osmosis?"))
+    time.sleep(0.6)
+    active = store.create()
+    store.append(active.id, Message(role="user", content="What is diffusion?"))
+
+    # The writer looks for idle conversations about once a second
+    time.sleep(1.2)
+    assert store.get(idle.id) is None
+    assert removed == [idle.id]
+    assert store.stats()["expired_idle"] == 1
+    assert store.get(active.id) is not None
+    store.close()
@@ -0,0 +1,31 @@
+"""
+Tests for the education endpoints.
+"""
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routes import education
+
+def test_idempotency_keys_are_scoped_to_the_client(backend, monkeypatch):
+    """Two clients sending the same Idempotency-Key each get their own answer; a repeat replays it."""
+    monkeypatch.setattr(education, "ADMISSION_CLIENT_ID_HEADER", "X-Forwarded-For")
+    client = TestClient(app)
+
+    def ask(address, question):
+        return client.post(
+            "/education/ask",
+            json={"question": question},
+            headers={"Idempotency-Key": "retry-1", "X-Forwarded-For": address}
+        )
+
+    first = ask("203.0.113.1", "Explain how glaciers carve valleys")
+    other = ask("203.0.113.2", "Explain how volcanoes form islands")
+    repeat = ask("203.0.113.1", "Explain how glaciers carve valleys")
+
+    assert first.status_code == other.status_code == repeat.status_code == 200
+    assert other.json()["answer"].endswith("Explain how volcanoes form islands")
+    assert "Idempotent-Replayed" not in other.headers
+    assert repeat.headers["Idempotent-Replayed"] == "true"
+    assert repeat.json() == first.json()
+    assert backend.call_count == 2
@@ -0,0 +1,72 @@
+"""
+Tests for spreading model calls over a pool of API keys.
+"""
+
+import asyncio
+
+import pytest
+
+from app.services.exceptions import RateLimitError
+from app.services.key_pool import KeyPoolBackend
+from app.services.model_backend import FakeBackend, FaultInjectingBackend
+
+QUESTION = "Explain how tides are formed"
+
+def rate_limited(fake: FakeBackend, times: int) -> FaultInjectingBackend:
+    """A key whose first `times` calls are rate limited by the upstream."""
+    return FaultInjectingBackend(fake, fail_first=times, error_factory=lambda: RateLimitError("429 quota exceeded"))
+
+def test_rate_limited_key_cools_down_and_traffic_fails_over(clock):
+    """A key reporting a rate limit rests for the cooldown while the next key answers."""
+    first, second = FakeBackend(), FakeBackend()
+    pool = KeyPoolBackend(
+        {"key0": rate_limited(first, 1), "key1": second},
+        cooldown=10, clock=clock
+    )
+
+    async def ask():
+        return (await pool.generate_async([], QUESTION)).text
+
+    # key0 is tried first, rate limits, and the call moves to key1 at once
+    assert asyncio.run(ask()).endswith(QUESTION)
+    assert second.call_count == 1
+    assert pool.stats()["failovers"] == 1
+    assert pool.key_stats()["key0"]["cooling_down"]
+    assert pool.key_stats()["key0"]["cooldown_remaining"] == 10
+
+    # While it rests, key0 gets no traffic
+    clock.now = 9.0
+    asyncio.run(ask())
+    assert second.call_count == 2
+    assert first.call_count == 0
+
+    # After the cooldown it answers again
+    clock.now = 10.0
+    asyncio.run(ask())
+    assert first.call_count == 1
+    assert pool.key_stats()["key0"]["rate_limited"] == 1
+    assert not pool.key_stats()["key0"]["cooling_down"]
+
+def test_pool_raises_rate_limit_once_every_key_is_cooling(clock):
+    """With every key resting, calls fail with RateLimitError without reaching the upstream."""
+    keys = {"key0": rate_limited(FakeBackend(), 2), "key1": rate_limited(FakeBackend(), 2)}
+    pool = KeyPoolBackend(keys, cooldown=10, max_cooldown=15, clock=clock)
+
+    async def ask():
+        return await pool.generate_async([], QUESTION)
+
+    with pytest.raises(RateLimitError):
+        asyncio.run(ask())
+    assert [key.calls for key in keys.values()] == [1, 1]
+    assert pool.stats()["keys_available"] == 0
+
+    with pytest.raises(RateLimitError):
+        asyncio.run(ask())
+    assert [key.calls for key in keys.values()] == [1, 1]
+    assert pool.stats()["exhausted"] == 2
+
+    # A repeated rate limit doubles the rest, up to max_cooldown
+    clock.now = 10.0
+    with pytest.raises(RateLimitError):
+        asyncio.run(ask())
+    assert pool.key_stats()["key0"]["cooldown_remaining"] == 15
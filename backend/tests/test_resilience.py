@@ -0,0 +1,129 @@
+"""
+Tests for the resilience layer around model backends.
+"""
+
+import asyncio
+
+import pytest
+
+from app.services import deadline
+from app.services.exceptions import DeadlineExceededError, ModelConnectionError
+from app.services.model_backend import FakeBackend, FaultInjectingBackend
+from app.services.resilience import CircuitBreaker, CircuitOpenError, ResilientBackend
+
+QUESTION = "Explain how tides are formed"
+
+def test_breaker_opens_after_failures_and_half_opens_after_the_cooldown(clock):
+    """Consecutive failures open the circuit; after the cooldown one probe call closes it again."""
+    upstream = FaultInjectingBackend(FakeBackend(), fail_first=3)
+    breaker = CircuitBreaker(failure_threshold=3, recovery_time=10, clock=clock)
+    backend = ResilientBackend(upstream, max_retries=0, breaker=breaker)
+
+    async def scenario():
+        for _ in range(3):
+            with pytest.raises(ModelConnectionError):
+                await backend.generate_async([], QUESTION)
+        assert breaker.state == CircuitBreaker.OPEN
+
+        # Rejected without calling the upstream until the cooldown has passed
+        clock.now = 9.9
+        with pytest.raises(CircuitOpenError):
+            await backend.generate_async([], QUESTION)
+        assert upstream.calls == 3
+
+        clock.now = 10.0
+        reply = await backend.generate_async([], QUESTION)
+        assert reply.text.endswith(QUESTION)
+        assert upstream.calls == 4
+
+    asyncio.run(scenario())
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert backend.stats()["circuit_opened"] == 1
+    assert backend.stats()["circuit_rejected"] == 1
+
+def test_breaker_lets_one_probe_through_while_half_open(clock):
+    """A half-open circuit rejects other calls while its probe runs, and reopens if the probe fails."""
+    upstream = FaultInjectingBackend(FakeBackend(), fail_first=2, extra_latency=0.05)
+    breaker = CircuitBreaker(failure_threshold=1, recovery_time=10, clock=clock)
+    backend = ResilientBackend(upstream, max_retries=0, breaker=breaker)
+
+    async def scenario():
+        with pytest.raises(ModelConnectionError):
+            await backend.generate_async([], QUESTION)
+        clock.now = 10.0
+        probe, other = await asyncio.gather(
+            backend.generate_async([], QUESTION),
+            backend.generate_async([], QUESTION),
+            return_exceptions=True
+        )
+        assert type(probe) is ModelConnectionError
+        assert isinstance(other, CircuitOpenError)
+
+    asyncio.run(scenario())
+    assert upstream.calls == 2
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.opened_at == 10.0
+
+def test_retries_stop_at_the_deadline():
+    """Failing calls are retried only while the request's deadline leaves time for them."""
+    upstream = FaultInjectingBackend(FakeBackend(), fail_first=1000, extra_latency=0.01)
+    backend = ResilientBackend(upstream, max_retries=1000, base_delay=0.05, max_delay=0.05)
+
+    async def ask():
+        deadline.set_deadline(0.3)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        with pytest.raises(DeadlineExceededError):
+            await backend.generate_async([], QUESTION)
+        return loop.time() - started
+
+    elapsed = asyncio.run(ask())
+
+    assert elapsed < 0.4
+    assert 1 < upstream.calls < 1000
+    assert backend.stats()["retries"] == upstream.calls - 1
+    assert backend.stats()["deadline_exceeded"] == 1
+
+def test_hedged_call_wins_and_the_slow_call_is_cancelled():
+    """A call slower than the latency percentile gets a second attempt; the first answer wins, the other is cancelled."""
+    # Every second call is slow: the first (fast) call gives the latency sample,
+    # the second is the slow primary and the third its hedge
+    upstream = FaultInjectingBackend(FakeBackend(), slow_every=2, slow_latency=5.0)
+    backend = ResilientBackend(upstream, hedge_percentile=95, hedge_min_samples=1)
+
+    async def ask():
+        await backend.generate_async([], QUESTION)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        reply = await backend.generate_async([], QUESTION)
+        elapsed = loop.time() - started
+        # Let the cancelled primary finish unwinding
+        await asyncio.sleep(0)
+        assert asyncio.all_tasks() == {asyncio.current_task()}
+        return reply, elapsed
+
+    reply, elapsed = asyncio.run(ask())
+
+    assert reply.text.endswith(QUESTION)
+    assert elapsed < 1.0
+    assert upstream.calls == 3
+    assert backend.stats()["hedges"] == 1
+    assert backend.stats()["hedge_wins"] == 1
+
+def test_stream_attempts_are_cut_off_at_the_deadline():
+    """A stream attempt still waiting for its first chunk ends when the request's deadline passes."""
+    slow = FaultInjectingBackend(FakeBackend(), extra_latency=1.0)
+    backend = ResilientBackend(slow, max_retries=5)
+
+    async def stream():
+        deadline.set_deadline(0.1)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        with pytest.raises(DeadlineExceededError):
+            async for _ in backend.stream_async([], QUESTION):
+                pass
+        return loop.time() - started
+
+    assert asyncio.run(stream()) < 0.5
+    assert slow.calls == 1
+    assert backend.stats()["deadline_exceeded"] == 1
@@ -0,0 +1,29 @@
+"""
+Tests for the cost of starting the app.
+"""
+
+import statistics
+import subprocess
+import sys
+
+from benchmarks.common import load_baseline
+from benchmarks.startup import BACKEND_DIR, child_env, measure_import
+
+def test_importing_the_app_stays_within_the_startup_budget():
+    """Importing app.main takes no longer than the recorded startup budget allows."""
+    budget = load_baseline()["startup_fake"]["import_ms"] / 1000
+    # The same tolerance as `python -m benchmarks.startup --check`
+    assert statistics.median(measure_import("fake") for _ in range(3)) < budget * 1.5
+
+def test_importing_the_app_creates_no_conversation_store():
+    """The conversation store, and any database it opens, is created on first use instead."""
+    script = (
+        "import app.main\n"
+        "from app.services.conversation_service import ConversationService\n"
+        "print(ConversationService._store is None)"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=BACKEND_DIR, env=child_env("fake"), capture_output=True, text=True, check=True
+    ).stdout
+    assert output.strip().splitlines()[-1] == "True"
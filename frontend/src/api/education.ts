@@ -10,6 +10,7 @@ export interface QuestionRequest {
 export interface AnswerResponse {
   answer: string;
   conversation_id: string;
+  suggested_follow_ups?: string[];
   error?: string;
 }
 